@@ -0,0 +1,234 @@
+"""Decide when the next scrape runs, instead of a fixed external cron.
+
+The interval depends on what is known:
+- hot: a known lecture's registration opens today, or it is an hour in which
+  new lectures were found on several past days -> SCHEDULE_HOT_MINUTES
+- quiet hours (SCHEDULE_QUIET_HOURS, portal time) -> sleep until they end
+- otherwise SCHEDULE_BASE_MINUTES, growing by half for every run in a row
+  that found nothing new, up to SCHEDULE_MAX_MINUTES
+A run is never scheduled past the start of the next hot window.
+
+    python main.py --schedule          # run the loop in the foreground (Linux)
+    ADAPTIVE_SCHEDULER=true            # run it on a thread of the web server
+    GET /schedule                      # the upcoming runs
+
+Under gunicorn the thread is started per worker by gunicorn.conf.py, so keep
+`--workers 1`. On Cloud Run the instance must stay up with its CPU allocated
+between requests (min instances 1, CPU always allocated), or the thread stalls.
+"""
+
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Callable
+
+from error_notifier import install_exception_hook
+from helpers import load_previous_lectures, read_json_state, write_json_state
+from lectures import Lecture, portal_timezone
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+SCHEDULE_BASE_MINUTES = float(os.getenv("SCHEDULE_BASE_MINUTES", "30"))
+SCHEDULE_HOT_MINUTES = float(os.getenv("SCHEDULE_HOT_MINUTES", "5"))
+SCHEDULE_MAX_MINUTES = float(os.getenv("SCHEDULE_MAX_MINUTES", "180"))
+SCHEDULE_QUIET_HOURS = os.getenv("SCHEDULE_QUIET_HOURS", "0-7")
+# Hours at which new lectures showed up on at least this many days are hot
+SCHEDULE_HOT_HOUR_MIN_DAYS = int(os.getenv("SCHEDULE_HOT_HOUR_MIN_DAYS", "2"))
+SCHEDULE_HISTORY_DAYS = int(os.getenv("SCHEDULE_HISTORY_DAYS", "28"))
+HISTORY_FILE = "schedule_history.json"
+
+
+def parse_hour_ranges(spec: str) -> set[int]:
+    """Hours in a spec like "0-7,22-23", both ends included"""
+    hours: set[int] = set()
+    for part in filter(None, (part.strip() for part in spec.split(","))):
+        start, _, end = part.partition("-")
+        hours.update(range(int(start), int(end or start) + 1))
+    return {hour % 24 for hour in hours}
+
+
+def posting_hours(history: list[dict]) -> set[int]:
+    """Hours of the day at which new lectures were found on several days"""
+    days_by_hour: dict[int, set[date]] = {}
+    for run in history:
+        if run.get("new_lectures"):
+            at = datetime.fromisoformat(run["at"])
+            days_by_hour.setdefault(at.hour, set()).add(at.date())
+    return {
+        hour
+        for hour, days in days_by_hour.items()
+        if len(days) >= SCHEDULE_HOT_HOUR_MIN_DAYS
+    }
+
+
+def idle_runs(history: list[dict]) -> int:
+    """Completed runs in a row, most recent first, that found nothing new"""
+    count = 0
+    for run in reversed(history):
+        if run.get("status") != 200:
+            continue
+        if run.get("new_lectures"):
+            break
+        count += 1
+    return count
+
+
+class SchedulePlan:
+    """Everything `next_run` needs, computed once from the stored state"""
+
+    def __init__(self, lectures: list[Lecture], history: list[dict]):
+        self.opening_days = {
+            lecture.start_date
+            for lecture in lectures
+            if lecture.start_date and not lecture.registration_ended
+        }
+        self.hot_hours = posting_hours(history)
+        self.quiet_hours = parse_hour_ranges(SCHEDULE_QUIET_HOURS)
+        self.idle_runs = idle_runs(history)
+
+    def is_hot(self, at: datetime) -> bool:
+        if at.hour in self.quiet_hours:
+            return False
+        return at.date() in self.opening_days or at.hour in self.hot_hours
+
+    def _next_hot_start(self, now: datetime, horizon: datetime) -> datetime | None:
+        hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        while hour <= horizon:
+            if self.is_hot(hour):
+                return hour
+            hour += timedelta(hours=1)
+        return None
+
+    def next_run(self, now: datetime, idle: int | None = None) -> tuple[datetime, str]:
+        """(when, why) for the run after `now`, after `idle` runs without changes"""
+        idle = self.idle_runs if idle is None else idle
+        if self.is_hot(now):
+            return now + timedelta(minutes=SCHEDULE_HOT_MINUTES), "hot window"
+
+        if now.hour in self.quiet_hours:
+            wake = now.replace(minute=0, second=0, microsecond=0)
+            while wake.hour in self.quiet_hours:
+                wake += timedelta(hours=1)
+            at = min(wake, now + timedelta(minutes=SCHEDULE_MAX_MINUTES))
+            return at, "quiet hours"
+
+        minutes = min(SCHEDULE_BASE_MINUTES * 1.5**idle, SCHEDULE_MAX_MINUTES)
+        at = now + timedelta(minutes=minutes)
+        hot_start = self._next_hot_start(now, at)
+        if hot_start:
+            return hot_start, "hot window starts"
+        reason = f"{idle} runs without changes" if idle else "base interval"
+        return at, reason
+
+    def upcoming(self, now: datetime, count: int = 10) -> list[dict]:
+        """The next `count` runs, assuming none of them finds anything new"""
+        runs = []
+        idle = self.idle_runs
+        for _ in range(count):
+            now, reason = self.next_run(now, idle)
+            runs.append({"at": now.isoformat(timespec="minutes"), "reason": reason})
+            idle += 1
+        return runs
+
+
+def load_history() -> list[dict]:
+    try:
+        return read_json_state(HISTORY_FILE) or []
+    except Exception as e:
+        logger.warning(f"Could not load the schedule history: {e}")
+        return []
+
+
+def record_run(
+    history: list[dict], at: datetime, status: int, body: dict
+) -> list[dict]:
+    """Append a run outcome and drop entries older than SCHEDULE_HISTORY_DAYS"""
+    run_stats = body.get("run_stats", {})
+    history.append(
+        {
+            "at": at.isoformat(timespec="seconds"),
+            "status": status,
+            "new_lectures": run_stats.get("new_lectures", 0),
+        }
+    )
+    cutoff = at - timedelta(days=SCHEDULE_HISTORY_DAYS)
+    history[:] = [
+        run for run in history if datetime.fromisoformat(run["at"]) >= cutoff
+    ]
+    try:
+        write_json_state(HISTORY_FILE, history)
+    except Exception as e:
+        logger.warning(f"Could not save the schedule history: {e}")
+    return history
+
+
+def current_plan() -> SchedulePlan:
+    lectures = [Lecture.from_dict(lecture) for lecture in load_previous_lectures()]
+    return SchedulePlan(lectures, load_history())
+
+
+class AdaptiveScheduler:
+    """Runs `workflow` (execute_scraper_workflow) whenever the plan says so.
+
+    The workflow takes the single-run lock itself; a run skipped because
+    another one is active is retried after SCHEDULE_HOT_MINUTES.
+    """
+
+    def __init__(self, workflow: Callable[[], tuple[dict, int]]):
+        self.workflow = workflow
+        self.tz = portal_timezone()
+        self.stop_event = threading.Event()
+        self.next_at: datetime | None = None
+        self.next_reason: str | None = None
+        self.thread: threading.Thread | None = None
+
+    def now(self) -> datetime:
+        return datetime.now(self.tz)
+
+    def schedule(self, count: int = 10) -> list[dict]:
+        """The planned next run followed by the ones after it"""
+        if not self.next_at:
+            return current_plan().upcoming(self.now(), count)
+        planned = {
+            "at": self.next_at.isoformat(timespec="minutes"),
+            "reason": self.next_reason,
+        }
+        return [planned] + current_plan().upcoming(self.next_at, count - 1)
+
+    def run_forever(self):
+        history = load_history()
+        retry = False
+        while not self.stop_event.is_set():
+            if retry:
+                self.next_at = self.now() + timedelta(minutes=SCHEDULE_HOT_MINUTES)
+                self.next_reason = "another run was active"
+            else:
+                self.next_at, self.next_reason = current_plan().next_run(self.now())
+            logger.info(
+                f"Next scrape at {self.next_at:%Y-%m-%d %H:%M} ({self.next_reason})"
+            )
+            wait = (self.next_at - self.now()).total_seconds()
+            if self.stop_event.wait(max(0.0, wait)):
+                break
+
+            started_at = self.now()
+            try:
+                body, status = self.workflow()
+            except Exception as e:
+                logger.error(f"Scheduled scrape failed: {e}")
+                body, status = {}, 500
+            retry = body.get("message") == "Another scraper run is already active."
+            if not retry:
+                record_run(history, started_at, status, body)
+
+    def start(self) -> threading.Thread:
+        """Run the loop on a daemon thread, next to the Flask app"""
+        self.thread = threading.Thread(
+            target=self.run_forever, name="adaptive-scheduler", daemon=True
+        )
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,113 @@
+"""Offline end-to-end benchmark of the scraper workflow.
+
+Runs the real `execute_scraper_workflow` (Chrome, Xvfb, cleaning, extraction,
+email assembly, state handling) against the local fakes in
+benchmarks/fake_services.py, so nothing leaves the machine:
+
+    python -m benchmarks.e2e --dates 1 3 7 --lectures 5 20 50
+    python -m benchmarks.e2e --dates 3 --lectures 20 --json results.json
+
+Every (dates, lectures) combination runs in a fresh working directory, so all
+lectures are new and one email is assembled and "sent" per run.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_services import FakeServices
+
+
+def run_once(services: FakeServices, dates: int, lectures: int) -> dict:
+    from main import execute_scraper_workflow
+
+    services.dates = dates
+    services.lectures = lectures
+    services.reset()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="psut-bench-") as workdir:
+        # lectures.json and checkpoints/ are written relative to the cwd
+        os.chdir(workdir)
+        try:
+            started_at = time.perf_counter()
+            body, status = execute_scraper_workflow()
+            total = time.perf_counter() - started_at
+        finally:
+            os.chdir(cwd)
+
+    emails = services.emails()
+    run_stats = body.get("run_stats", {})
+    return {
+        "dates": dates,
+        "lectures": lectures,
+        "status": status,
+        "total_seconds": round(total, 3),
+        "stage_seconds": run_stats.get("stage_seconds", {}),
+        "gemini_requests": len(services.gemini_requests),
+        "gemini_stats": run_stats.get("gemini", {}),
+        "emails": len(emails),
+        "email_bytes": sum(len(json.dumps(email)) for email in emails),
+        "message": body.get("message") or body.get("error"),
+    }
+
+
+def print_result(result: dict):
+    stages = ", ".join(
+        f"{name} {seconds:.2f}s" for name, seconds in result["stage_seconds"].items()
+    )
+    print(
+        f"dates={result['dates']:<3} lectures={result['lectures']:<4} "
+        f"status={result['status']} total={result['total_seconds']:.2f}s "
+        f"gemini_requests={result['gemini_requests']} emails={result['emails']}"
+    )
+    print(f"    {stages}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dates", type=int, nargs="+", default=[1, 3, 7])
+    parser.add_argument("--lectures", type=int, nargs="+", default=[5, 20, 50])
+    parser.add_argument(
+        "--gemini-latency", type=float, default=1.0, help="seconds per request"
+    )
+    parser.add_argument(
+        "--gemini-latency-per-page", type=float, default=0.2, help="extra per page"
+    )
+    parser.add_argument("--json", default=None, help="also write results here")
+    args = parser.parse_args()
+
+    results = []
+    with FakeServices(
+        gemini_latency=args.gemini_latency,
+        gemini_latency_per_page=args.gemini_latency_per_page,
+    ) as services:
+        # Must be in place before main (and its config globals) is imported
+        os.environ.update(services.environ())
+        os.environ.update(
+            {
+                "ENVIRONMENT": "linux",
+                "SCRAPER_IN_PROCESS": "true",
+                "GEMINI_REQUESTS_PER_MINUTE": "600",
+                "LOG_FORMAT": os.getenv("LOG_FORMAT", "text"),
+            }
+        )
+        for dates in args.dates:
+            for lectures in args.lectures:
+                result = run_once(services, dates, lectures)
+                print_result(result)
+                results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [result for result in results if result["status"] != 200]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
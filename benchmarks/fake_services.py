@@ -0,0 +1,353 @@
+"""Local stand-ins for the PSUT portal, the Gemini API and the Brevo API.
+
+Everything runs on 127.0.0.1 in background threads, so the real scraper can
+run end to end without touching the network:
+
+    with FakeServices(dates=3, lectures=10) as services:
+        os.environ.update(services.environ())
+        ...
+"""
+
+import json
+import re
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+SOURCE_URL_PATTERN = re.compile(r"Source URL: (\S+)")
+LOCATIONS = ["Main Auditorium", "IT Building 201", "Library Hall", "Online (Teams)"]
+
+
+def lecture_date(index: int, dates: int) -> date:
+    """Lecture `index` is listed under timeline date `index % dates`"""
+    return date.today() + timedelta(days=index % max(dates, 1))
+
+
+def canned_lecture(index: int, href: str, dates: int) -> dict:
+    """What a perfect extraction of lecture page `index` returns"""
+    lecture_day = lecture_date(index, dates)
+    max_registrations = 40 + (index % 5) * 20
+    return {
+        "title": f"Community Service Lecture {index}",
+        "date": lecture_day.strftime("%d/%m/%Y"),
+        "time": f"{10 + index % 6}:00 - {11 + index % 6}:30",
+        "location": LOCATIONS[index % len(LOCATIONS)],
+        "activity_hours": str(index % 4),
+        "restrictions": "Fourth year students only" if index % 3 == 0 else None,
+        "max_registrations": max_registrations,
+        "current_registrations": (index * 7) % (max_registrations + 10),
+        "start_date": (lecture_day - timedelta(days=7)).strftime("%d/%m/%Y"),
+        "end_date": (lecture_day - timedelta(days=1)).strftime("%d/%m/%Y"),
+        "officer_name": f"Officer {index % 9}",
+        "officer_email": f"officer{index % 9}@psut.edu.jo",
+        "officer_phone": f"+9626535{index:04d}",
+        "href": href,
+    }
+
+
+def lecture_page_html(index: int, href: str, dates: int) -> str:
+    """A lecture details page shaped like the portal's, boilerplate included"""
+    lecture = canned_lecture(index, href, dates)
+    nav_items = "".join(
+        f'<li class="nav-item"><a class="nav-link" href="/menu/{i}">'
+        f'<img src="/static/icon{i}.png"><span>Menu item {i}</span></a></li>'
+        for i in range(40)
+    )
+    rows = "".join(
+        f'<div class="row"><div class="col-4 label">{label}</div>'
+        f'<div class="col-8 value">{lecture[field] or ""}</div></div>'
+        for label, field in [
+            ("Activity Title", "title"),
+            ("Date", "date"),
+            ("Time", "time"),
+            ("Location", "location"),
+            ("Activity Hours", "activity_hours"),
+            ("Registration Conditions", "restrictions"),
+            ("Maximum Registration", "max_registrations"),
+            ("Registered Count:", "current_registrations"),
+            ("Activity Officer", "officer_name"),
+            ("Officer Email", "officer_email"),
+            ("Officer Phone", "officer_phone"),
+        ]
+    )
+    return f"""<!DOCTYPE html>
+<html><head>
+<title>{lecture["title"]}</title>
+<link rel="stylesheet" href="https://fonts.googleapis.com/css?family=Montserrat">
+<style>{"".join(f".c{i}{{margin:{i}px}}" for i in range(300))}</style>
+<script>{"var analytics = {};" * 200}</script>
+</head><body>
+<nav class="header-navbar"><ul class="navigation">{nav_items}</ul></nav>
+<div class="app-content content"><div class="content-wrapper">
+<div class="card"><div class="card-header"><h4 class="card-title">{lecture["title"]}</h4></div>
+<div class="card-body">{rows}
+<div class="row"><div class="col-4 label">Subscription and withdrawal Period</div>
+<div class="col-8 value">{lecture["start_date"]} - {lecture["end_date"]}</div></div>
+<img src="/static/banner{index}.jpg">
+</div></div></div></div>
+<footer><script src="https://www.googletagmanager.com/gtag/js"></script></footer>
+</body></html>"""
+
+
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><body>
+<form id="loginForm" method="post" action="/login">
+<input id="UserID" name="UserID">
+<input id="loginPass" name="password" type="password">
+<button id="submitBtn" type="button"
+    onclick="document.getElementById('loginForm').submit()">Login</button>
+</form>
+</body></html>"""
+
+# Matches the selectors and XPaths used by login_to_portal, close_notifications
+# and scrape_hrefs
+HOME_PAGE = """<!DOCTYPE html>
+<html><body>
+<div id="navbar-mobile"><ul></ul><ul><li></li><li>
+<a id="dropdown-flag" href="#">Language</a>
+<div><a href="#">Arabic</a><a href="/home?lang=en">English</a></div>
+</li></ul></div>
+<div class="app-content content"><div><div></div><div></div><div>
+<div><div><div><div>
+<a href="#">Courses</a><a href="#">Grades</a>
+<a href="/activities" target="_blank">Activities</a>
+</div></div></div></div>
+</div></div></div>
+<div><div><div></div><div></div><div></div><div></div>
+<div><div><div><div><button type="button"><span>x</span></button></div></div></div></div>
+</div></div>
+</body></html>"""
+
+
+def activities_page_html(base_url: str, dates: int, lectures: int) -> str:
+    days: dict[str, list[list[str]]] = {}
+    for offset in range(dates):
+        day = (date.today() + timedelta(days=offset)).strftime("%d/%m/%Y")
+        days[day] = []
+    for index in range(lectures):
+        day = lecture_date(index, dates).strftime("%d/%m/%Y")
+        days[day].append([f"{base_url}/lecture/{index}", f"Lecture {index}"])
+
+    anchors = "".join(
+        f'<li><a href="#" data-date="{day}"{" class=selected" if i == 0 else ""}>'
+        f"{day}</a></li>"
+        for i, day in enumerate(days)
+    )
+    return f"""<!DOCTYPE html>
+<html><body>
+<div class="events"><ul>{anchors}</ul></div>
+<div id="event-content"></div>
+<script>
+const DAYS = {json.dumps(days)};
+function show(anchor) {{
+    document.querySelectorAll(".events a").forEach(a => a.classList.remove("selected"));
+    anchor.classList.add("selected");
+    const items = DAYS[anchor.dataset.date];
+    document.getElementById("event-content").innerHTML = items.length
+        ? items.map(([href, title]) =>
+            `<div class="card"><h4 class="card-title"><a href="${{href}}">${{title}}</a></h4></div>`
+          ).join("")
+        : '<div class="card">No activities</div>';
+}}
+document.querySelectorAll(".events a").forEach(a => a.addEventListener("click", e => {{
+    e.preventDefault();
+    show(a);
+}}));
+show(document.querySelector(".events a.selected"));
+</script>
+</body></html>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    services: "FakeServices"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, body: str | bytes, content_type="text/html"):
+        data = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+
+class _PortalHandler(_Handler):
+    def do_GET(self):
+        services = self.services
+        path = urlparse(self.path).path
+        if path == "/":
+            self._reply(200, LOGIN_PAGE)
+        elif path == "/home":
+            self._reply(200, HOME_PAGE)
+        elif path == "/activities":
+            page = activities_page_html(
+                services.portal_url, services.dates, services.lectures
+            )
+            self._reply(200, page)
+        elif path.startswith("/lecture/"):
+            index = int(path.rsplit("/", 1)[-1])
+            href = f"{services.portal_url}{path}"
+            self._reply(200, lecture_page_html(index, href, services.dates))
+        else:
+            self._reply(404, "")
+
+    def do_POST(self):
+        self._body()
+        self.send_response(302)
+        self.send_header("Location", "/home")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+class _GeminiHandler(_Handler):
+    """Answers generateContent and streamGenerateContent like the Gemini API"""
+
+    def do_POST(self):
+        services = self.services
+        request = json.loads(self._body() or b"{}")
+        prompt = "".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        hrefs = SOURCE_URL_PATTERN.findall(prompt)
+        lectures = [
+            canned_lecture(int(href.rsplit("/", 1)[-1]), href, services.dates)
+            for href in hrefs
+        ]
+        text = json.dumps(lectures, ensure_ascii=False)
+        with services.lock:
+            services.gemini_requests.append({"path": self.path, "pages": len(hrefs)})
+
+        latency = services.gemini_latency
+        time.sleep(latency + services.gemini_latency_per_page * len(hrefs))
+
+        usage = {
+            "promptTokenCount": len(prompt) // 4,
+            "candidatesTokenCount": len(text) // 4,
+            "totalTokenCount": (len(prompt) + len(text)) // 4,
+        }
+        if ":streamGenerateContent" not in self.path:
+            self._reply(200, json.dumps(_candidate(text, usage)), "application/json")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        chunk_size = max(1, len(text) // 8)
+        for start in range(0, len(text), chunk_size):
+            event = _candidate(text[start : start + chunk_size], usage)
+            self.wfile.write(f"data: {json.dumps(event)}\r\n\r\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(services.gemini_latency_per_page / 8)
+
+
+def _candidate(text: str, usage: dict) -> dict:
+    return {
+        "candidates": [
+            {
+                "content": {"role": "model", "parts": [{"text": text}]},
+                "finishReason": "STOP",
+                "index": 0,
+            }
+        ],
+        "usageMetadata": usage,
+        "modelVersion": "fake-gemini",
+    }
+
+
+class _RecorderHandler(_Handler):
+    """Brevo, ntfy and Telegram stand-in: remembers every request it receives"""
+
+    def do_POST(self):
+        services = self.services
+        body = self._body()
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            payload = body.decode("utf-8", errors="replace")
+        with services.lock:
+            services.recorded.append({"path": self.path, "payload": payload})
+        time.sleep(services.brevo_latency)
+        if self.path.startswith("/telegram"):
+            reply = json.dumps({"ok": True, "result": {"message_id": 1}})
+            self._reply(200, reply, "application/json")
+            return
+        reply = json.dumps({"messageId": "<bench@localhost>"})
+        self._reply(201, reply, "application/json")
+
+
+class FakeServices:
+    """Starts the three fake servers; `dates`/`lectures` can be changed between runs"""
+
+    def __init__(
+        self,
+        dates: int = 3,
+        lectures: int = 10,
+        gemini_latency: float = 1.0,
+        gemini_latency_per_page: float = 0.2,
+        brevo_latency: float = 0.1,
+    ):
+        self.dates = dates
+        self.lectures = lectures
+        self.gemini_latency = gemini_latency
+        self.gemini_latency_per_page = gemini_latency_per_page
+        self.brevo_latency = brevo_latency
+        self.lock = threading.Lock()
+        self.gemini_requests: list[dict] = []
+        self.recorded: list[dict] = []
+        self.servers: list[ThreadingHTTPServer] = []
+
+    def _start(self, handler: type[_Handler]) -> str:
+        handler_class = type(handler.__name__, (handler,), {"services": self})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    def __enter__(self) -> "FakeServices":
+        self.portal_url = self._start(_PortalHandler)
+        self.gemini_url = self._start(_GeminiHandler)
+        self.recorder_url = self._start(_RecorderHandler)
+        return self
+
+    def __exit__(self, *exc):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+
+    def reset(self):
+        with self.lock:
+            self.gemini_requests.clear()
+            self.recorded.clear()
+
+    def emails(self) -> list[dict]:
+        return [r["payload"] for r in self.recorded if r["path"].startswith("/brevo")]
+
+    def environ(self) -> dict[str, str]:
+        """Environment that points the scraper at these servers"""
+        return {
+            "PORTAL_URL": self.portal_url,
+            "GEMINI_BASE_URL": self.gemini_url,
+            "GEMINI_API_KEY": "bench",
+            "BREVO_API_URL": f"{self.recorder_url}/brevo",
+            "BREVO_API_KEY": "bench",
+            "SENDER_EMAIL": "bench@example.com",
+            "NTFY_TOPIC_URL": f"{self.recorder_url}/ntfy",
+            # Only used when NOTIFY_CHANNELS names them
+            "NOTIFY_NTFY_URL": f"{self.recorder_url}/push",
+            "TELEGRAM_API_URL": f"{self.recorder_url}/telegram",
+            "TELEGRAM_BOT_TOKEN": "bench",
+            "TELEGRAM_CHAT_ID": "1",
+            "TESTING_MODE": "true",
+            "PSUT_USERNAME": "bench",
+            "PSUT_PASSWORD": "bench",
+        }
@@ -0,0 +1,278 @@
+"""Microbenchmarks for the CPU-bound parts of a run, with regression checks.
+
+    python -m benchmarks.micro --save-baseline    # on the base branch
+    python -m benchmarks.micro                    # on the change, compares
+
+Each benchmark runs at several fixture sizes and records the best wall time
+of a few repeats and the peak traced memory of one run. A result more than
+BENCH_REGRESSION_PERCENT (default 25) above the baseline, in either time or
+memory, fails the run. Baselines are machine specific, so compare on the
+machine that recorded them.
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import TYPE_CHECKING, Callable
+
+from benchmarks.fake_services import canned_lecture, lecture_page_html
+
+if TYPE_CHECKING:
+    from lectures import Lecture
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+SIZES = [10, 100, 1000]
+MIN_ROUND_SECONDS = 0.05
+PORTAL = "https://portal.psut.edu.jo"
+
+
+def make_lectures(count: int) -> list[dict]:
+    return [
+        canned_lecture(index, f"{PORTAL}/lecture/{index}", dates=7)
+        for index in range(count)
+    ]
+
+
+def make_records(count: int) -> list["Lecture"]:
+    from lectures import Lecture
+
+    return [Lecture.from_dict(lecture) for lecture in make_lectures(count)]
+
+
+def make_timeline_day(count: int) -> str:
+    """innerHTML of #event-content for a day with `count` lectures"""
+    return "".join(
+        f'<div class="card"><div class="card-header"><h4 class="card-title">'
+        f'<a href="{PORTAL}/lecture/{index}">Lecture {index}</a></h4></div>'
+        f'<div class="card-body"><p>Details of lecture {index}</p></div></div>'
+        for index in range(count)
+    )
+
+
+def bench_clean_html(size: int) -> Callable[[], object]:
+    from helpers import clean_html
+
+    # clean_html runs once per lecture page, so `size` pages per call
+    pages = [
+        lecture_page_html(index, f"{PORTAL}/lecture/{index}", dates=7)
+        for index in range(size)
+    ]
+    return lambda: [clean_html(page) for page in pages]
+
+
+def bench_parse_timeline(size: int) -> Callable[[], object]:
+    from main import parse_timeline_hrefs
+
+    content = make_timeline_day(size)
+    return lambda: parse_timeline_hrefs(content)
+
+
+def bench_lecture_cards(size: int) -> Callable[[], object]:
+    from send_emails import generate_lecture_card
+
+    lectures = make_records(size)
+    return lambda: [generate_lecture_card(lecture) for lecture in lectures]
+
+
+def bench_email_html(size: int) -> Callable[[], object]:
+    from send_emails import build_email_html
+
+    lectures = make_records(size)
+    return lambda: build_email_html(lectures)
+
+
+def bench_lecture_diff(size: int) -> Callable[[], object]:
+    from lecture_diff import diff_lectures
+
+    # Steady state: most lectures were seen before, a few are new or changed
+    current = make_records(size)
+    for lecture in current[size // 10 : size // 5]:
+        lecture.current_registrations = (lecture.current_registrations or 0) + 1
+    previous = make_lectures(size * 2)[size // 10 :]
+    return lambda: diff_lectures(current, previous)
+
+
+def bench_subscriber_groups(size: int) -> Callable[[], object]:
+    from subscribers import Subscriber, group_by_selection
+
+    # `size` lectures for 1000 subscribers sharing a handful of preferences
+    lectures = make_records(size)
+    preferences = [
+        {},
+        {"hours_only": "yes"},
+        {"days": "sun, tue"},
+        {"earliest": "12:00"},
+    ]
+    subscribers = [
+        Subscriber.from_row(f"user{index}@example.com", preferences[index % 4])
+        for index in range(1000)
+    ]
+    return lambda: group_by_selection(subscribers, lectures)
+
+
+def bench_lectures_api(size: int) -> Callable[[], object]:
+    from datetime import date
+
+    from lectures_api import Snapshot
+
+    # What a new state generation costs GET /lectures: records, then one
+    # filtered, gzipped body; later reads of it are dict lookups
+    lectures = make_lectures(size)
+
+    def refresh():
+        snapshot = Snapshot("1", lectures, date.today())
+        return snapshot.body((("upcoming", True), ("open", True)), gzipped=True)
+
+    return refresh
+
+
+def bench_lecture_records(size: int) -> Callable[[], object]:
+    from lectures import Lecture
+
+    # Validation through LectureData and normalization of a Gemini answer
+    answer = make_lectures(size)
+    return lambda: [Lecture.from_gemini(lecture) for lecture in answer]
+
+
+def bench_state_roundtrip(size: int) -> Callable[[], object]:
+    from helpers import load_previous_lectures, save_lectures
+
+    lectures = make_lectures(size)
+
+    def roundtrip():
+        save_lectures(lectures)
+        return load_previous_lectures()
+
+    return roundtrip
+
+
+BENCHMARKS: dict[str, Callable[[int], Callable[[], object]]] = {
+    "clean_html": bench_clean_html,
+    "parse_timeline_hrefs": bench_parse_timeline,
+    "generate_lecture_card": bench_lecture_cards,
+    "build_email_html": bench_email_html,
+    "diff_lectures": bench_lecture_diff,
+    "subscriber_groups": bench_subscriber_groups,
+    "lectures_api_refresh": bench_lectures_api,
+    "lecture_records": bench_lecture_records,
+    "state_save_load": bench_state_roundtrip,
+}
+
+
+def measure(func: Callable[[], object], repeats: int) -> dict:
+    """Best time per call over `repeats` rounds, and the peak memory of one call.
+
+    Like timeit's autorange, each round calls `func` often enough to take at
+    least MIN_ROUND_SECONDS, so sub-millisecond benchmarks are not just noise.
+    """
+    func()  # warm up imports and caches
+    calls = 1
+    while True:
+        started_at = time.perf_counter()
+        for _ in range(calls):
+            func()
+        elapsed = time.perf_counter() - started_at
+        if elapsed >= MIN_ROUND_SECONDS:
+            break
+        calls *= 2
+
+    best = elapsed / calls
+    for _ in range(repeats - 1):
+        started_at = time.perf_counter()
+        for _ in range(calls):
+            func()
+        best = min(best, (time.perf_counter() - started_at) / calls)
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": best, "peak_kb": peak / 1024}
+
+
+def run_benchmarks(names: list[str], sizes: list[int], repeats: int) -> dict:
+    results = {}
+    for name in names:
+        for size in sizes:
+            # clean_html over thousands of full pages takes minutes, not useful
+            if name == "clean_html" and size > 100:
+                continue
+            result = measure(BENCHMARKS[name](size), repeats)
+            results[f"{name}[{size}]"] = result
+            print(
+                f"{name + f'[{size}]':<30} {result['seconds'] * 1000:>10.2f} ms "
+                f"{result['peak_kb']:>10.0f} KiB"
+            )
+    return results
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in ("seconds", "peak_kb"):
+            before, after = baseline[key][metric], result[metric]
+            if before > 0 and after > before * (1 + threshold / 100):
+                change = (after / before - 1) * 100
+                regressions.append(
+                    f"{key} {metric}: {before:.4g} -> {after:.4g} (+{change:.0f}%)"
+                )
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), default=None)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCH_REGRESSION_PERCENT", "25")),
+        help="allowed slowdown or memory growth in percent",
+    )
+    args = parser.parse_args()
+
+    # State is saved to ./lectures.json, keep it out of the checkout
+    os.environ["ENVIRONMENT"] = "linux"
+    logging.getLogger("PSUT_SCRAPER").setLevel(logging.WARNING)
+    baseline_path = os.path.abspath(args.baseline)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="psut-micro-") as workdir:
+        os.chdir(workdir)
+        try:
+            names = args.only or list(BENCHMARKS)
+            results = run_benchmarks(names, args.sizes, args.repeats)
+        finally:
+            os.chdir(cwd)
+
+    if args.save_baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved baseline to {baseline_path}")
+        return 0
+
+    if not os.path.exists(baseline_path):
+        print(f"No baseline at {baseline_path}; run with --save-baseline first.")
+        return 0
+
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    regressions = find_regressions(results, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+import os
+from datetime import datetime, timedelta
+
+from error_notifier import install_exception_hook
+from helpers import (
+    delete_json_state,
+    list_json_state,
+    read_json_state,
+    write_json_state,
+)
+from latency import timestamp
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+CHECKPOINT_DIR = "checkpoints"
+LATEST_POINTER = "latest.json"
+# A checkpoint older than this is considered stale: the portal may have changed,
+# so a later run starts from scratch instead of resuming.
+CHECKPOINT_MAX_AGE_MINUTES = int(os.getenv("CHECKPOINT_MAX_AGE_MINUTES", "60"))
+RUN_ID_FORMAT = "%Y%m%d-%H%M%S"
+
+
+class RunCheckpoint:
+    """Progress of a single scraper run, saved after every completed stage.
+
+    Stages are: hrefs (timeline scraped), pages (every lecture page fetched and
+    cleaned) and batches (Gemini extraction results, one entry per completed
+    batch). `pages` maps href to cleaned page and only keeps the pages that still
+    need extracting, so it stays small once most batches are done. `hrefs_at`
+    and each batch's `extracted_at` feed the notification latency, see latency.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        created_at: str | None = None,
+        hrefs: list[str] | None = None,
+        hrefs_at: str | None = None,
+        pages: dict[str, str] | None = None,
+        batches: list[dict] | None = None,
+        completed: bool = False,
+    ):
+        self.run_id = run_id
+        self.created_at = created_at or datetime.now().isoformat()
+        self.hrefs = hrefs
+        self.hrefs_at = hrefs_at
+        self.pages = pages
+        self.batches = batches or []
+        self.completed = completed
+
+    @classmethod
+    def new(cls) -> "RunCheckpoint":
+        return cls(run_id=datetime.now().strftime(RUN_ID_FORMAT))
+
+    @property
+    def stage(self) -> str:
+        """Name of the last completed stage"""
+        if self.completed:
+            return "completed"
+        if self.batches:
+            return "batches"
+        if self.pages is not None:
+            return "pages"
+        if self.hrefs is not None:
+            return "hrefs"
+        return "start"
+
+    def extracted_hrefs(self) -> set[str]:
+        """Hrefs of the pages whose batch has already been extracted"""
+        return {href for batch in self.batches for href in batch["hrefs"]}
+
+    def set_hrefs(self, hrefs: list[str]):
+        self.hrefs = hrefs
+        self.hrefs_at = timestamp()
+
+    def add_batch(self, hrefs: list[str], lectures: list[dict]):
+        self.batches.append(
+            {"hrefs": hrefs, "lectures": lectures, "extracted_at": timestamp()}
+        )
+
+    def extracted_lectures(self) -> list[dict]:
+        """Extracted lectures, each with when the timeline listed it and when
+        its batch was extracted"""
+        return [
+            {
+                **lecture,
+                "first_seen_at": self.hrefs_at,
+                "extracted_at": batch.get("extracted_at"),
+            }
+            for batch in self.batches
+            for lecture in batch["lectures"]
+        ]
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "created_at": self.created_at,
+            "hrefs": self.hrefs,
+            "hrefs_at": self.hrefs_at,
+            "pages": self.pages,
+            "batches": self.batches,
+            "completed": self.completed,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunCheckpoint":
+        return cls(
+            run_id=data["run_id"],
+            created_at=data.get("created_at"),
+            hrefs=data.get("hrefs"),
+            hrefs_at=data.get("hrefs_at"),
+            pages=data.get("pages"),
+            batches=data.get("batches"),
+            completed=data.get("completed", False),
+        )
+
+    def is_fresh(self) -> bool:
+        created_at = datetime.fromisoformat(self.created_at)
+        max_age = timedelta(minutes=CHECKPOINT_MAX_AGE_MINUTES)
+        return datetime.now() - created_at <= max_age
+
+
+def _read_checkpoint_file(name: str) -> dict | None:
+    return read_json_state(f"{CHECKPOINT_DIR}/{name}")
+
+
+def _write_checkpoint_file(name: str, data: dict):
+    write_json_state(f"{CHECKPOINT_DIR}/{name}", data)
+
+
+def _delete_checkpoint_file(name: str):
+    delete_json_state(f"{CHECKPOINT_DIR}/{name}")
+
+
+def load_resumable_checkpoint() -> RunCheckpoint | None:
+    """Return the latest unfinished checkpoint if it is still fresh, else None"""
+    try:
+        pointer = _read_checkpoint_file(LATEST_POINTER)
+        if not pointer:
+            return None
+        data = _read_checkpoint_file(f"{pointer['run_id']}.json")
+        if not data:
+            return None
+        checkpoint = RunCheckpoint.from_dict(data)
+    except Exception as e:
+        logger.warning(f"Could not load run checkpoint: {e}")
+        return None
+
+    if checkpoint.completed:
+        return None
+    if not checkpoint.is_fresh():
+        logger.info(
+            f"Checkpoint for run {checkpoint.run_id} is older than "
+            f"{CHECKPOINT_MAX_AGE_MINUTES} minutes; starting a fresh run."
+        )
+        prune_checkpoints()
+        return None
+    return checkpoint
+
+
+def save_checkpoint(checkpoint: RunCheckpoint):
+    """Persist the checkpoint and point the latest marker at it.
+    Failures are logged and ignored so they never abort the run itself."""
+    try:
+        _write_checkpoint_file(f"{checkpoint.run_id}.json", checkpoint.to_dict())
+        _write_checkpoint_file(LATEST_POINTER, {"run_id": checkpoint.run_id})
+    except Exception as e:
+        logger.warning(f"Could not save checkpoint for run {checkpoint.run_id}: {e}")
+
+
+def prune_checkpoints():
+    """Delete the checkpoints too old to resume. They hold every cleaned page,
+    and on GCS nothing else ever removes them."""
+    cutoff = datetime.now() - timedelta(minutes=CHECKPOINT_MAX_AGE_MINUTES)
+    try:
+        for name in list_json_state(CHECKPOINT_DIR):
+            run_id = name.removesuffix(".json")
+            try:
+                created_at = datetime.strptime(run_id, RUN_ID_FORMAT)
+            except ValueError:
+                # The latest pointer, or not a checkpoint
+                continue
+            if created_at < cutoff:
+                _delete_checkpoint_file(name)
+    except Exception as e:
+        logger.warning(f"Could not prune old checkpoints: {e}")
+
+
+def complete_checkpoint(checkpoint: RunCheckpoint):
+    """The run is finished: delete its checkpoint, so later runs start from
+    scratch, along with any stale ones left by failed runs"""
+    checkpoint.completed = True
+    try:
+        _delete_checkpoint_file(LATEST_POINTER)
+        _delete_checkpoint_file(f"{checkpoint.run_id}.json")
+    except Exception as e:
+        logger.warning(
+            f"Could not delete the checkpoint of run {checkpoint.run_id}: {e}"
+        )
+    prune_checkpoints()
@@ -0,0 +1,122 @@
+"""Provision a patched chromedriver matching the installed Chromium.
+
+The patched driver is cached per Chromium major version, so only the first run
+after a browser upgrade pays for downloading and patching. Run this at Docker
+build time to bake the driver into the image:
+
+    python driver_provisioning.py --binary /usr/bin/chromium
+"""
+
+import argparse
+import os
+import re
+import shutil
+import subprocess
+import sys
+
+from error_notifier import install_exception_hook
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+DRIVER_CACHE_DIR = os.getenv(
+    "CHROMEDRIVER_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "psut_notifier", "chromedriver"),
+)
+CHROMIUM_BINARIES = ["/usr/bin/chromium-browser", "/usr/bin/chromium"]
+SYSTEM_DRIVERS = ["/usr/bin/chromedriver", "/usr/lib/chromium/chromedriver"]
+
+
+def find_chromium_binary() -> str | None:
+    for path in CHROMIUM_BINARIES:
+        if os.path.exists(path):
+            return path
+    return shutil.which("chromium") or shutil.which("google-chrome")
+
+
+def detect_major_version(binary: str) -> int | None:
+    """Major version from `<binary> --version`, e.g. "Chromium 147.0.7390.54" -> 147"""
+    try:
+        output = subprocess.run(
+            [binary, "--version"], capture_output=True, text=True, timeout=15
+        ).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Could not run {binary} --version: {e}")
+        return None
+
+    match = re.search(r"(\d+)\.\d+\.\d+", output)
+    return int(match.group(1)) if match else None
+
+
+def cached_driver_path(version_main: int) -> str:
+    return os.path.join(DRIVER_CACHE_DIR, str(version_main), "chromedriver")
+
+
+def provision_driver(version_main: int) -> str:
+    """Return a patched chromedriver for `version_main`, creating it on first use.
+
+    A system chromedriver of the same major version is copied when available,
+    otherwise undetected_chromedriver downloads one. The driver is patched
+    under a temporary name and moved into place, so concurrent runs never see
+    a half-patched file.
+    """
+    from undetected_chromedriver.patcher import Patcher
+
+    target = cached_driver_path(version_main)
+    if Patcher(executable_path=target).is_binary_patched():
+        return target
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+
+    source = next(
+        (
+            path
+            for path in SYSTEM_DRIVERS
+            if os.path.exists(path) and detect_major_version(path) == version_main
+        ),
+        None,
+    )
+    if source:
+        logger.info(f"Patching system chromedriver {source} for Chromium {version_main}")
+        shutil.copy2(source, tmp_path)
+        Patcher(executable_path=tmp_path).auto()
+    else:
+        logger.info(f"Downloading chromedriver for Chromium {version_main}")
+        patcher = Patcher(version_main=version_main)
+        patcher.auto()
+        shutil.copy2(patcher.executable_path, tmp_path)
+
+    os.chmod(tmp_path, 0o755)
+    os.replace(tmp_path, target)
+    logger.info(f"Cached patched chromedriver at {target}")
+    return target
+
+
+def get_driver_for_browser(binary: str | None) -> tuple[str | None, int | None]:
+    """(patched driver path, Chromium major version) for `binary`.
+    Both are None if the version cannot be detected, leaving it to uc."""
+    if not binary:
+        return None, None
+    version_main = detect_major_version(binary)
+    if version_main is None:
+        return None, None
+    return provision_driver(version_main), version_main
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Pre-patch chromedriver")
+    parser.add_argument("--binary", default=None, help="Chromium binary to match")
+    args = parser.parse_args()
+
+    binary = args.binary or find_chromium_binary()
+    driver_path, version_main = get_driver_for_browser(binary)
+    if not driver_path:
+        print(f"Could not detect the Chromium version of {binary}", file=sys.stderr)
+        return 1
+    print(f"Chromium {version_main}: {driver_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
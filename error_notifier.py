@@ -1,13 +1,20 @@
+import atexit
 import logging
 import os
+import queue
 import sys
+import threading
+import time
 import traceback
 
-import requests
-
 PROJECT_NAME = "PSUT Community Service Notifier"
-NTFY_TOPIC_URL = "https://ntfy.sh/my_lubuntu_laptop"
+NTFY_TOPIC_URL = os.getenv("NTFY_TOPIC_URL", "https://ntfy.sh/my_lubuntu_laptop")
 MAX_DETAIL_LENGTH = 700
+# Identical errors within this window are coalesced into one "N occurrences" note
+NTFY_DEDUP_WINDOW_SECONDS = float(os.getenv("NTFY_DEDUP_WINDOW_SECONDS", "300"))
+NTFY_MAX_PER_MINUTE = int(os.getenv("NTFY_MAX_PER_MINUTE", "10"))
+NTFY_QUEUE_SIZE = 100
+NTFY_FLUSH_TIMEOUT_SECONDS = 5
 
 _original_excepthook = sys.excepthook
 _hook_installed = False
@@ -21,8 +28,135 @@ def _shorten(text: str, max_length: int = MAX_DETAIL_LENGTH) -> str:
     return text[: max_length - 3] + "..."
 
 
+class _NtfyWorker:
+    """Background thread that does all the sending, through http_transport.
+
+    Callers only enqueue, so a slow or unreachable ntfy never blocks them. The
+    first occurrence of an error goes out right away; repeats within the dedup
+    window are counted and sent as one summary when the window closes. At most
+    NTFY_MAX_PER_MINUTE messages are sent, the rest are counted as suppressed.
+    """
+
+    def __init__(self):
+        self.queue: queue.Queue = queue.Queue(maxsize=NTFY_QUEUE_SIZE)
+        # key -> [first sent at, repeats since, last message]
+        self.recent: dict[tuple, list] = {}
+        self.sent_at: list[float] = []
+        self.suppressed = 0
+        self.thread = threading.Thread(target=self._run, name="ntfy", daemon=True)
+        self.thread.start()
+
+    def submit(self, key: tuple, message: str):
+        try:
+            self.queue.put_nowait((key, message))
+        except queue.Full:
+            self.suppressed += 1
+
+    def _send(self, message: str, ignore_rate_limit: bool = False):
+        now = time.monotonic()
+        self.sent_at = [t for t in self.sent_at if now - t < 60]
+        if len(self.sent_at) >= NTFY_MAX_PER_MINUTE and not ignore_rate_limit:
+            self.suppressed += 1
+            return
+
+        if self.suppressed:
+            message += f"\n({self.suppressed} notifications suppressed by rate limit)"
+            self.suppressed = 0
+        self.sent_at.append(now)
+        try:
+            # Imported here: http_transport itself installs this module's hook
+            import http_transport
+
+            http_transport.post(
+                NTFY_TOPIC_URL,
+                data=message.encode(encoding="utf-8"),
+                timeout=5,
+                retries=1,
+            )
+        except Exception:
+            pass
+
+    def _handle(self, key: tuple, message: str):
+        entry = self.recent.get(key)
+        if entry is None:
+            self.recent[key] = [time.monotonic(), 0, message]
+            self._send(message)
+        else:
+            entry[1] += 1
+            entry[2] = message
+
+    def _flush_expired(self):
+        now = time.monotonic()
+        for key, (first_sent, repeats, message) in list(self.recent.items()):
+            if now - first_sent < NTFY_DEDUP_WINDOW_SECONDS:
+                continue
+            del self.recent[key]
+            if repeats:
+                window = int(now - first_sent)
+                self._send(f"{message}\n({repeats + 1} occurrences in {window}s)")
+
+    def _flush_all(self):
+        """Send every pending repeat count as one final message, even when
+        rate limited, so nothing is silently lost at exit"""
+        now = time.monotonic()
+        summaries = [
+            f"{message}\n({repeats + 1} occurrences in {int(now - first_sent)}s)"
+            for first_sent, repeats, message in self.recent.values()
+            if repeats
+        ]
+        self.recent.clear()
+        if summaries or self.suppressed:
+            self._send("\n\n".join(summaries) or PROJECT_NAME, ignore_rate_limit=True)
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=1)
+            except queue.Empty:
+                self._flush_expired()
+                continue
+
+            if item is None:
+                self._flush_all()
+                self.queue.task_done()
+                return
+            self._handle(*item)
+            self._flush_expired()
+            self.queue.task_done()
+
+    def close(self, timeout: float = NTFY_FLUSH_TIMEOUT_SECONDS):
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self.thread.join(timeout)
+
+
+_worker: _NtfyWorker | None = None
+_worker_lock = threading.Lock()
+
+
+def _get_worker() -> _NtfyWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = _NtfyWorker()
+            atexit.register(flush_notifications)
+        return _worker
+
+
+def flush_notifications():
+    """Send everything still queued, including pending repeat counts.
+    Runs automatically at interpreter exit."""
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker:
+        worker.close()
+
+
 def notify_error(error: object, source: str | None = None, details: str | None = None):
-    """Send a short error report to ntfy. Notification failures are ignored."""
+    """Queue a short error report for ntfy. Never blocks, failures are ignored."""
     if isinstance(error, BaseException):
         error_name = type(error).__name__
         error_message = str(error)
@@ -40,11 +174,8 @@ def notify_error(error: object, source: str | None = None, details: str | None =
         message_parts.append(f"Details: {_shorten(details)}")
 
     try:
-        requests.post(
-            NTFY_TOPIC_URL,
-            data="\n".join(message_parts).encode(encoding="utf-8"),
-            timeout=5,
-        )
+        key = (source, error_name, _shorten(error_message, 250))
+        _get_worker().submit(key, "\n".join(message_parts))
     except Exception:
         pass
 
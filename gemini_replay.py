@@ -0,0 +1,182 @@
+"""Record and replay Gemini responses, keyed by a hash of the request.
+
+GEMINI_REPLAY_MODE:
+    off       talk to Gemini (default)
+    record    talk to Gemini and store every response in GEMINI_REPLAY_DIR
+    replay    answer only from stored responses, never touching the network;
+              a request that was not recorded raises ReplayMissError
+    mismatch  like replay, but a request that was not recorded is reported
+              page by page (which Source URLs have a changed prompt, which are
+              new) and then answered by Gemini and recorded
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, Iterator
+
+from error_notifier import install_exception_hook
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+GEMINI_REPLAY_MODE = os.getenv("GEMINI_REPLAY_MODE", "off").lower()
+GEMINI_REPLAY_DIR = os.getenv("GEMINI_REPLAY_DIR", "replays")
+REPLAY_MODES = ["off", "record", "replay", "mismatch"]
+PAGE_PATTERN = re.compile(
+    r"Source URL: (\S+)\n(.*?)(?=Source URL: |\Z)", re.DOTALL
+)
+
+
+class ReplayMissError(Exception):
+    pass
+
+
+def _canonical(value: Any) -> Any:
+    """JSON-able form of request arguments (pydantic configs, schema types)"""
+    if hasattr(value, "model_dump"):
+        # Python mode: values JSON cannot take come back through here
+        return value.model_dump(exclude_none=True)
+    return repr(value)
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def request_key(kwargs: dict) -> str:
+    """Hash of everything that shapes the answer except the model, so a run that
+    fell back to another model still replays"""
+    return _sha256(json.dumps(kwargs, sort_keys=True, default=_canonical))
+
+
+def page_hashes(kwargs: dict) -> dict[str, str]:
+    """Source URL -> hash of that page's part of the prompt"""
+    contents = kwargs.get("contents") or []
+    if isinstance(contents, str):
+        contents = [contents]
+    text = "".join(part for part in contents if isinstance(part, str))
+    return {
+        href: _sha256(page.split("<<<NEXT_PAGE_SEPARATOR>>>")[0].strip())
+        for href, page in PAGE_PATTERN.findall(text)
+    }
+
+
+class ReplayClient:
+    """Stands in for `genai.Client` in GeminiScheduler; `client` may be None
+    when only replaying"""
+
+    def __init__(self, client: Any, mode: str, directory: str = GEMINI_REPLAY_DIR):
+        if mode not in REPLAY_MODES:
+            raise ValueError(f"GEMINI_REPLAY_MODE must be one of {REPLAY_MODES}")
+        self.client = client
+        self.mode = mode
+        self.directory = directory
+        # Client-like interface: the scheduler calls `client.models.<method>`
+        self.models = self
+        self.stats = {"recorded": 0, "replayed": 0, "missed": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load(self, key: str) -> dict | None:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _save(self, key: str, model: str, kwargs: dict, chunks: list[Any]):
+        os.makedirs(self.directory, exist_ok=True)
+        recording = {
+            "key": key,
+            "model": model,
+            "pages": page_hashes(kwargs),
+            # `parsed` is derived from the text by the SDK and cannot be
+            # validated back without the schema, so only the raw parts are kept
+            "responses": [
+                chunk.model_dump(mode="json", exclude_none=True, exclude={"parsed"})
+                for chunk in chunks
+            ],
+        }
+        tmp_path = f"{self._path(key)}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(recording, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+        self.stats["recorded"] += 1
+
+    def _recorded_pages(self) -> dict[str, set[str]]:
+        """Source URL -> every prompt hash recorded for it"""
+        pages: dict[str, set[str]] = {}
+        if not os.path.isdir(self.directory):
+            return pages
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            recording = self._load(name[: -len(".json")]) or {}
+            for href, page_hash in recording.get("pages", {}).items():
+                pages.setdefault(href, set()).add(page_hash)
+        return pages
+
+    def _report_miss(self, key: str, kwargs: dict):
+        self.stats["missed"] += 1
+        recorded = self._recorded_pages()
+        current = page_hashes(kwargs)
+        changed = [
+            href
+            for href, page_hash in current.items()
+            if href in recorded and page_hash not in recorded[href]
+        ]
+        new = [href for href in current if href not in recorded]
+        message = (
+            f"No recording for Gemini request {key[:12]}: "
+            f"{len(changed)} pages changed {changed}, {len(new)} new {new}, "
+            f"{len(current) - len(changed) - len(new)} unchanged"
+        )
+        if self.mode == "replay":
+            raise ReplayMissError(message)
+        logger.warning(message)
+
+    def _replayed(self, key: str, kwargs: dict) -> list[Any] | None:
+        """Stored response chunks for the request, None if Gemini must answer"""
+        from google.genai import types
+
+        if self.mode in ("off", "record"):
+            return None
+        recording = self._load(key)
+        if recording is None:
+            self._report_miss(key, kwargs)
+            return None
+        self.stats["replayed"] += 1
+        return [
+            types.GenerateContentResponse.model_validate(response)
+            for response in recording["responses"]
+        ]
+
+    def generate_content(self, model: str, **kwargs) -> Any:
+        key = request_key(kwargs)
+        replayed = self._replayed(key, kwargs)
+        if replayed is not None:
+            return replayed[0]
+
+        response = self.client.models.generate_content(model=model, **kwargs)
+        if self.mode != "off":
+            self._save(key, model, kwargs, [response])
+        return response
+
+    def generate_content_stream(self, model: str, **kwargs) -> Iterator[Any]:
+        key = request_key(kwargs)
+        replayed = self._replayed(key, kwargs)
+        if replayed is not None:
+            yield from replayed
+            return
+
+        chunks = []
+        stream = self.client.models.generate_content_stream(model=model, **kwargs)
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
+        # Only complete streams are worth replaying
+        if self.mode != "off":
+            self._save(key, model, kwargs, chunks)
@@ -0,0 +1,295 @@
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+from error_notifier import install_exception_hook
+from helpers import parse_gemini_error
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+if TYPE_CHECKING:
+    from google.genai import errors
+
+USAGE_FIELDS = {
+    "prompt_tokens": "prompt_token_count",
+    "cached_tokens": "cached_content_token_count",
+    "output_tokens": "candidates_token_count",
+    "total_tokens": "total_token_count",
+}
+
+
+class TokenBucket:
+    """Simple thread-safe token bucket. `acquire` blocks until a token is free."""
+
+    def __init__(
+        self,
+        rate_per_minute: float,
+        capacity: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.rate_per_second = rate_per_minute / 60
+        self.capacity = capacity or max(1, int(rate_per_minute))
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated_at = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate_per_second)
+        self.updated_at = now
+
+    def acquire(self) -> float:
+        """Take one token and return how long we had to wait for it"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait_for = (1 - self.tokens) / self.rate_per_second
+            self.sleep(wait_for)
+            waited += wait_for
+
+
+def is_retryable(e: "errors.APIError") -> bool:
+    """429 (quota) and 5xx errors are transient, anything else is a bad request"""
+    return e.code == 429 or e.code >= 500
+
+
+def _retry_delay_hint(e: "errors.APIError") -> float | None:
+    """Gemini sends a RetryInfo detail like {"retryDelay": "31s"} with 429 errors"""
+    try:
+        for detail in e.details["error"]["details"]:
+            delay = detail.get("retryDelay")
+            if delay and delay.endswith("s"):
+                return float(delay[:-1])
+    except (KeyError, TypeError, ValueError):
+        pass
+    return None
+
+
+class GeminiScheduler:
+    """Rate limited, retrying wrapper around `client.models.generate_content`.
+
+    - every request takes a token from a per-minute token bucket
+    - 429 and 5xx errors are retried with jittered exponential backoff
+    - retries are drawn from a budget shared by the whole run
+    - when the primary model keeps failing, later requests use the fallback model
+      until `fallback_cooldown` seconds have passed, then the primary again
+
+    Everything that happened is recorded in `stats` so it can be returned with
+    the run result.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        model_name: str,
+        fallback_model_name: str | None = None,
+        requests_per_minute: float = 10,
+        retry_budget: int = 6,
+        max_attempts_per_model: int = 3,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        fallback_cooldown: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.client = client
+        self.model_name = model_name
+        self.fallback_model_name = fallback_model_name or None
+        self.retry_budget = retry_budget
+        self.max_attempts_per_model = max_attempts_per_model
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.fallback_cooldown = fallback_cooldown
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = TokenBucket(requests_per_minute, clock=clock, sleep=sleep)
+        self.active_model = model_name
+        # When to give the primary model another chance, while on the fallback
+        self.fallback_until = 0.0
+        self.stats: dict = {
+            "requests": 0,
+            "retries": 0,
+            "backoff_seconds": 0.0,
+            "rate_limit_wait_seconds": 0.0,
+            "fallbacks": [],
+            "primary_restored": 0,
+            "errors": [],
+            # Summed over the answered requests; cached tokens (Gemini's implicit
+            # caching) are part of the prompt tokens and billed at the cached rate
+            "usage": {
+                "prompt_tokens": 0,
+                "cached_tokens": 0,
+                "output_tokens": 0,
+                "total_tokens": 0,
+            },
+            "first_chunk_seconds": [],
+        }
+
+    @property
+    def retries_left(self) -> int:
+        return self.retry_budget - self.stats["retries"]
+
+    def _backoff(self, attempt: int, e: "errors.APIError") -> float:
+        delay = min(self.max_delay, self.base_delay * 2**attempt)
+        # Full jitter so parallel runs don't retry in lockstep
+        delay = random.uniform(0, delay)
+        hint = _retry_delay_hint(e)
+        if hint is not None:
+            delay = max(delay, min(hint, self.max_delay))
+        return delay
+
+    def _switch_to_fallback(self, e: "errors.APIError") -> bool:
+        if not self.fallback_model_name:
+            return False
+        if self.active_model == self.fallback_model_name:
+            return False
+
+        logger.warning(
+            f"Gemini model {self.active_model} exhausted ({parse_gemini_error(e)}); "
+            f"falling back to {self.fallback_model_name}"
+        )
+        self.stats["fallbacks"].append(
+            {"from": self.active_model, "to": self.fallback_model_name, "code": e.code}
+        )
+        self.active_model = self.fallback_model_name
+        self.fallback_until = self.clock() + self.fallback_cooldown
+        return True
+
+    def _restore_primary(self):
+        """Back to the primary model once its fallback cooldown is over; its
+        quota (per minute or per day) may have been the only problem"""
+        if self.active_model == self.model_name or self.clock() < self.fallback_until:
+            return
+        logger.info(f"Gemini model {self.model_name} restored after its cooldown")
+        self.stats["primary_restored"] += 1
+        self.active_model = self.model_name
+
+    def _call_with_retries(self, call: Callable[[str], Any]) -> Any:
+        """Run `call(model_name)`, retrying transient errors within the budget"""
+        from google.genai import errors
+
+        self._restore_primary()
+        attempt = 0
+        while True:
+            self.stats["rate_limit_wait_seconds"] += self.bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                return call(self.active_model)
+            except errors.APIError as e:
+                self.stats["errors"].append(
+                    {"model": self.active_model, "code": e.code}
+                )
+                if not is_retryable(e):
+                    raise
+
+                attempt += 1
+                if attempt >= self.max_attempts_per_model or self.retries_left <= 0:
+                    if not self._switch_to_fallback(e):
+                        raise
+                    # The fallback model has its own quota, so try it right away
+                    attempt = 0
+                    continue
+
+                delay = self._backoff(attempt, e)
+                self.stats["retries"] += 1
+                self.stats["backoff_seconds"] += delay
+                logger.warning(
+                    f"Gemini request failed ({parse_gemini_error(e)}); retry "
+                    f"{self.stats['retries']}/{self.retry_budget} in {delay:.1f}s"
+                )
+                self.sleep(delay)
+
+    def _record_usage(self, response: Any, first_chunk_seconds: float):
+        """Add up the usage metadata of a response, or of a stream's last chunk"""
+        self.stats["first_chunk_seconds"].append(round(first_chunk_seconds, 3))
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is None:
+            return
+        usage = self.stats["usage"]
+        for name, field in USAGE_FIELDS.items():
+            usage[name] += getattr(metadata, field, None) or 0
+
+    def generate_content(self, **kwargs) -> Any:
+        """Same arguments as `client.models.generate_content`, minus `model`"""
+
+        def call(model: str) -> Any:
+            started_at = time.monotonic()
+            response = self.client.models.generate_content(model=model, **kwargs)
+            self._record_usage(response, time.monotonic() - started_at)
+            return response
+
+        return self._call_with_retries(call)
+
+    def generate_content_stream(self, **kwargs) -> Iterator[Any]:
+        """Same arguments as `client.models.generate_content_stream`, minus `model`.
+
+        Only opening the stream (up to its first chunk) is retried: once chunks
+        have been handed out, a retry would hand out duplicates.
+        """
+
+        def start(model: str):
+            started_at = time.monotonic()
+            stream = iter(
+                self.client.models.generate_content_stream(model=model, **kwargs)
+            )
+            first_chunk = next(stream, None)
+            return first_chunk, stream, time.monotonic() - started_at
+
+        first_chunk, stream, first_chunk_seconds = self._call_with_retries(start)
+        if first_chunk is None:
+            return
+        # Usage comes with every chunk and is complete in the last one
+        last_chunk = first_chunk
+        try:
+            yield first_chunk
+            for chunk in stream:
+                last_chunk = chunk
+                yield chunk
+        finally:
+            self._record_usage(last_chunk, first_chunk_seconds)
+
+
+def create_scheduler(model_name: str) -> GeminiScheduler:
+    """Build a scheduler for the real Gemini API, configured from the environment.
+    With GEMINI_REPLAY_MODE set, requests go through a ReplayClient."""
+    from google import genai
+    from google.genai import types
+
+    from gemini_replay import GEMINI_REPLAY_MODE, ReplayClient
+
+    # GEMINI_BASE_URL points the client at a stand-in API, e.g. the benchmark's
+    http_options = None
+    if os.getenv("GEMINI_BASE_URL"):
+        http_options = types.HttpOptions(base_url=os.getenv("GEMINI_BASE_URL"))
+
+    requests_per_minute = float(os.getenv("GEMINI_REQUESTS_PER_MINUTE", "10"))
+    client: Any = None
+    if GEMINI_REPLAY_MODE == "replay":
+        # Nothing leaves the machine, so there is no quota to respect either
+        requests_per_minute = 60_000
+    else:
+        client = genai.Client(
+            api_key=os.getenv("GEMINI_API_KEY", ""), http_options=http_options
+        )
+    if GEMINI_REPLAY_MODE != "off":
+        client = ReplayClient(client, GEMINI_REPLAY_MODE)
+
+    return GeminiScheduler(
+        client=client,
+        model_name=model_name,
+        fallback_model_name=os.getenv("GEMINI_FALLBACK_MODEL_NAME"),
+        requests_per_minute=requests_per_minute,
+        retry_budget=int(os.getenv("GEMINI_RETRY_BUDGET", "6")),
+        fallback_cooldown=float(os.getenv("GEMINI_FALLBACK_COOLDOWN_SECONDS", "300")),
+    )
@@ -5,9 +5,13 @@ import gspread
 from google.oauth2.service_account import Credentials
 
 from error_notifier import install_exception_hook, notify_error
+from subscribers import PREFERENCE_COLUMNS, Subscriber
 
 install_exception_hook(__name__)
 
+# Per request; the subscriber fetch is part of the email channel's run
+GOOGLE_SHEETS_TIMEOUT_SECONDS = float(os.getenv("GOOGLE_SHEETS_TIMEOUT_SECONDS", "20"))
+
 
 def get_google_sheets_client() -> gspread.Client:
     """Initialize and return Google Sheets client using service account."""
@@ -35,25 +39,12 @@ def get_google_sheets_client() -> gspread.Client:
         service_account_path, scopes=scopes
     )
 
-    return gspread.authorize(credentials)
+    client = gspread.authorize(credentials)
+    client.set_timeout(GOOGLE_SHEETS_TIMEOUT_SECONDS)
+    return client
 
 
-def fetch_recipients_from_sheet(
-    sheet_id: str | None = None,
-    sheet_name: str = "Recipients",
-    email_column: int = 1,
-) -> list[str]:
-    """
-    Fetch email addresses from a Google Sheet.
-
-    Args:
-        sheet_id: The Google Sheet ID (from URL). If None, reads from GOOGLE_SHEET_ID env var.
-        sheet_name: Name of the worksheet/tab (default: "Recipients").
-        email_column: Column number containing emails (1-indexed, default: 2 for typical forms).
-
-    Returns:
-        List of email addresses.
-    """
+def _open_worksheet(sheet_id: str | None, sheet_name: str) -> gspread.Worksheet:
     if sheet_id is None:
         sheet_id = os.getenv("GOOGLE_SHEET_ID")
 
@@ -74,26 +65,84 @@ def fetch_recipients_from_sheet(
         raise ValueError(
             "Spreadsheet not found. Make sure the sheet is shared with the service account."
         )
+    return worksheet
 
-    # Get all values from the email column (skip header row)
-    all_values = worksheet.col_values(email_column)
 
-    # Skip header and filter empty values
-    emails = [
-        email.strip().lower()  # type: ignore
-        for email in all_values[1:]  # Skip header row
-        if email and email.strip() and "@" in email  # type: ignore
-    ]
+def _header_key(header: str) -> str:
+    return " ".join(header.lower().replace("_", " ").split())
+
 
-    # Remove duplicates while preserving order
+def fetch_subscribers_from_sheet(
+    sheet_id: str | None = None,
+    sheet_name: str = "Recipients",
+    email_column: int = 1,
+) -> list[Subscriber]:
+    """
+    Fetch subscribers and their preferences from a Google Sheet.
+
+    Args:
+        sheet_id: The Google Sheet ID (from URL). If None, reads from GOOGLE_SHEET_ID env var.
+        sheet_name: Name of the worksheet/tab (default: "Recipients").
+        email_column: Column number containing emails (1-indexed).
+
+    Returns:
+        One Subscriber per unique email, with the preferences of its first row
+        (see subscribers.PREFERENCE_COLUMNS).
+    """
+    worksheet = _open_worksheet(sheet_id, sheet_name)
+
+    # One read for the whole sheet, header row first
+    rows = worksheet.get_all_values()
+    if not rows:
+        return []
+    headers = [_header_key(header) for header in rows[0]]
+    columns = {
+        preference: headers.index(header)
+        for preference, header in PREFERENCE_COLUMNS.items()
+        if header in headers
+    }
+
+    subscribers = []
     seen = set()
-    unique_emails = []
-    for email in emails:
-        if email not in seen:
-            seen.add(email)
-            unique_emails.append(email)
+    for row in rows[1:]:
+        cells = row[email_column - 1 : email_column]
+        email = cells[0].strip().lower() if cells else ""
+        # Skip empty values and duplicates, preserving order
+        if not email or "@" not in email or email in seen:
+            continue
+        seen.add(email)
+        preferences = {
+            preference: row[column]
+            for preference, column in columns.items()
+            if column < len(row)
+        }
+        subscribers.append(Subscriber.from_row(email, preferences))
+
+    return subscribers
+
+
+def fetch_recipients_from_sheet(
+    sheet_id: str | None = None,
+    sheet_name: str = "Recipients",
+    email_column: int = 1,
+) -> list[str]:
+    """
+    Fetch email addresses from a Google Sheet.
+
+    Args:
+        sheet_id: The Google Sheet ID (from URL). If None, reads from GOOGLE_SHEET_ID env var.
+        sheet_name: Name of the worksheet/tab (default: "Recipients").
+        email_column: Column number containing emails (1-indexed, default: 2 for typical forms).
 
-    return unique_emails
+    Returns:
+        List of email addresses.
+    """
+    return [
+        subscriber.email
+        for subscriber in fetch_subscribers_from_sheet(
+            sheet_id, sheet_name, email_column
+        )
+    ]
 
 
 if __name__ == "__main__":
@@ -103,10 +152,10 @@ if __name__ == "__main__":
     load_dotenv()
 
     try:
-        recipients = fetch_recipients_from_sheet()
-        print(f"Found {len(recipients)} recipients:")
-        for email in recipients:
-            print(f"  - {email}")
+        subscribers = fetch_subscribers_from_sheet()
+        print(f"Found {len(subscribers)} recipients:")
+        for subscriber in subscribers:
+            print(f"  - {subscriber.email} {subscriber.preferences}")
     except Exception as e:
         notify_error(e, source=__name__, details="Google Sheets test failed")
         print(f"Error: {e}")
@@ -0,0 +1,13 @@
+"""gunicorn settings, read from the working directory by `gunicorn main:app`.
+
+The command line in the Dockerfile sets the bind address, workers and
+timeout; this only hooks the app's background work into the worker process.
+"""
+
+
+def post_worker_init(worker):
+    # Importing main at config load would start it in the master instead. With
+    # more than one worker, each would run its own scheduler.
+    from main import start_adaptive_scheduler
+
+    start_adaptive_scheduler()
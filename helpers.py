@@ -3,24 +3,28 @@ import os
 import re
 import sys
 import time
+from typing import TYPE_CHECKING, Any
 
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from google.cloud import storage
-from google.genai import errors
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
 from error_notifier import install_exception_hook
 from logger_setup import logger
 
+# bs4, google-cloud-storage, google-genai and selenium are imported by the
+# functions that use them, so importing this module stays cheap on cold start.
+if TYPE_CHECKING:
+    from google.cloud import storage
+    from google.genai import errors
+
 load_dotenv()
 install_exception_hook(__name__)
 
+# Where the lecture state lives: a local file on Linux, a GCS object elsewhere
+LECTURES_FILE = "lectures.json"
+LECTURES_BLOB = "lectures_data.json"
+
 
-def parse_gemini_error(e: errors.APIError) -> str:
+def parse_gemini_error(e: "errors.APIError") -> str:
     if e.code == 400:
         return "There is a typo, or a missing required field in your request."
     elif e.code == 403:
@@ -36,6 +40,8 @@ def parse_gemini_error(e: errors.APIError) -> str:
 
 
 def clean_html(content: str) -> str:
+    from bs4 import BeautifulSoup
+
     # Remove href attributes
     content = re.sub(r'href="[^"]*"', 'href=""', content)
     # Remove src attributes
@@ -51,8 +57,10 @@ def clean_html(content: str) -> str:
     return soup.prettify()
 
 
-def get_gcs_bucket() -> storage.Bucket | None:
+def get_gcs_bucket() -> "storage.Bucket | None":
     """Get the GCS bucket object"""
+    from google.cloud import storage
+
     # If running locally without GCS configured, this might fail if credentials aren't set up.
     # We'll assume the environment is configured correctly for Cloud Run.
     try:
@@ -72,14 +80,95 @@ def get_gcs_bucket() -> storage.Bucket | None:
         return None
 
 
+def read_json_state(path: str) -> Any:
+    """JSON state file at `path`, relative to the working directory on Linux
+    and to the GCS bucket elsewhere. None if it does not exist."""
+    env = os.getenv("ENVIRONMENT", "windows").lower()
+
+    if env == "linux":
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    bucket = get_gcs_bucket()
+    if not bucket:
+        return None
+    blob = bucket.blob(path)
+    if not blob.exists():
+        return None
+    return json.loads(blob.download_as_text())
+
+
+def write_json_state(path: str, data: Any):
+    """Counterpart of read_json_state"""
+    env = os.getenv("ENVIRONMENT", "windows").lower()
+
+    if env == "linux":
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so a crash mid-write never leaves a
+        # truncated file behind.
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return
+
+    bucket = get_gcs_bucket()
+    if not bucket:
+        return
+    blob = bucket.blob(path)
+    blob.upload_from_string(
+        json.dumps(data, ensure_ascii=False), content_type="application/json"
+    )
+
+
+def delete_json_state(path: str):
+    """Remove a state file written by write_json_state, if it exists"""
+    env = os.getenv("ENVIRONMENT", "windows").lower()
+
+    if env == "linux":
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    bucket = get_gcs_bucket()
+    if not bucket:
+        return
+    blob = bucket.blob(path)
+    if blob.exists():
+        blob.delete()
+
+
+def list_json_state(directory: str) -> list[str]:
+    """Names of the state files directly under `directory`"""
+    env = os.getenv("ENVIRONMENT", "windows").lower()
+
+    if env == "linux":
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name for name in os.listdir(directory) if name.endswith(".json"))
+
+    bucket = get_gcs_bucket()
+    if not bucket:
+        return []
+    prefix = f"{directory}/"
+    return sorted(
+        blob.name[len(prefix) :]
+        for blob in bucket.list_blobs(prefix=prefix)
+        if blob.name.endswith(".json") and "/" not in blob.name[len(prefix) :]
+    )
+
+
 def load_previous_lectures() -> list[dict]:
     """Load previously scraped lectures from GCS or locally"""
     env = os.getenv("ENVIRONMENT", "windows").lower()
     
     if env == "linux":
         try:
-            if os.path.exists("lectures.json"):
-                with open("lectures.json", "r", encoding="utf-8") as f:
+            if os.path.exists(LECTURES_FILE):
+                with open(LECTURES_FILE, "r", encoding="utf-8") as f:
                     return json.load(f)
         except Exception as e:
             logger.warning(f"Could not load previous lectures locally: {e}")
@@ -89,7 +178,7 @@ def load_previous_lectures() -> list[dict]:
         bucket = get_gcs_bucket()
         if not bucket:
             return []
-        blob = bucket.blob("lectures_data.json")
+        blob = bucket.blob(LECTURES_BLOB)
         if blob.exists():
             data = blob.download_as_text()
             return json.loads(data)
@@ -104,9 +193,9 @@ def save_lectures(lectures: list[dict]):
     
     if env == "linux":
         try:
-            with open("lectures.json", "w", encoding="utf-8") as f:
+            with open(LECTURES_FILE, "w", encoding="utf-8") as f:
                 json.dump(lectures, f, ensure_ascii=False, indent=4)
-            logger.info("Saved lectures to lectures.json locally")
+            logger.info(f"Saved lectures to {LECTURES_FILE} locally")
         except Exception as e:
             logger.error(f"Could not save lectures locally: {e}")
         return
@@ -115,7 +204,7 @@ def save_lectures(lectures: list[dict]):
         bucket = get_gcs_bucket()
         if not bucket:
             return
-        blob = bucket.blob("lectures_data.json")
+        blob = bucket.blob(LECTURES_BLOB)
         blob.upload_from_string(
             json.dumps(lectures, indent=2), content_type="application/json"
         )
@@ -143,34 +232,35 @@ def save_screenshot_to_gcs(browser, filename: str):
             return
 
     # GCS logic for other environments (e.g., GCP)
-    print(f"DEBUG: save_screenshot_to_gcs called for {filename}", flush=True)
+    logger.debug(f"save_screenshot_to_gcs called for {filename}")
     try:
         bucket = get_gcs_bucket()
         if not bucket:
             logger.warning(f"GCS_BUCKET_NAME not set. Cannot save {filename}")
-            print(f"DEBUG: No bucket found for {filename}", flush=True)
             return
 
         logger.info(f"Taking screenshot: {filename}")
-        print(f"DEBUG: Taking screenshot for {filename}...", flush=True)
 
         # Get screenshot as bytes directly from memory
         screenshot_png = browser.get_screenshot_as_png()
-        print(f"DEBUG: Screenshot taken, size: {len(screenshot_png)} bytes", flush=True)
+        logger.debug(f"Screenshot taken, size: {len(screenshot_png)} bytes")
 
         blob = bucket.blob(filename)
         blob.upload_from_string(screenshot_png, content_type="image/png")
 
         logger.info(f"Successfully saved screenshot {filename} to GCS")
-        print(f"DEBUG: Uploaded {filename} to GCS successfully", flush=True)
 
     except Exception as e:
         logger.error(f"Could not save screenshot to GCS: {e}")
-        print(f"DEBUG: Exception in save_screenshot_to_gcs: {e}", flush=True)
 
 
 def close_notifications(browser):
     """Close the notification box if it exists"""
+    from selenium.common.exceptions import NoSuchElementException, TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     try:
         notification_close = WebDriverWait(browser, 5).until(
             EC.presence_of_element_located(
@@ -184,3 +274,79 @@ def close_notifications(browser):
         logger.info("No notification close button found, continuing...")
     except TimeoutException:
         logger.info("No notification close button found within timeout, continuing...")
+
+
+# Requests not needed to read lecture details once we are logged in. Blocking is
+# done by URL pattern through CDP; reCAPTCHA is never blocked so that a session
+# refresh still scores well.
+LEAN_MODE_BLOCKED_URLS = [
+    "*.png",
+    "*.jpg",
+    "*.jpeg",
+    "*.gif",
+    "*.webp",
+    "*.svg",
+    "*.ico",
+    "*.woff",
+    "*.woff2",
+    "*.ttf",
+    "*.otf",
+    "*.eot",
+    "*.mp4",
+    "*.webm",
+    "*fonts.googleapis.com*",
+    "*fonts.gstatic.com*",
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*facebook.net*",
+    "*doubleclick.net*",
+]
+
+
+def enable_lean_mode(browser) -> bool:
+    """Block images, fonts, media and trackers for the rest of the session.
+    Must only be called after login: reCAPTCHA scores drop on stripped pages."""
+    if os.getenv("LEAN_MODE", "true").lower() != "true":
+        return False
+
+    try:
+        browser.execute_cdp_cmd("Network.enable", {})
+        browser.execute_cdp_cmd(
+            "Network.setBlockedURLs", {"urls": LEAN_MODE_BLOCKED_URLS}
+        )
+        logger.info("Lean mode enabled: blocking non-essential resources")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not enable lean mode, loading pages fully: {e}")
+        return False
+
+
+def disable_lean_mode(browser):
+    """Stop blocking resources, e.g. to log in again mid-session"""
+    if os.getenv("LEAN_MODE", "true").lower() != "true":
+        return
+    try:
+        browser.execute_cdp_cmd("Network.setBlockedURLs", {"urls": []})
+    except Exception as e:
+        logger.warning(f"Could not disable lean mode: {e}")
+
+
+def capture_lecture_html(browser) -> str:
+    """Return only the lecture content container's HTML, falling back to the
+    whole page source if the container is not on the page"""
+    selector = os.getenv("LECTURE_CONTENT_SELECTOR", "div.app-content.content")
+    if os.getenv("LEAN_MODE", "true").lower() == "true":
+        try:
+            html = browser.execute_script(
+                "const el = document.querySelector(arguments[0]);"
+                "return el ? el.outerHTML : null;",
+                selector,
+            )
+            if html:
+                return html
+            logger.warning(
+                f"Lecture container '{selector}' not found; using full page source"
+            )
+        except Exception as e:
+            logger.warning(f"Could not capture lecture container: {e}")
+    return browser.page_source
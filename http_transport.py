@@ -0,0 +1,161 @@
+"""One pooled HTTP session for every outbound call (Brevo, ntfy, Telegram...).
+
+Connections are kept alive and reused, so only the first call to a host pays
+for the TLS handshake. Every call gets a connect and a read timeout. Failed
+calls are retried with exponential backoff when that is safe: the method is
+idempotent, the caller opted in with `retry=True`, or the connection was
+never made. Per-host request counts and timings are kept for the run summary.
+
+Nothing here logs: error_notifier sends through this module, and an error
+logged here would be reported through it again.
+"""
+
+import os
+import threading
+import time
+from typing import Any
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from error_notifier import install_exception_hook
+
+install_exception_hook(__name__)
+
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+HTTP_READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF_SECONDS = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", "0.5"))
+# Longest a Retry-After header may make a caller (or a channel thread) wait
+HTTP_MAX_RETRY_AFTER_SECONDS = float(os.getenv("HTTP_MAX_RETRY_AFTER_SECONDS", "10"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session: requests.Session | None = None
+_lock = threading.Lock()
+# host -> counters, see http_stats
+_stats: dict[str, dict[str, Any]] = {}
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _timeouts(timeout: float | tuple[float, float] | None) -> tuple[float, float]:
+    """(connect, read); a single number caps both"""
+    if timeout is None:
+        return HTTP_CONNECT_TIMEOUT_SECONDS, HTTP_READ_TIMEOUT_SECONDS
+    if isinstance(timeout, tuple):
+        return timeout
+    return min(HTTP_CONNECT_TIMEOUT_SECONDS, timeout), timeout
+
+
+def _record(host: str, seconds: float, error: bool, retried: bool):
+    with _lock:
+        stats = _stats.setdefault(
+            host,
+            {"requests": 0, "errors": 0, "retries": 0, "seconds": 0.0, "max": 0.0},
+        )
+        stats["requests"] += 1
+        stats["errors"] += error
+        stats["retries"] += retried
+        stats["seconds"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+
+
+def http_stats() -> dict[str, dict]:
+    """host -> requests, errors, retries and total/mean/max seconds"""
+    with _lock:
+        return {
+            host: {
+                "requests": stats["requests"],
+                "errors": stats["errors"],
+                "retries": stats["retries"],
+                "total_seconds": round(stats["seconds"], 3),
+                "mean_seconds": round(stats["seconds"] / stats["requests"], 3),
+                "max_seconds": round(stats["max"], 3),
+            }
+            for host, stats in _stats.items()
+        }
+
+
+def reset_http_stats():
+    with _lock:
+        _stats.clear()
+
+
+def _retry_delay(attempt: int, response: requests.Response | None) -> float:
+    # Not `if response`: a Response is falsy for error statuses
+    if response is None:
+        return HTTP_RETRY_BACKOFF_SECONDS * 2**attempt
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return min(float(retry_after), HTTP_MAX_RETRY_AFTER_SECONDS)
+    return HTTP_RETRY_BACKOFF_SECONDS * 2**attempt
+
+
+def request(
+    method: str,
+    url: str,
+    timeout: float | tuple[float, float] | None = None,
+    retry: bool | None = None,
+    retries: int = HTTP_RETRIES,
+    **kwargs,
+) -> requests.Response:
+    """`requests.request` through the shared session. Retries connection
+    errors and RETRY_STATUSES when `retry` (by default: the method is
+    idempotent); a call that never connected is always retried. Returns the
+    last response, whatever its status, or raises the last error."""
+    method = method.upper()
+    if retry is None:
+        retry = method in IDEMPOTENT_METHODS
+    host = urlsplit(url).netloc
+    session = get_session()
+
+    attempt = 0
+    while True:
+        started_at = time.monotonic()
+        response = None
+        try:
+            response = session.request(
+                method, url, timeout=_timeouts(timeout), **kwargs
+            )
+        except requests.exceptions.ConnectTimeout:
+            # Nothing was sent, so even a POST can go again
+            can_retry = attempt < retries
+            _record(host, time.monotonic() - started_at, True, can_retry)
+            if not can_retry:
+                raise
+        except (requests.ConnectionError, requests.Timeout):
+            can_retry = retry and attempt < retries
+            _record(host, time.monotonic() - started_at, True, can_retry)
+            if not can_retry:
+                raise
+        else:
+            failed = response.status_code in RETRY_STATUSES
+            can_retry = failed and retry and attempt < retries
+            _record(host, time.monotonic() - started_at, failed, can_retry)
+            if not can_retry:
+                return response
+        time.sleep(_retry_delay(attempt, response))
+        attempt += 1
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
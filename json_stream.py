@@ -0,0 +1,68 @@
+import json
+from typing import Iterable, Iterator
+
+from error_notifier import install_exception_hook
+
+install_exception_hook(__name__)
+
+
+class TruncatedJSONError(ValueError):
+    """The stream ended before the top-level JSON array was closed"""
+
+
+def iter_json_array_objects(chunks: Iterable[str]) -> Iterator[dict]:
+    """Incrementally parse a streamed JSON array of objects.
+
+    Each top-level object is yielded as soon as its closing brace arrives, no
+    matter how the text is split across chunks. If the stream stops before the
+    array is closed, the objects completed so far have already been yielded and
+    TruncatedJSONError is raised.
+    """
+    buffer = ""
+    # Position in `buffer` scanned so far and start of the current object
+    pos = 0
+    object_start = -1
+    depth = 0
+    in_string = False
+    escaped = False
+    array_started = False
+    array_closed = False
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+        while pos < len(buffer):
+            char = buffer[pos]
+            if in_string:
+                if escaped:
+                    escaped = False
+                elif char == "\\":
+                    escaped = True
+                elif char == '"':
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char == "[" and not array_started:
+                array_started = True
+            elif char == "{":
+                if depth == 0:
+                    object_start = pos
+                depth += 1
+            elif char == "}":
+                depth -= 1
+                if depth == 0:
+                    yield json.loads(buffer[object_start : pos + 1])
+                    # Drop the parsed text so the buffer only holds one object
+                    buffer = buffer[pos + 1 :]
+                    pos = -1
+                    object_start = -1
+            elif char == "]" and depth == 0:
+                array_closed = True
+            pos += 1
+
+    if not array_closed:
+        raise TruncatedJSONError(
+            "Stream ended before the JSON array was complete"
+            + (" (inside an object)" if depth else "")
+        )
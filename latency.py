@@ -0,0 +1,165 @@
+"""How long a new lecture takes from the portal to subscribers' inboxes.
+
+Each new lecture carries three timestamps, stored with it in the lecture state:
+    first_seen_at   the run that first found its href on the timeline
+    extracted_at    its Gemini batch completed
+    emailed_at      Brevo accepted the email that announced it
+A lecture whose email failed keeps its first sighting for the retry, in
+LATENCY_FILE next to the delivered samples of the last LATENCY_WINDOW_DAYS.
+GET /latency reports percentiles and a histogram over that window.
+"""
+
+import math
+import os
+from datetime import datetime, timedelta, timezone
+
+from error_notifier import install_exception_hook
+from helpers import read_json_state, write_json_state
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+LATENCY_FILE = "latency.json"
+LATENCY_WINDOW_DAYS = int(os.getenv("LATENCY_WINDOW_DAYS", "30"))
+PERCENTILES = [50, 90, 95, 99]
+# Upper bounds of the histogram buckets, in minutes
+HISTOGRAM_MINUTES = [1, 2, 5, 10, 15, 30, 60, 120, 240, 480]
+# (name, from, to) of every latency that is reported
+SPANS = [
+    ("total", "first_seen_at", "emailed_at"),
+    ("sighting_to_extraction", "first_seen_at", "extracted_at"),
+    ("extraction_to_email", "extracted_at", "emailed_at"),
+]
+
+
+def timestamp() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def _parse(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    # Checkpoints of older runs were written in naive local time
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+def span_seconds(sample: dict, start: str, end: str) -> float | None:
+    started_at, ended_at = _parse(sample.get(start)), _parse(sample.get(end))
+    if started_at is None or ended_at is None:
+        return None
+    return max((ended_at - started_at).total_seconds(), 0.0)
+
+
+def lecture_timestamps(scraped: list[dict]) -> dict[str, dict]:
+    """href -> first_seen_at/extracted_at of the lectures a run extracted"""
+    return {
+        lecture["href"]: {
+            "first_seen_at": lecture.get("first_seen_at"),
+            "extracted_at": lecture.get("extracted_at"),
+        }
+        for lecture in scraped
+        if lecture.get("href")
+    }
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile of sorted `values`"""
+    rank = max(math.ceil(pct * len(values) / 100), 1)
+    return values[rank - 1]
+
+
+def histogram(values: list[float]) -> list[dict]:
+    buckets = [{"le_minutes": bound, "count": 0} for bound in HISTOGRAM_MINUTES]
+    buckets.append({"le_minutes": None, "count": 0})
+    for value in values:
+        for bucket in buckets:
+            if bucket["le_minutes"] is None or value <= bucket["le_minutes"] * 60:
+                bucket["count"] += 1
+                break
+    return buckets
+
+
+def summarize(values: list[float]) -> dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    summary: dict = {"count": len(values)}
+    for pct in PERCENTILES:
+        summary[f"p{pct}_seconds"] = round(percentile(values, pct), 1)
+    summary["max_seconds"] = round(values[-1], 1)
+    return summary
+
+
+class LatencyTracker:
+    def __init__(self, state: dict | None = None):
+        state = state or {}
+        # href -> earliest first_seen_at of a lecture not yet delivered
+        self.pending: dict[str, str] = state.get("pending", {})
+        self.samples: list[dict] = state.get("samples", [])
+
+    @classmethod
+    def load(cls) -> "LatencyTracker":
+        try:
+            return cls(read_json_state(LATENCY_FILE))
+        except Exception as e:
+            logger.warning(f"Could not load the latency history: {e}")
+            return cls()
+
+    def save(self):
+        cutoff = datetime.now(timezone.utc) - timedelta(days=LATENCY_WINDOW_DAYS)
+        self.samples = [
+            sample
+            for sample in self.samples
+            if (_parse(sample.get("emailed_at")) or cutoff) >= cutoff
+        ]
+        self.pending = {
+            href: seen_at
+            for href, seen_at in self.pending.items()
+            if (_parse(seen_at) or cutoff) >= cutoff
+        }
+        try:
+            write_json_state(
+                LATENCY_FILE, {"pending": self.pending, "samples": self.samples}
+            )
+        except Exception as e:
+            logger.warning(f"Could not save the latency history: {e}")
+
+    def sighted(self, href: str, timestamps: dict | None) -> dict:
+        """Timestamps of a new lecture, keeping the sighting of an earlier run
+        whose email failed"""
+        timestamps = dict(timestamps or {})
+        seen_at = self.pending.get(href) or timestamps.get("first_seen_at")
+        if seen_at:
+            timestamps["first_seen_at"] = seen_at
+            self.pending[href] = seen_at
+        return timestamps
+
+    def delivered(
+        self, stamped: dict[str, dict], emailed: set[str], emailed_at: str
+    ) -> list[dict]:
+        """Settle the new lectures of a successful email, given their `sighted`
+        timestamps, and record samples for the `emailed` ones (full lectures
+        are stored without being emailed)"""
+        samples = []
+        for href, timestamps in stamped.items():
+            self.pending.pop(href, None)
+            if href in emailed:
+                timestamps["emailed_at"] = emailed_at
+                samples.append({"href": href, **timestamps})
+        self.samples.extend(samples)
+        return samples
+
+    def report(self, samples: list[dict] | None = None) -> dict:
+        """Percentiles of every span, and a histogram of the total, over
+        `samples` (by default the whole window)"""
+        samples = self.samples if samples is None else samples
+        report: dict = {"window_days": LATENCY_WINDOW_DAYS}
+        for name, start, end in SPANS:
+            values = [span_seconds(sample, start, end) for sample in samples]
+            values = [value for value in values if value is not None]
+            report[name] = summarize(values)
+            if name == "total":
+                report["histogram"] = histogram(values)
+        report["pending"] = len(self.pending)
+        return report
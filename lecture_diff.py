@@ -0,0 +1,195 @@
+"""What changed between the stored lectures and the ones just scraped.
+
+Every lecture is reduced to a fingerprint: the tuple of its stored fields, in
+the normalized form of Lecture.to_dict. The stored lectures are indexed by
+href once, after which each scraped lecture costs one dict lookup and one
+tuple comparison. Only when the fingerprints differ is the stored lecture
+normalized (it may have been saved in an older format) and compared field by
+field.
+"""
+
+from typing import Any
+
+from error_notifier import install_exception_hook
+from lectures import Lecture
+
+install_exception_hook(__name__)
+
+TRACKED_FIELDS = [
+    "title",
+    "date",
+    "time",
+    "location",
+    "activity_hours",
+    "restrictions",
+    "max_registrations",
+    "current_registrations",
+    "start_date",
+    "end_date",
+    "officer_name",
+    "officer_email",
+    "officer_phone",
+]
+# Counts move on every run; they are kept up to date in the state but a change
+# to them alone is not worth an email, unless it frees a seat in a full lecture
+QUIET_FIELDS = {"current_registrations"}
+
+ADDED = "added"
+CHANGED = "changed"
+REMOVED = "removed"
+
+
+def fingerprint(stored: dict) -> tuple:
+    return tuple(stored.get(field) for field in TRACKED_FIELDS)
+
+
+def normalized_fingerprint(stored: dict) -> tuple:
+    return fingerprint(Lecture.from_dict(stored).to_dict())
+
+
+def build_index(previous_lectures: list[dict]) -> dict[str, dict]:
+    """href -> stored lecture"""
+    return {
+        stored["href"]: stored for stored in previous_lectures if stored.get("href")
+    }
+
+
+class LectureChange:
+    """One added, changed or removed lecture. `fields` maps each changed
+    field to its (old, new) stored value and is empty unless `kind` is CHANGED."""
+
+    __slots__ = ("kind", "lecture", "fields")
+
+    def __init__(
+        self,
+        kind: str,
+        lecture: Lecture,
+        fields: dict[str, tuple[Any, Any]] | None = None,
+    ):
+        self.kind = kind
+        self.lecture = lecture
+        self.fields = fields or {}
+
+    @property
+    def is_notable(self) -> bool:
+        """Worth telling subscribers about"""
+        return (
+            self.kind == ADDED
+            or self.seat_opened
+            or any(field not in QUIET_FIELDS for field in self.fields)
+        )
+
+    @property
+    def seat_opened(self) -> bool:
+        """The lecture was full and now has spots left"""
+        if self.lecture.is_full or "current_registrations" not in self.fields:
+            return False
+        old_current = self.fields["current_registrations"][0]
+        old_max = self.fields.get(
+            "max_registrations", (self.lecture.max_registrations,)
+        )[0]
+        if old_current is None or old_max is None:
+            return False
+        return old_current >= old_max
+
+    def __repr__(self) -> str:
+        fields = f", {sorted(self.fields)}" if self.fields else ""
+        return f"LectureChange({self.kind}, {self.lecture!r}{fields})"
+
+
+class LectureDiff:
+    def __init__(
+        self,
+        added: list[LectureChange],
+        changed: list[LectureChange],
+        removed: list[dict],
+    ):
+        self.added = added
+        self.changed = changed
+        # Stored lectures no longer listed; the state keeps every lecture ever
+        # seen, so these are only turned into records when asked for
+        self.removed_lectures = removed
+
+    @property
+    def removed(self) -> list[LectureChange]:
+        return [
+            LectureChange(REMOVED, Lecture.from_dict(stored))
+            for stored in self.removed_lectures
+        ]
+
+    @property
+    def updated(self) -> list[LectureChange]:
+        """Changed lectures subscribers should hear about"""
+        return [change for change in self.changed if change.is_notable]
+
+    @property
+    def state_changed(self) -> bool:
+        """Whether the stored state has to be rewritten. Removed lectures are
+        kept, so a lecture that shows up again is not announced twice."""
+        return bool(self.added or self.changed)
+
+    def summary(self) -> dict:
+        return {
+            "new_lectures": len(self.added),
+            "updated_lectures": len(self.updated),
+            "changed_lectures": len(self.changed),
+            "removed_lectures": len(self.removed_lectures),
+        }
+
+
+def diff_lectures(
+    current_lectures: list[Lecture], previous_lectures: list[dict]
+) -> LectureDiff:
+    """Added, changed and removed lectures, matched by href"""
+    index = build_index(previous_lectures)
+    added, changed = [], []
+    seen = set()
+    for lecture in current_lectures:
+        seen.add(lecture.href)
+        stored = index.get(lecture.href or "")
+        if stored is None:
+            added.append(LectureChange(ADDED, lecture))
+            continue
+        new = fingerprint(lecture.to_dict())
+        if new == fingerprint(stored):
+            continue
+        old = normalized_fingerprint(stored)
+        if new == old:
+            continue
+        fields = {
+            field: (old_value, new_value)
+            for field, old_value, new_value in zip(TRACKED_FIELDS, old, new)
+            if old_value != new_value
+        }
+        changed.append(LectureChange(CHANGED, lecture, fields))
+
+    removed = [
+        stored
+        for stored in previous_lectures
+        if stored.get("href") and stored["href"] not in seen
+    ]
+    return LectureDiff(added, changed, removed)
+
+
+def apply_diff(
+    previous_lectures: list[dict],
+    diff: LectureDiff,
+    added_fields: dict[str, dict] | None = None,
+) -> list[dict]:
+    """The state to store after `diff`: changed lectures updated in place,
+    keeping any extra keys stored with them, and added ones appended with
+    their `added_fields` (by href)"""
+    changed = {change.lecture.href: change.lecture for change in diff.changed}
+    state = [
+        (
+            {**stored, **changed[stored["href"]].to_dict()}
+            if stored.get("href") in changed
+            else stored
+        )
+        for stored in previous_lectures
+    ]
+    added_fields = added_fields or {}
+    return state + [
+        {**change.lecture.to_dict(), **added_fields.get(change.lecture.href or "", {})}
+        for change in diff.added
+    ]
@@ -0,0 +1,280 @@
+"""Typed lecture records.
+
+Gemini's output is validated once, through LectureData, and normalized into a
+Lecture: dates become `date`s, times `time`s and counts `int`s (dates and
+times that cannot be parsed keep their text), and the registration status is
+worked out up front, on the portal's calendar. Everything after extraction
+(the new-lecture diff, the email) reads these fields instead of re-parsing
+strings.
+Lectures are stored and checkpointed as plain dicts, see `to_dict`.
+"""
+
+import os
+import re
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from lecture_schema import LectureData
+
+DATE_FORMAT = "%d/%m/%Y"
+# Gemini sometimes answers in ISO format even though the portal does not use it
+DATE_FORMATS = [DATE_FORMAT, "%Y-%m-%d", "%d-%m-%Y"]
+TIME_PATTERN = re.compile(r"(\d{1,2})[:.](\d{2})\s*([AaPp][Mm])?")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# A time without AM/PM before this hour is more likely afternoon than night
+EARLIEST_LECTURE_HOUR = 7
+DAY_NAMES = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def portal_timezone() -> tzinfo:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+    try:
+        return ZoneInfo(os.getenv("SCHEDULE_TIMEZONE", "Asia/Amman"))
+    except ZoneInfoNotFoundError:
+        # Slim images may lack tzdata; Jordan is UTC+3 all year
+        return timezone(timedelta(hours=3))
+
+
+def portal_today() -> date:
+    """Today at the portal, which the registration dates refer to; the server
+    runs in UTC, which is still yesterday for the first hours of a day"""
+    return datetime.now(portal_timezone()).date()
+
+
+def parse_date(value: Any) -> date | None:
+    if not value:
+        return None
+    text = str(value).strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def format_date(value: date | None) -> str | None:
+    """DATE_FORMAT without strftime, which is slow for something done per card"""
+    if value is None:
+        return None
+    return f"{value.day:02d}/{value.month:02d}/{value.year}"
+
+
+def day_name(value: date) -> str:
+    return DAY_NAMES[value.weekday()]
+
+
+def _clock(hour: int, minute: int, meridiem: str) -> time | None:
+    if meridiem == "pm" and hour < 12:
+        hour += 12
+    elif hour == 12 and meridiem == "am":
+        hour = 0
+    if hour < 24 and minute < 60:
+        return time(hour, minute)
+    return None
+
+
+def parse_times(value: Any) -> tuple[time | None, time | None]:
+    """(start, end) from text like "10:00 - 11:30" or "2:00 - 3:30 PM". A time
+    without AM/PM takes the other one's, so the range stays in order. (None,
+    None) when the text is ambiguous: no AM/PM on a small-hours time, or an end
+    before the start; the raw text is kept for those."""
+    tokens = [
+        (int(hour), int(minute), meridiem.lower())
+        for hour, minute, meridiem in TIME_PATTERN.findall(str(value or ""))
+    ]
+    tokens = [token for token in tokens if _clock(*token)][:2]
+    if not tokens:
+        return None, None
+    if not any(meridiem for _, _, meridiem in tokens) and any(
+        0 < hour < EARLIEST_LECTURE_HOUR for hour, _, _ in tokens
+    ):
+        return None, None
+
+    if len(tokens) == 1:
+        return _clock(*tokens[0]), None
+    (start_hour, start_minute, start_m), (end_hour, end_minute, end_m) = tokens
+    if start_m and not end_m:
+        end = _clock(end_hour, end_minute, start_m)
+        start = _clock(*tokens[0])
+        if end and start and end < start:
+            end = _clock(end_hour, end_minute, "pm")
+    else:
+        end = _clock(*tokens[1])
+        start = _clock(start_hour, start_minute, start_m or end_m)
+        if start and end and start > end and not start_m:
+            # "11:00 - 1:00 PM" starts in the morning
+            start = _clock(start_hour, start_minute, "am")
+    if not (start and end) or end <= start:
+        return None, None
+    return start, end
+
+
+def parse_count(value: Any) -> int | None:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = NUMBER_PATTERN.search(str(value))
+    return int(float(match.group())) if match else None
+
+
+def parse_hours(value: Any) -> float | None:
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER_PATTERN.search(str(value))
+    return float(match.group()) if match else None
+
+
+def _text(value: Any) -> str | None:
+    text = " ".join(str(value).split()) if value is not None else ""
+    return text or None
+
+
+class Lecture:
+    """One lecture, with normalized fields and a precomputed registration status"""
+
+    __slots__ = (
+        "href",
+        "title",
+        "date",
+        "date_text",
+        "start_time",
+        "end_time",
+        "time_text",
+        "location",
+        "activity_hours",
+        "restrictions",
+        "max_registrations",
+        "current_registrations",
+        "start_date",
+        "start_date_text",
+        "end_date",
+        "end_date_text",
+        "officer_name",
+        "officer_email",
+        "officer_phone",
+        "is_full",
+        "spots_left",
+        "registration_open",
+        "registration_ended",
+    )
+
+    href: str | None
+    title: str | None
+    date: date | None
+    date_text: str | None
+    start_time: time | None
+    end_time: time | None
+    time_text: str | None
+    location: str | None
+    activity_hours: float | None
+    restrictions: str | None
+    max_registrations: int | None
+    current_registrations: int | None
+    start_date: date | None
+    start_date_text: str | None
+    end_date: date | None
+    end_date_text: str | None
+    officer_name: str | None
+    officer_email: str | None
+    officer_phone: str | None
+    is_full: bool
+    spots_left: int | None
+    registration_open: bool
+    registration_ended: bool
+
+    @classmethod
+    def from_dict(cls, data: dict, today: date | None = None) -> "Lecture":
+        """From a stored lecture or an already validated Gemini answer"""
+        lecture = cls()
+        lecture.href = _text(data.get("href"))
+        lecture.title = _text(data.get("title"))
+        lecture.date = parse_date(data.get("date"))
+        lecture.date_text = _text(data.get("date"))
+        lecture.start_time, lecture.end_time = parse_times(data.get("time"))
+        lecture.time_text = _text(data.get("time"))
+        lecture.location = _text(data.get("location"))
+        lecture.activity_hours = parse_hours(data.get("activity_hours"))
+        lecture.restrictions = _text(data.get("restrictions"))
+        lecture.max_registrations = parse_count(data.get("max_registrations"))
+        lecture.current_registrations = parse_count(data.get("current_registrations"))
+        lecture.start_date = parse_date(data.get("start_date"))
+        lecture.start_date_text = _text(data.get("start_date"))
+        lecture.end_date = parse_date(data.get("end_date"))
+        lecture.end_date_text = _text(data.get("end_date"))
+        lecture.officer_name = _text(data.get("officer_name"))
+        lecture.officer_email = _text(data.get("officer_email"))
+        lecture.officer_phone = _text(data.get("officer_phone"))
+        lecture.update_status(today)
+        return lecture
+
+    @classmethod
+    def from_model(cls, model: "LectureData") -> "Lecture":
+        return cls.from_dict(model.model_dump())
+
+    @classmethod
+    def from_gemini(cls, data: dict) -> "Lecture":
+        """Validate one object of Gemini's JSON answer against LectureData"""
+        from lecture_schema import LectureData
+
+        return cls.from_model(LectureData.model_validate(data))
+
+    def update_status(self, today: date | None = None):
+        """Recompute the registration status, e.g. after the counts changed"""
+        today = today or portal_today()
+        max_reg, current_reg = self.max_registrations, self.current_registrations
+        if max_reg is not None and current_reg is not None:
+            self.is_full = current_reg >= max_reg
+            self.spots_left = max(max_reg - current_reg, 0)
+        else:
+            self.is_full = False
+            self.spots_left = None
+        self.registration_ended = self.end_date is not None and self.end_date < today
+        self.registration_open = not self.registration_ended and (
+            self.start_date is None or self.start_date <= today
+        )
+
+    @property
+    def time_display(self) -> str | None:
+        """The time as "10:00 - 11:30" when it could be parsed, else the raw text"""
+        if self.start_time and self.end_time:
+            return f"{self.start_time:%H:%M} - {self.end_time:%H:%M}"
+        if self.start_time:
+            return f"{self.start_time:%H:%M}"
+        return self.time_text
+
+    def to_dict(self) -> dict:
+        """The stored form, with LectureData's keys and the portal's date format"""
+        hours = self.activity_hours
+        return {
+            "title": self.title,
+            "date": format_date(self.date) or self.date_text,
+            "time": self.time_display,
+            "location": self.location,
+            "activity_hours": None if hours is None else f"{hours:g}",
+            "restrictions": self.restrictions,
+            "max_registrations": self.max_registrations,
+            "current_registrations": self.current_registrations,
+            "start_date": format_date(self.start_date) or self.start_date_text,
+            "end_date": format_date(self.end_date) or self.end_date_text,
+            "officer_name": self.officer_name,
+            "officer_email": self.officer_email,
+            "officer_phone": self.officer_phone,
+            "href": self.href,
+        }
+
+    def __repr__(self) -> str:
+        return f"Lecture({self.title!r}, {self.date}, {self.href!r})"
@@ -0,0 +1,235 @@
+"""Read-only view of the saved lectures for GET /lectures.
+
+The latest saved state is held in memory and only read again when its
+generation changes: the GCS object generation, or the local file's mtime and
+size. Locally that is one stat per request; on GCS the generation is looked up
+at most every LECTURES_API_CHECK_SECONDS, and right away after this process
+saved the state itself.
+
+Every distinct filter combination is encoded (and gzipped, on demand) once per
+generation and day, so a repeated read is a dict lookup. Responses carry an
+ETag; a client sending it back in If-None-Match gets an empty 304. Filters
+take true or false, leaving one out means either:
+    upcoming    the lecture is today or later
+    open        registration is open and there are spots left
+    has_hours   the lecture counts for activity hours
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import date
+from typing import Any
+
+from flask import Request, Response
+
+from error_notifier import install_exception_hook
+from helpers import LECTURES_BLOB, LECTURES_FILE, get_gcs_bucket
+from lectures import Lecture, portal_today
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+LECTURES_API_CHECK_SECONDS = float(os.getenv("LECTURES_API_CHECK_SECONDS", "10"))
+FILTERS = ["upcoming", "open", "has_hours"]
+BOOLEAN_VALUES = {"true": True, "1": True, "false": False, "0": False}
+
+
+class FilterError(ValueError):
+    pass
+
+
+def parse_filters(args: Any) -> tuple[tuple[str, bool], ...]:
+    """(filter, wanted) pairs of the query string, in FILTERS order"""
+    unknown = set(args) - set(FILTERS)
+    if unknown:
+        raise FilterError(f"Unknown filters {sorted(unknown)}; use {FILTERS}")
+    filters = []
+    for name in FILTERS:
+        value = args.get(name)
+        if value is None:
+            continue
+        if value.lower() not in BOOLEAN_VALUES:
+            raise FilterError(f"{name} must be true or false, not {value!r}")
+        filters.append((name, BOOLEAN_VALUES[value.lower()]))
+    return tuple(filters)
+
+
+def matches(lecture: Lecture, name: str, today: date) -> bool:
+    if name == "upcoming":
+        return lecture.date is not None and lecture.date >= today
+    if name == "open":
+        return lecture.registration_open and not lecture.is_full
+    return bool(lecture.activity_hours)
+
+
+def api_lecture(stored: dict, lecture: Lecture) -> dict:
+    """The stored lecture with its registration status"""
+    return {
+        **stored,
+        "is_full": lecture.is_full,
+        "spots_left": lecture.spots_left,
+        "registration_open": lecture.registration_open,
+    }
+
+
+class Snapshot:
+    """One generation of the state as of one day, with its encoded responses"""
+
+    def __init__(self, generation: str, stored_lectures: list[dict], today: date):
+        self.generation = generation
+        self.today = today
+        records = [
+            (stored, Lecture.from_dict(stored, today)) for stored in stored_lectures
+        ]
+        # Soonest first, undated lectures last
+        records.sort(
+            key=lambda record: (record[1].date is None, record[1].date or today)
+        )
+        self.records = records
+        # filters -> encoded response, plain and gzipped
+        self.bodies: dict[tuple, bytes] = {}
+        self.gzipped: dict[tuple, bytes] = {}
+        self.lock = threading.Lock()
+
+    def etag(self, filters: tuple) -> str:
+        key = ",".join(f"{name}={int(wanted)}" for name, wanted in filters)
+        return f"{self.generation}-{self.today:%Y%m%d}-{key}"
+
+    def _encode(self, filters: tuple) -> bytes:
+        lectures = [
+            api_lecture(stored, lecture)
+            for stored, lecture in self.records
+            if all(
+                matches(lecture, name, self.today) == wanted
+                for name, wanted in filters
+            )
+        ]
+        data = {
+            "generation": self.generation,
+            "count": len(lectures),
+            "lectures": lectures,
+        }
+        return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+    def body(self, filters: tuple, gzipped: bool) -> bytes:
+        with self.lock:
+            if filters not in self.bodies:
+                self.bodies[filters] = self._encode(filters)
+            if not gzipped:
+                return self.bodies[filters]
+            if filters not in self.gzipped:
+                self.gzipped[filters] = gzip.compress(self.bodies[filters], 6)
+            return self.gzipped[filters]
+
+
+class LectureStore:
+    """The saved lectures, refreshed when the state's generation changes"""
+
+    def __init__(self):
+        self.snapshot: Snapshot | None = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self.bucket: Any = None
+        self.stats = {"loads": 0, "checks": 0, "load_errors": 0}
+
+    def invalidate(self):
+        """Look at the generation on the next read, e.g. after saving"""
+        self.checked_at = 0.0
+
+    def _local(self) -> bool:
+        return os.getenv("ENVIRONMENT", "windows").lower() == "linux"
+
+    def _generation(self) -> str | None:
+        """Generation of the saved state, None if there is none"""
+        if self._local():
+            try:
+                stat = os.stat(LECTURES_FILE)
+            except FileNotFoundError:
+                return None
+            return f"{stat.st_mtime_ns:x}.{stat.st_size:x}"
+
+        if self.bucket is None:
+            self.bucket = get_gcs_bucket()
+            if self.bucket is None:
+                return None
+        blob = self.bucket.get_blob(LECTURES_BLOB)
+        return None if blob is None else str(blob.generation)
+
+    def _load(self, generation: str) -> list[dict]:
+        if self._local():
+            with open(LECTURES_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        # Exactly the generation that was looked up, even if a run saves now
+        blob = self.bucket.blob(LECTURES_BLOB, generation=int(generation))
+        return json.loads(blob.download_as_text())
+
+    def current(self) -> Snapshot | None:
+        """The latest snapshot; the last good one while the state cannot be read"""
+        today = portal_today()
+        snapshot = self.snapshot
+        due = self._local() or (
+            time.monotonic() - self.checked_at >= LECTURES_API_CHECK_SECONDS
+        )
+        if snapshot and snapshot.today == today and not due:
+            return snapshot
+
+        with self.lock:
+            snapshot = self.snapshot
+            try:
+                self.stats["checks"] += 1
+                generation = self._generation()
+                self.checked_at = time.monotonic()
+                if generation is None:
+                    return snapshot
+                if (
+                    snapshot
+                    and snapshot.generation == generation
+                    and snapshot.today == today
+                ):
+                    return snapshot
+                if snapshot and snapshot.generation == generation:
+                    # A new day: same lectures, new statuses
+                    stored = [stored for stored, _ in snapshot.records]
+                else:
+                    stored = self._load(generation)
+                    self.stats["loads"] += 1
+                self.snapshot = Snapshot(generation, stored, today)
+            except Exception as e:
+                # e.g. a local save caught halfway; the next read tries again
+                self.stats["load_errors"] += 1
+                self.checked_at = 0.0
+                logger.warning(f"Could not refresh the lectures API state: {e}")
+            return self.snapshot
+
+    def response(self, request: Request) -> Response:
+        try:
+            filters = parse_filters(request.args)
+        except FilterError as e:
+            return _json_response({"error": str(e)}, 400)
+
+        snapshot = self.current()
+        if snapshot is None:
+            return _json_response({"error": "No lectures have been saved yet"}, 503)
+
+        gzipped = request.accept_encodings["gzip"] > 0
+        etag = snapshot.etag(filters) + ("-gzip" if gzipped else "")
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(
+                snapshot.body(filters, gzipped), mimetype="application/json"
+            )
+            if gzipped:
+                response.headers["Content-Encoding"] = "gzip"
+        response.set_etag(etag)
+        response.headers["Vary"] = "Accept-Encoding"
+        # Cacheable, but always revalidated with the ETag
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+
+def _json_response(data: dict, status: int) -> Response:
+    return Response(json.dumps(data), status=status, mimetype="application/json")
@@ -1,21 +1,167 @@
+import atexit
+import contextvars
+import json
 import logging
+import os
+import queue
 import sys
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Callable, ContextManager
 
-from error_notifier import NtfyErrorHandler, install_exception_hook
+from error_notifier import (
+    NtfyErrorHandler,
+    flush_notifications,
+    install_exception_hook,
+)
 
 install_exception_hook(__name__)
 
-# Configure the root logger
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[logging.StreamHandler(sys.stdout)],
+# "json" emits one Cloud Logging structured entry per line, "text" the old format
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+_run_id: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "run_id", default=None
+)
+_stage: contextvars.ContextVar[str | None] = contextvars.ContextVar(
+    "stage", default=None
 )
 
-logger = logging.getLogger("PSUT_SCRAPER")
+
+def set_run_id(run_id: str | None):
+    """Tag every following log record of this context with the run id"""
+    _run_id.set(run_id)
+
+
+def get_run_id() -> str | None:
+    return _run_id.get()
+
+
+_stage_seconds: dict[str, float] = {}
+_stage_seconds_lock = threading.Lock()
+# Context manager factories entered around every stage, e.g. the profiler
+stage_hooks: list[Callable[[str], ContextManager]] = []
+
+
+@contextmanager
+def stage(name: str):
+    """Tag log records emitted inside the block with the pipeline stage and
+    add the time spent in it to the stage timings"""
+    token = _stage.set(name)
+    started_at = time.perf_counter()
+    try:
+        with ExitStack() as hooks:
+            for hook in stage_hooks:
+                hooks.enter_context(hook(name))
+            yield
+    finally:
+        elapsed = time.perf_counter() - started_at
+        _stage.reset(token)
+        with _stage_seconds_lock:
+            _stage_seconds[name] = _stage_seconds.get(name, 0.0) + elapsed
+
+
+def get_stage_timings() -> dict[str, float]:
+    """Seconds spent per stage in this process since the last reset"""
+    with _stage_seconds_lock:
+        return {name: round(seconds, 3) for name, seconds in _stage_seconds.items()}
+
+
+def reset_stage_timings():
+    with _stage_seconds_lock:
+        _stage_seconds.clear()
+
+
+class Summary:
+    """Log argument that is only turned into text when the record is formatted,
+    on the listener thread. Use it instead of formatting large payloads:
+
+        logger.info("Scraped %s", Summary(lectures))
+    """
+
+    __slots__ = ("value", "max_length")
+
+    def __init__(self, value: object, max_length: int = 300):
+        self.value = value
+        self.max_length = max_length
+
+    def __str__(self) -> str:
+        value = self.value
+        if isinstance(value, (list, tuple, set, dict)):
+            # Only the first few items are ever rendered
+            head = ", ".join(repr(item) for item in list(value)[:3])
+            text = f"{type(value).__name__}[{len(value)}]: {head}"
+        else:
+            text = repr(value)
+        if len(text) > self.max_length:
+            text = text[: self.max_length - 3] + "..."
+        return text
+
+
+class _ContextQueueHandler(QueueHandler):
+    """Enqueue records without formatting them.
+
+    The stock QueueHandler formats the message in the caller's thread. Here only
+    the run id and stage are captured (they live in context variables of the
+    caller); message formatting happens on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.run_id = _run_id.get()
+        record.stage = _stage.get()
+        return record
+
+
+class CloudLoggingFormatter(logging.Formatter):
+    """One JSON object per line, parsed by Cloud Logging into structured entries"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "severity": record.levelname,
+            "message": record.getMessage(),
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "logger": record.name,
+            "run_id": getattr(record, "run_id", None),
+            "stage": getattr(record, "stage", None),
+            "thread": record.threadName,
+            "logging.googleapis.com/sourceLocation": {
+                "file": record.pathname,
+                "line": record.lineno,
+                "function": record.funcName,
+            },
+        }
+        if record.exc_info:
+            entry["message"] += "\n" + self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+stream_handler = logging.StreamHandler(sys.stdout)
+if LOG_FORMAT == "json":
+    stream_handler.setFormatter(CloudLoggingFormatter())
+else:
+    stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
 
 ntfy_handler = NtfyErrorHandler(level=logging.ERROR)
-ntfy_handler.setFormatter(
-    logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+ntfy_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+# Only our own errors page the operator, not third-party library noise
+ntfy_handler.addFilter(logging.Filter("PSUT_SCRAPER"))
+
+log_queue: queue.SimpleQueue = queue.SimpleQueue()
+listener = QueueListener(
+    log_queue, stream_handler, ntfy_handler, respect_handler_level=True
 )
-logger.addHandler(ntfy_handler)
+
+# Configure the root logger
+logging.basicConfig(level=logging.INFO, handlers=[_ContextQueueHandler(log_queue)])
+listener.start()
+
+# atexit runs in reverse order: drain the log queue first, then send whatever
+# it handed to the ntfy worker.
+atexit.register(flush_notifications)
+atexit.register(listener.stop)
+
+logger = logging.getLogger("PSUT_SCRAPER")
@@ -4,38 +4,85 @@ import time
 import traceback
 from contextlib import contextmanager, suppress
 from datetime import datetime
+from typing import TYPE_CHECKING, Any, Callable, Iterable, Iterator
 
-import undetected_chromedriver as uc
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
-from flask import Flask, jsonify
-from google import genai
-from google.genai import errors, types
-from pydantic import BaseModel, Field
-from selenium.common.exceptions import TimeoutException
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
+from flask import Flask, jsonify, request
 
 import logger_setup
+from adaptive_scheduler import AdaptiveScheduler, current_plan, portal_timezone
+from checkpoints import (
+    RunCheckpoint,
+    complete_checkpoint,
+    load_resumable_checkpoint,
+    save_checkpoint,
+)
+from driver_provisioning import get_driver_for_browser
 from error_notifier import install_exception_hook
+from gemini_replay import ReplayClient
+from gemini_scheduler import GeminiScheduler, create_scheduler
+from http_transport import http_stats, reset_http_stats
 from helpers import (
+    capture_lecture_html,
     clean_html,
     close_notifications,
+    enable_lean_mode,
     load_previous_lectures,
     parse_gemini_error,
     save_lectures,
     save_screenshot_to_gcs,
 )
-from send_emails import send_brevo_email
+from json_stream import TruncatedJSONError, iter_json_array_objects
+from latency import LatencyTracker, lecture_timestamps, timestamp
+from lecture_diff import apply_diff, diff_lectures
+from lectures import Lecture
+from lectures_api import LectureStore
+from logger_setup import (
+    Summary,
+    get_stage_timings,
+    reset_stage_timings,
+    set_run_id,
+    stage,
+)
+from notifications import (
+    Notification,
+    create_dispatcher,
+    wait_for_optional_channels,
+)
+from pipeline import LecturePipeline
+from profiling import enable_profiling
+from scraper_worker import run_scraper_in_worker
+
+# Chrome, selenium, bs4, google-genai and pydantic are imported inside the stage
+# that needs them so that gunicorn can serve the first request without paying
+# for them. Check the cost with `python startup_report.py`.
+if TYPE_CHECKING:
+    import undetected_chromedriver as uc
 
 load_dotenv()
 install_exception_hook("main")
 # Define globals
 USERNAME: str = os.getenv("PSUT_USERNAME", "")
 PASSWORD: str = os.getenv("PSUT_PASSWORD", "")
+# Overridable so the offline benchmark can point the scraper at a fake portal
+PORTAL_URL: str = os.getenv("PORTAL_URL", "https://portal.psut.edu.jo").rstrip("/")
+# Only used when the installed browser version cannot be detected
+CHROME_VERSION_MAIN = int(os.getenv("CHROME_VERSION_MAIN", "147"))
+# Starts every extraction request, ahead of the pages, so Gemini's implicit
+# caching can match it once the prompt is long enough
+EXTRACTION_INSTRUCTIONS = """
+        Extract all information from the html pages mentioned in the schema, adhere to it STRICTLY.
+        The information you have to extract is: title, date, time, location, activity_hours, restrictions, max_registrations, current_registrations, start_date, end_date, officer_name, officer_email, officer_phone, href.
+        Note: The href (Source URL) is provided at the top of each page content.
+        Here are the HTML pages:
+
+        """
 logger = logger_setup.logger
 app = Flask(__name__)
+# Set when this process runs the adaptive schedule itself, see __main__
+scheduler: AdaptiveScheduler | None = None
+# Serves GET /lectures from memory; told when a run saves new state
+lecture_store = LectureStore()
 
 
 @contextmanager
@@ -106,125 +153,231 @@ def start_virtual_display():
     raise last_error
 
 
-class LectureData(BaseModel):
-    title: str | None = Field(description="Title of the lecture")
-    date: str | None = Field(description="Date of the lecture")
-    time: str | None = Field(description="Time of the lecture")
-    location: str | None = Field(description="Location of the lecture")
-    activity_hours: str | None = Field(
-        description="Number of activity hours, marked under Activity Hours"
-    )
-    restrictions: str | None = Field(
-        description="Any restrictions for the lecture, marked by Registration Conditions"
-    )
-    max_registrations: int | None = Field(
-        description="Maximum number of registrations allowed, marked under Maximum Registration"
-    )
-    current_registrations: int | None = Field(
-        description="Current number of registrations, marked under Registered Count:"
-    )
-    start_date: str | None = Field(
-        description="Start date for registration, marked under Subscription and withdrawal Period"
-    )
-    end_date: str | None = Field(
-        description="End date for registration, marked under Subscription and withdrawal Period"
-    )
-    officer_name: str | None = Field(
-        description="Name of the officer in charge, marked under Activity Officer"
+def wait_for_lecture_page(browser: "uc.Chrome"):
+    """Wait until a freshly opened lecture page can be captured"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    # Wait for the page to load - wait for body first, then the dynamic element
+    WebDriverWait(browser, 10).until(
+        EC.presence_of_element_located((By.TAG_NAME, "body"))
     )
-    officer_email: str | None = Field(
-        description="Email of the officer in charge, marked under Activity Officer"
+    # Small delay to allow JavaScript to initialize dynamic content
+    time.sleep(1)
+
+
+def fetch_lecture_pages(browser: "uc.Chrome", lecture_hrefs: list[str]):
+    """Open every lecture page in turn and yield (href, raw page source).
+    Runs on the caller's thread since WebDriver is not thread-safe."""
+    original_window = browser.current_window_handle
+    for href in lecture_hrefs:
+        # Open the link in a new tab
+        browser.execute_script("window.open(arguments[0]);", href)
+
+        # Switch to the new tab
+        browser.switch_to.window(browser.window_handles[-1])
+        wait_for_lecture_page(browser)
+
+        page_source = capture_lecture_html(browser)
+
+        # Close the tab if we're not on the original window
+        if browser.current_window_handle != original_window:
+            browser.close()
+        # Switch back to the original window
+        browser.switch_to.window(original_window)
+
+        # Cleaning and extraction happen in the pipeline workers
+        yield href, page_source
+
+        # Small delay to let the browser stabilize
+        time.sleep(0.5)
+
+
+def clean_lecture_page(href: str, page_source: str) -> str:
+    page_content = clean_html(page_source)
+    # Add the href to the page content so Gemini can extract it
+    return f"Source URL: {href}\n{page_content}"
+
+
+def lecture_batch_size(page_count: int) -> int:
+    # Split the pages into batches to avoid token limits
+    # Use a minimum batch size of 5, or all pages if fewer than 5
+    return max(5, (page_count + 1) // 2)
+
+
+def stream_lectures(chunks: Iterable) -> Iterator[Lecture]:
+    """Yield every lecture of a streamed Gemini response as soon as it is complete"""
+    texts = (chunk.text or "" for chunk in chunks)
+    for obj in iter_json_array_objects(texts):
+        yield Lecture.from_gemini(obj)
+
+
+def record_batch(checkpoint: RunCheckpoint, hrefs: list[str], lectures: list[dict]):
+    # Checkpoint the batch so a later failure does not cost its tokens again
+    checkpoint.add_batch(hrefs, lectures)
+    if checkpoint.pages:
+        for href in hrefs:
+            checkpoint.pages.pop(href, None)
+    save_checkpoint(checkpoint)
+
+
+def extract_batch(
+    scheduler: GeminiScheduler,
+    system_prompt: str,
+    batch: list[tuple[str, str]],
+    checkpoint: RunCheckpoint,
+) -> list[dict]:
+    """Extract one batch of (href, cleaned page) pairs and checkpoint the result.
+    With GEMINI_STREAMING=true, lectures are parsed as they are streamed, so a
+    truncated answer still keeps the lectures completed before it broke off."""
+    from google.genai import errors, types
+
+    from lecture_schema import LectureData
+
+    combined_pages = "\n\n<<<NEXT_PAGE_SEPARATOR>>>\n\n".join(
+        page for _, page in batch
     )
-    officer_phone: str | None = Field(
-        description="Phone number of the officer in charge, marked under Activity Officer"
+    request = dict(
+        config=types.GenerateContentConfig(
+            system_instruction=system_prompt,
+            thinking_config=types.ThinkingConfig(thinking_budget=0),
+            response_mime_type="application/json",
+            response_schema=list[LectureData],
+        ),
+        contents=[EXTRACTION_INSTRUCTIONS + combined_pages],
     )
-    href: str | None = Field(description="The source URL of the lecture page")
+    batch_hrefs = [href for href, _ in batch]
+    batch_data: list[dict] = []
+
+    try:
+        if os.getenv("GEMINI_STREAMING", "false").lower() == "true":
+            stream = scheduler.generate_content_stream(**request)
+            for lecture in stream_lectures(stream):
+                batch_data.append(lecture.to_dict())
+        else:
+            response = scheduler.generate_content(**request)
+            if response.text is None:
+                raise Exception("Gemini API returned no text in the response.")
+            batch_data = [
+                Lecture.from_gemini(obj).to_dict() for obj in json.loads(response.text)
+            ]
+        logger.info(f"Processed batch of {len(batch_data)} lectures")
+
+    except errors.APIError as e:
+        raise Exception(f"Gemini API Error: {parse_gemini_error(e)}")
+    except TruncatedJSONError:
+        # Keep what was completed; the missing pages stay pending for a retry
+        streamed_hrefs = {lecture.get("href") for lecture in batch_data}
+        record_batch(
+            checkpoint,
+            [href for href in batch_hrefs if href in streamed_hrefs],
+            batch_data,
+        )
+        raise Exception(
+            f"Gemini stream was truncated after {len(batch_data)} "
+            f"of {len(batch)} lectures"
+        )
+
+    record_batch(checkpoint, batch_hrefs, batch_data)
+    return batch_data
+
+
+def extract_lectures(
+    scheduler: GeminiScheduler,
+    system_prompt: str,
+    checkpoint: RunCheckpoint,
+) -> list[dict]:
+    """Run Gemini over the checkpointed pages, skipping batches that were
+    already extracted by an earlier attempt of the same run"""
+    done_hrefs = checkpoint.extracted_hrefs()
+    pending = [
+        (href, page)
+        for href, page in (checkpoint.pages or {}).items()
+        if href not in done_hrefs
+    ]
+    if done_hrefs:
+        logger.info(
+            f"Resuming extraction: {len(done_hrefs)} pages already extracted, "
+            f"{len(pending)} remaining"
+        )
+
+    batch_size = lecture_batch_size(len(pending))
+    for i in range(0, len(pending), batch_size):
+        batch = pending[i : i + batch_size]
+        extract_batch(scheduler, system_prompt, batch, checkpoint)
+
+    lectures_data = checkpoint.extracted_lectures()
+    logger.info(f"Done Scraping {len(lectures_data)} lectures")
+    return lectures_data
 
 
 def scrape_lectures(
-    browser: uc.Chrome, model_name: str, system_prompt: str, lecture_hrefs: list[str]
+    browser: "uc.Chrome",
+    scheduler: GeminiScheduler,
+    system_prompt: str,
+    lecture_hrefs: list[str],
+    checkpoint: RunCheckpoint,
 ) -> list[dict]:
-    lectures_html_pages = []
-    lectures_data = []
-    original_window = browser.current_window_handle
-    try:
-        for href in lecture_hrefs:
-            # Open the link in a new tab
-            browser.execute_script("window.open(arguments[0]);", href)
-
-            # Switch to the new tab
-            browser.switch_to.window(browser.window_handles[-1])
-            # Wait for the page to load - wait for body first, then the dynamic element
-            WebDriverWait(browser, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
-            # Small delay to allow JavaScript to initialize dynamic content
-            time.sleep(1)
-
-            page_content = clean_html(browser.page_source)
-            # Add the href to the page content so Gemini can extract it
-            page_content_with_href = f"Source URL: {href}\n{page_content}"
-            # Get the data needed from Gemini:
-            lectures_html_pages.append(page_content_with_href)
-
-            # Close the tab if we're not on the original window
-            if browser.current_window_handle != original_window:
-                browser.close()
-            # Switch back to the original window
-            browser.switch_to.window(original_window)
-            # Small delay to let the browser stabilize
-            time.sleep(0.5)
-
-        # Split the pages into batches to avoid token limits
-        # Use a minimum batch size of 5, or all pages if fewer than 5
-        batch_size = max(5, (len(lectures_html_pages) + 1) // 2)
-        for i in range(0, len(lectures_html_pages), batch_size):
-            batch_pages = lectures_html_pages[i : i + batch_size]
-            combined_pages = "\n\n<<<NEXT_PAGE_SEPARATOR>>>\n\n".join(batch_pages)
+    """Fetch lecture pages and extract them with Gemini, overlapping both.
+    Pages already extracted by an earlier attempt of this run are not fetched."""
+    done_hrefs = checkpoint.extracted_hrefs()
+    pending_hrefs = [href for href in lecture_hrefs if href not in done_hrefs]
+    if done_hrefs:
+        logger.info(
+            f"Resuming fetch: {len(done_hrefs)} pages already extracted, "
+            f"{len(pending_hrefs)} remaining"
+        )
 
-            try:
-                client = genai.Client(api_key=os.getenv("GEMINI_API_KEY", ""))
-                response = client.models.generate_content(
-                    model=model_name,
-                    config=types.GenerateContentConfig(
-                        system_instruction=system_prompt,
-                        thinking_config=types.ThinkingConfig(thinking_budget=0),
-                        response_mime_type="application/json",
-                        response_schema=list[LectureData],
-                    ),
-                    contents=[
-                        f"""
-                    Extract all information from the html pages mentioned in the schema, adhere to it STRICTLY.
-                    The information you have to extract is: title, date, time, location, activity_hours, restrictions, max_registrations, current_registrations, start_date, end_date, officer_name, officer_email, officer_phone, href.
-                    Note: The href (Source URL) is provided at the top of each page content.
-                    Here are the HTML pages:
-
-                    {combined_pages}"""
-                    ],
-                )
-                if response.text is None:
-                    raise Exception("Gemini API returned no text in the response.")
-                batch_data = json.loads(response.text)
-                lectures_data.extend(batch_data)
-                logger.info(f"Processed batch of {len(batch_data)} lectures")
-
-            except errors.APIError as e:
-                raise Exception(f"Gemini API Error: {parse_gemini_error(e)}")
-
-            # Parse the response and add to lectures_data
-
-        logger.info(f"Done Scraping {len(lectures_data)} lectures")
-        return lectures_data
+    # Cleaned pages that are not extracted yet, kept for the checkpoint
+    unextracted_pages: dict[str, str] = {}
+
+    def clean(href: str, page_source: str) -> str:
+        page = clean_lecture_page(href, page_source)
+        unextracted_pages[href] = page
+        return page
+
+    def extract(batch: list[tuple[str, str]]) -> list[dict]:
+        with stage("extract"):
+            data = extract_batch(scheduler, system_prompt, batch, checkpoint)
+        for href, _ in batch:
+            unextracted_pages.pop(href, None)
+        return data
+
+    pipeline = LecturePipeline(
+        clean=clean,
+        extract=extract,
+        batch_size=lecture_batch_size(len(pending_hrefs)),
+        batch_max_wait=float(os.getenv("PIPELINE_BATCH_MAX_WAIT_SECONDS", "20")),
+        queue_depth=int(os.getenv("PIPELINE_QUEUE_DEPTH", "4")),
+    )
+    try:
+        pipeline.run(fetch_lecture_pages(browser, pending_hrefs))
     except Exception as e:
         logger.error(f"An error occurred while collecting lecture information: {e}")
         # print the stack trace for debugging
 
         traceback.print_exc()
         raise
+    finally:
+        if pipeline.fetched_all:
+            # Every page is fetched, a retry can skip the browser altogether
+            checkpoint.pages = unextracted_pages
+            save_checkpoint(checkpoint)
+
+    lectures_data = checkpoint.extracted_lectures()
+    logger.info(f"Done Scraping {len(lectures_data)} lectures")
+    return lectures_data
 
 
-def scrape_hrefs(browser: uc.Chrome) -> list[str]:
-    browser.get("https://portal.psut.edu.jo")
+def login_to_portal(browser: "uc.Chrome"):
+    """Log in and switch the portal to English"""
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    browser.get(PORTAL_URL)
 
     # Define wait object
     wait = WebDriverWait(browser, 10)
@@ -270,7 +423,7 @@ def scrape_hrefs(browser: uc.Chrome) -> list[str]:
 
     # Wait for reCAPTCHA to execute, form to submit, and browser to redirect.
     # Login page is always at the root path; any other URL means we succeeded.
-    LOGIN_URLS = {"https://portal.psut.edu.jo/", "https://portal.psut.edu.jo"}
+    LOGIN_URLS = {f"{PORTAL_URL}/", PORTAL_URL}
 
     try:
         # Give it a few seconds then take a peek
@@ -338,6 +491,13 @@ def scrape_hrefs(browser: uc.Chrome) -> list[str]:
     if ENV == "gcp":
         save_screenshot_to_gcs(browser, "4_after_closing_notifications_again.png")
 
+
+def scrape_hrefs(browser: "uc.Chrome") -> list[str]:
+    """Collect lecture links from the activities timeline of a logged-in session"""
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
     # go to the lectures page
     # Find activites card and click it
     activities_card = WebDriverWait(browser, 10).until(
@@ -388,20 +548,29 @@ def scrape_hrefs(browser: uc.Chrome) -> list[str]:
         )
 
         # Could be multiple lectures on the same day
-        mini_soup = BeautifulSoup(content_div.get_attribute("innerHTML"), "lxml")
-        lecture_titles = mini_soup.find_all("h4", class_="card-title")
-        for title in lecture_titles:
-            anchor = title.find("a")
-            if anchor and anchor.has_attr("href"):
-                lecture_hrefs.append(anchor["href"])
+        lecture_hrefs.extend(
+            parse_timeline_hrefs(content_div.get_attribute("innerHTML") or "")
+        )
 
     return lecture_hrefs
 
 
-def run_scraper() -> list[dict] | None:
-    if not USERNAME or not PASSWORD:
-        raise ValueError("Please set PSUT_USERNAME and PSUT_PASSWORD in the .env file.")
+def parse_timeline_hrefs(content_html: str) -> list[str]:
+    """Lecture links in the cards of one timeline day"""
+    from bs4 import BeautifulSoup
+
+    mini_soup = BeautifulSoup(content_html, "lxml")
+    lecture_hrefs = []
+    for title in mini_soup.find_all("h4", class_="card-title"):
+        anchor = title.find("a")
+        if anchor and anchor.has_attr("href"):
+            lecture_hrefs.append(anchor["href"])
+    return lecture_hrefs
 
+
+def start_browser() -> tuple["uc.Chrome", Any]:
+    """Start Chrome (inside Xvfb on Linux/GCP) and return (browser, display).
+    The display is None where no virtual display is needed."""
     env = os.getenv("ENVIRONMENT", "windows").lower()
 
     # =========== Virtual display (Linux / GCP only) ===========
@@ -409,10 +578,11 @@ def run_scraper() -> list[dict] | None:
     # so Chrome can run in headful mode (required for reCAPTCHA v3 to score well).
     display = None
 
-    # =========== Create the browser ===========
     try:
         display = start_virtual_display()
 
+        import undetected_chromedriver as uc
+
         options = uc.ChromeOptions()
         # NOT headless — reCAPTCHA v3 gives near-zero scores to headless browsers.
         # Xvfb provides the virtual display on Cloud Run instead.
@@ -427,33 +597,49 @@ def run_scraper() -> list[dict] | None:
             options.add_argument("--use-gl=swiftshader")
             options.add_argument("--enable-webgl")
             options.binary_location = "/usr/bin/chromium"
+            # Normally pre-patched at image build time, see driver_provisioning.py
+            driver_path, version_main = get_driver_for_browser("/usr/bin/chromium")
             browser = uc.Chrome(
                 options=options,
-                driver_executable_path="/usr/bin/chromedriver",
+                driver_executable_path=driver_path or "/usr/bin/chromedriver",
+                version_main=version_main,
             )
         elif env == "linux":
             options.add_argument("--no-sandbox")
             options.add_argument("--disable-dev-shm-usage")
-            
+
             # Use the system Chromium browser path
             chrome_path = "/usr/bin/chromium-browser"
             if not os.path.exists(chrome_path):
                 chrome_path = "/usr/bin/chromium"
-            
+
             options.binary_location = chrome_path
-            
-            # NOTE: We don't specify driver_executable_path here because uc needs to patch the driver.
-            # It will download a local copy to ~/.local/share/undetected_chromedriver which is writable.
-            # We specify version_main=147 to match your system's Chromium version.
-            browser = uc.Chrome(options=options, version_main=147)
+
+            # The driver is patched once per Chromium version into a persistent
+            # cache and reused, instead of being re-patched on every run.
+            driver_path, version_main = get_driver_for_browser(chrome_path)
+            browser = uc.Chrome(
+                options=options,
+                driver_executable_path=driver_path,
+                version_main=version_main or CHROME_VERSION_MAIN,
+            )
         else:
-            browser = uc.Chrome(options=options, version_main=147)
+            browser = uc.Chrome(options=options, version_main=CHROME_VERSION_MAIN)
 
-    except Exception as e:
-        logger.error(f"Failed to initialize the browser: {e}")
+    except Exception:
         if display:
             display.stop()
-        return None
+        raise
+
+    return browser, display
+
+
+def run_scraper(
+    run_stats: dict | None = None,
+    on_processes_started: Callable[[list[int]], None] | None = None,
+) -> list[dict] | None:
+    if not USERNAME or not PASSWORD:
+        raise ValueError("Please set PSUT_USERNAME and PSUT_PASSWORD in the .env file.")
 
     # =========== Prompt and model details ===========
 
@@ -468,11 +654,65 @@ def run_scraper() -> list[dict] | None:
     4. Process every page provided and return one JSON object per page in the list.
     5. Adhere STRICTLY to the provided schema. Do not add any extra fields or information."""
 
+    scheduler = create_scheduler(model_name)
+    if run_stats is not None:
+        run_stats["gemini"] = scheduler.stats
+        if isinstance(scheduler.client, ReplayClient):
+            run_stats["gemini_replay"] = scheduler.client.stats
+
+    # =========== Resume an interrupted run ===========
+    resumed = load_resumable_checkpoint()
+    checkpoint = resumed or RunCheckpoint.new()
+    # Before any branch, so even a resumed extraction reports its run id
+    set_run_id(checkpoint.run_id)
+    if run_stats is not None:
+        run_stats["run_id"] = checkpoint.run_id
+    if resumed:
+        logger.info(
+            f"Resuming run {checkpoint.run_id} from stage '{checkpoint.stage}'."
+        )
+        if checkpoint.pages is not None:
+            # Every page is already fetched, no need to log in again
+            try:
+                with stage("extract"):
+                    data = extract_lectures(scheduler, system_prompt, checkpoint)
+                complete_checkpoint(checkpoint)
+                return data
+            except Exception as e:
+                logger.error(f"An error occurred: {e}:\n\n{traceback.format_exc()}")
+                return None
+
+    # =========== Create the browser ===========
+    try:
+        browser, display = start_browser()
+    except Exception as e:
+        logger.error(f"Failed to initialize the browser: {e}")
+        return None
+
+    if on_processes_started:
+        # Lets the supervising process clean up Chrome and Xvfb if we hang
+        pids = [browser.browser_pid]
+        if display:
+            pids.append(display.pid)
+        on_processes_started(pids)
+
     # =========== Run the scraper ===========
     try:
-        hrefs = scrape_hrefs(browser)
+        with stage("login"):
+            login_to_portal(browser)
+            # Never before this point, see enable_lean_mode
+            enable_lean_mode(browser)
+        if checkpoint.hrefs is None:
+            with stage("timeline"):
+                checkpoint.set_hrefs(scrape_hrefs(browser))
+            save_checkpoint(checkpoint)
+        hrefs = checkpoint.hrefs
         logger.info(f"Found {len(hrefs)} lecture links to scrape.")
-        data = scrape_lectures(browser, model_name, system_prompt, hrefs)
+        with stage("pages"):
+            data = scrape_lectures(
+                browser, scheduler, system_prompt, hrefs, checkpoint
+            )
+        complete_checkpoint(checkpoint)
         return data
     except Exception as e:
         logger.error(f"An error occurred: {e}:\n\n{traceback.format_exc()}")
@@ -483,73 +723,181 @@ def run_scraper() -> list[dict] | None:
             display.stop()
 
 
+def with_run_stats(body: dict, run_stats: dict) -> dict:
+    """Attach the run stats to a workflow response, with this process's stage
+    timings merged into the ones reported by the scraper worker"""
+    run_stats.setdefault("stage_seconds", {}).update(get_stage_timings())
+    run_stats["http"] = http_stats()
+    return {**body, "run_stats": run_stats}
+
+
 def execute_scraper_workflow():
     logger.info("Starting scraper process...")
+    reset_stage_timings()
+    reset_http_stats()
     # =========== Run the scraper ===========
     with single_scraper_run() as can_run:
         if not can_run:
             logger.info("Another scraper run is already active; skipping this run.")
             return {"message": "Another scraper run is already active."}, 200
 
-        current_lectures = run_scraper()
+        # Retries, waits and model fallbacks of this run, returned to the caller
+        run_stats: dict = {}
+        with stage("scrape"):
+            scraped = run_scraper_in_worker(run_stats)
+    set_run_id(run_stats.get("run_id"))
     env = os.getenv("ENVIRONMENT", "windows").lower()
 
     if env != "gcp":
-        logger.info(f"Scraped these: {current_lectures}")
+        # Summarized on the logging thread, never formatted in full here
+        logger.info("Scraped these: %s", Summary(scraped))
 
-    if current_lectures is None:
+    if scraped is None:
         logger.error("Scraper failed to run.")
-        return {"error": "Scraper failed to run."}, 500
+        return with_run_stats({"error": "Scraper failed to run."}, run_stats), 500
+    # Already validated at extraction; normalized into typed records once here
+    current_lectures = [Lecture.from_dict(lecture) for lecture in scraped]
+    timestamps = lecture_timestamps(scraped)
 
     if not current_lectures:
         logger.info("No lectures found on the portal.")
-        return {"message": "No lectures found on the portal."}, 200
+        body = {"message": "No lectures found on the portal."}
+        return with_run_stats(body, run_stats), 200
 
     # =========== Check for new lectures ===========
-    previous_lectures = load_previous_lectures()
+    with stage("load_state"):
+        previous_lectures = load_previous_lectures()
+
+    diff = diff_lectures(current_lectures, previous_lectures)
+    run_stats.update(diff.summary())
+    new_lectures = [change.lecture for change in diff.added]
+    updated = diff.updated
+    if diff.removed_lectures:
+        removed_count = len(diff.removed_lectures)
+        logger.info(f"{removed_count} stored lectures are no longer listed.")
+    if not diff.state_changed:
+        logger.info("No new or changed lectures found.")
+        return with_run_stats({"message": "No new lectures found."}, run_stats), 200
+
+    if not new_lectures and not updated:
+        # Only registration counts moved; keep the state current, quietly
+        logger.info(f"Updated the counts of {len(diff.changed)} lectures.")
+        with stage("save_state"):
+            save_lectures(apply_diff(previous_lectures, diff))
+            lecture_store.invalidate()
+        return with_run_stats({"message": "No new lectures found."}, run_stats), 200
+
+    logger.info(f"Found {len(new_lectures)} new and {len(updated)} updated lectures.")
+    # Sighting and extraction times of the new lectures, stored with them
+    latency = LatencyTracker.load()
+    stamped = {
+        lecture.href: latency.sighted(lecture.href, timestamps.get(lecture.href))
+        for lecture in new_lectures
+        if lecture.href
+    }
+
+    # =========== Notify subscribers ===========
+    with stage("notify"):
+        result = create_dispatcher().dispatch(Notification(new_lectures, updated))
+    run_stats["channels"] = result.stats()
+    message, success = result.message, result.success
+    if success:
+        logger.info("Notifications sent successfully.")
+        # Full and closed lectures are left out of the email
+        emailed = {
+            lecture.href
+            for lecture in new_lectures
+            if not (lecture.is_full or lecture.registration_ended)
+        }
+        samples = latency.delivered(stamped, emailed, timestamp())
+        latency.save()
+        run_stats["notification_latency"] = {
+            "this_run": latency.report(samples)["total"],
+            "window": latency.report()["total"],
+        }
+        # Only save the new state once every required channel succeeded
+        # This ensures that if sending fails, we'll try again next time
+        with stage("save_state"):
+            save_lectures(apply_diff(previous_lectures, diff, stamped))
+            lecture_store.invalidate()
+        return with_run_stats({"message": message}, run_stats), 200
+    else:
+        # Keeps the first sightings for the retry
+        latency.save()
+        logger.error(f"Failed to send notifications: {message}")
+        return with_run_stats({"error": message}, run_stats), 500
 
-    # Create a unique key for previous lectures
-    # We use href as the unique identifier
-    prev_keys = {lecture.get("href") for lecture in previous_lectures}
 
-    new_lectures = []
-    for lecture in current_lectures:
-        key = lecture.get("href")
-        if key not in prev_keys:
-            new_lectures.append(lecture)
+@app.route("/", methods=["GET", "POST"])
+def main():
+    response_data, status_code = execute_scraper_workflow()
+    return jsonify(response_data), status_code
 
-    if not new_lectures:
-        logger.info("No new lectures found.")
-        return {"message": "No new lectures found."}, 200
 
-    logger.info(f"Found {len(new_lectures)} new lectures.")
+@app.route("/lectures", methods=["GET"])
+def saved_lectures():
+    """The latest saved lectures, filtered by ?upcoming=, ?open= and ?has_hours=.
+    Served from memory with an ETag; never scrapes."""
+    return lecture_store.response(request)
 
 
+@app.route("/latency", methods=["GET"])
+def latency_report():
+    """Notification latency percentiles and histogram over the rolling window"""
+    return jsonify(LatencyTracker.load().report())
 
-    # =========== Send emails ===========
-    message, success = send_brevo_email(new_lectures)
-    if success:
-        logger.info("Emails sent successfully.")
-        # Only save the new state if emails were sent successfully
-        # This ensures that if email sending fails, we'll try again next time
-        save_lectures(previous_lectures + new_lectures)
-        return {"message": message}, 200
-    else:
-        logger.error(f"Failed to send emails: {message}")
-        return {"error": message}, 500
 
+def start_adaptive_scheduler():
+    """Start the scheduler on a thread of this process when
+    ADAPTIVE_SCHEDULER=true. gunicorn calls this once the worker is up, see
+    gunicorn.conf.py; `python main.py` calls it before serving."""
+    global scheduler
+    if os.getenv("ADAPTIVE_SCHEDULER", "false").lower() != "true" or scheduler:
+        return
+    scheduler = AdaptiveScheduler(execute_scraper_workflow)
+    scheduler.start()
 
-@app.route("/", methods=["GET", "POST"])
-def main():
-    response_data, status_code = execute_scraper_workflow()
-    return jsonify(response_data), status_code
+
+@app.route("/schedule", methods=["GET"])
+def schedule():
+    """Upcoming runs of the in-process scheduler, or the ones it would plan"""
+    if scheduler:
+        return jsonify({"running": True, "upcoming": scheduler.schedule()})
+    now = datetime.now(portal_timezone())
+    return jsonify({"running": False, "upcoming": current_plan().upcoming(now)})
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="PSUT community service notifier")
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="profile every stage into debugging/profiles (same as PROFILE=1)",
+    )
+    parser.add_argument(
+        "--schedule",
+        action="store_true",
+        help="keep running and scrape on the adaptive schedule (Linux mode)",
+    )
+    args = parser.parse_args()
+    if args.profile:
+        enable_profiling()
+
     env = os.getenv("ENVIRONMENT", "windows").lower()
-    if env == "linux":
+    if env == "linux" and args.schedule:
+        logger.info("Running in Linux mode on the adaptive schedule.")
+        scheduler = AdaptiveScheduler(execute_scraper_workflow)
+        scheduler.run_forever()
+    elif env == "linux":
         logger.info("Running in Linux mode. Executing scraper workflow without Flask.")
-        execute_scraper_workflow()
+        try:
+            execute_scraper_workflow()
+        finally:
+            # Exiting kills the optional channels' daemon threads
+            wait_for_optional_channels()
     else:
         logger.info("Running in Flask mode (GCP/Windows).")
+        start_adaptive_scheduler()
         app.run(host="0.0.0.0", port=int(os.getenv("PORT", 8080)))
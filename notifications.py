@@ -0,0 +1,375 @@
+"""Send one batch of new and updated lectures to every notification channel.
+
+Channels run concurrently, each on its own thread, with its own per-attempt
+timeout and retries:
+    email       Brevo, see send_emails
+    ntfy        plain-text push to NOTIFY_NTFY_URL (ntfy or any webhook)
+    telegram    Bot API sendMessage to TELEGRAM_CHAT_ID, through
+                TELEGRAM_API_URL so a local stand-in can take its place
+
+NOTIFY_CHANNELS picks the channels, NOTIFY_REQUIRED_CHANNELS the ones that
+must succeed before the run saves its state; each must also be in
+NOTIFY_CHANNELS. `dispatch` returns as soon as the required channels are done,
+however long they take: the email channel also fetches the subscribers, which
+is bounded by GOOGLE_SHEETS_TIMEOUT_SECONDS rather than its budget. The others
+finish on their own and only log. A process that exits after dispatching calls
+`wait_for_optional_channels` first, or their daemon threads die with it.
+Per channel: NOTIFY_<NAME>_TIMEOUT_SECONDS and NOTIFY_<NAME>_RETRIES.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Callable
+
+import http_transport
+from error_notifier import install_exception_hook
+from lectures import Lecture
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+if TYPE_CHECKING:
+    from lecture_diff import LectureChange
+
+NOTIFY_CHANNELS = os.getenv("NOTIFY_CHANNELS", "email")
+NOTIFY_REQUIRED_CHANNELS = os.getenv("NOTIFY_REQUIRED_CHANNELS", "email")
+NOTIFY_RETRY_BACKOFF_SECONDS = float(os.getenv("NOTIFY_RETRY_BACKOFF_SECONDS", "1"))
+# name -> (timeout seconds, retries) unless overridden in the environment. A
+# Brevo call that timed out may still have been sent, so email is not retried.
+CHANNEL_DEFAULTS = {"email": (30.0, 0), "ntfy": (10.0, 2), "telegram": (10.0, 2)}
+# Telegram rejects longer messages
+TELEGRAM_MAX_LENGTH = 4096
+# Optional channels still sending: (thread, monotonic deadline of its budget)
+_optional_threads: list[tuple[threading.Thread, float]] = []
+_optional_lock = threading.Lock()
+
+
+class ChannelError(Exception):
+    pass
+
+
+class Notification:
+    """What every channel announces"""
+
+    def __init__(
+        self,
+        lectures: list[Lecture],
+        updated: list["LectureChange"] | None = None,
+        subject: str | None = None,
+    ):
+        self.lectures = lectures
+        self.updated = updated or []
+        self.subject = subject
+
+    @property
+    def open_lectures(self) -> list[Lecture]:
+        """New lectures worth announcing, the same ones the email shows"""
+        return [
+            lec for lec in self.lectures if not (lec.is_full or lec.registration_ended)
+        ]
+
+    @property
+    def open_updates(self) -> list["LectureChange"]:
+        return [
+            change
+            for change in self.updated
+            if not (change.lecture.is_full or change.lecture.registration_ended)
+        ]
+
+
+def lecture_line(lec: Lecture) -> str:
+    parts = [lec.title or "Untitled Event"]
+    when = " ".join(filter(None, [lec.date_text, lec.time_display]))
+    if when:
+        parts.append(when)
+    if lec.location:
+        parts.append(lec.location)
+    if lec.spots_left is not None:
+        parts.append(f"{lec.spots_left} spots left")
+    return " | ".join(parts)
+
+
+def notification_text(notification: Notification) -> str:
+    """Plain-text body for the push channels, "" if nothing is open"""
+    lines = []
+    for lec in notification.open_lectures:
+        lines.append(f"• {lecture_line(lec)}")
+        if lec.href:
+            lines.append(f"  {lec.href}")
+    for change in notification.open_updates:
+        lines.append(f"• Updated: {lecture_line(change.lecture)}")
+        lines.append(f"  changed: {', '.join(sorted(change.fields))}")
+    return "\n".join(lines)
+
+
+def push_title(notification: Notification) -> str:
+    if notification.subject:
+        return notification.subject
+    new, updated = len(notification.open_lectures), len(notification.open_updates)
+    title = f"{new} new PSUT lectures"
+    return f"{title}, {updated} updated" if updated else title
+
+
+def send_email(notification: Notification, timeout: float) -> str:
+    from send_emails import send_brevo_email
+
+    message, success = send_brevo_email(
+        notification.lectures,
+        subject=notification.subject,
+        updated=notification.updated,
+        timeout=timeout,
+    )
+    if not success:
+        raise ChannelError(message)
+    return message
+
+
+def send_ntfy(notification: Notification, timeout: float) -> str:
+    url = os.getenv("NOTIFY_NTFY_URL")
+    if not url:
+        raise ChannelError("NOTIFY_NTFY_URL is not set")
+    text = notification_text(notification)
+    if not text:
+        return "Nothing open to push."
+    # Header values must be latin-1
+    title = push_title(notification).encode("latin-1", "replace").decode("latin-1")
+    response = http_transport.post(
+        url,
+        data=text.encode("utf-8"),
+        headers={"Title": title, "Tags": "mortar_board"},
+        timeout=timeout,
+    )
+    if response.status_code >= 300:
+        raise ChannelError(f"ntfy returned {response.status_code}: {response.text}")
+    return "Pushed to ntfy."
+
+
+def send_telegram(notification: Notification, timeout: float) -> str:
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    chat_id = os.getenv("TELEGRAM_CHAT_ID")
+    if not token or not chat_id:
+        raise ChannelError("TELEGRAM_BOT_TOKEN or TELEGRAM_CHAT_ID is not set")
+    text = notification_text(notification)
+    if not text:
+        return "Nothing open to send."
+    text = f"{push_title(notification)}\n\n{text}"
+    if len(text) > TELEGRAM_MAX_LENGTH:
+        text = text[: TELEGRAM_MAX_LENGTH - 3] + "..."
+    api_url = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org")
+    response = http_transport.post(
+        f"{api_url}/bot{token}/sendMessage",
+        json={"chat_id": chat_id, "text": text, "disable_web_page_preview": True},
+        timeout=timeout,
+    )
+    if response.status_code >= 300 or not response.json().get("ok"):
+        raise ChannelError(
+            f"Telegram returned {response.status_code}: {response.text}"
+        )
+    return "Sent to Telegram."
+
+
+CHANNEL_SENDERS: dict[str, Callable[[Notification, float], str]] = {
+    "email": send_email,
+    "ntfy": send_ntfy,
+    "telegram": send_telegram,
+}
+
+
+class Channel:
+    def __init__(
+        self,
+        name: str,
+        send: Callable[[Notification, float], str],
+        timeout: float,
+        retries: int = 0,
+        required: bool = False,
+        backoff: float = NOTIFY_RETRY_BACKOFF_SECONDS,
+    ):
+        self.name = name
+        self.send = send
+        self.timeout = timeout
+        self.retries = retries
+        self.required = required
+        self.backoff = backoff
+
+    @classmethod
+    def from_env(cls, name: str, required: bool) -> "Channel":
+        timeout, retries = CHANNEL_DEFAULTS.get(name, (10.0, 0))
+        prefix = f"NOTIFY_{name.upper()}"
+        return cls(
+            name,
+            CHANNEL_SENDERS[name],
+            timeout=float(os.getenv(f"{prefix}_TIMEOUT_SECONDS", timeout)),
+            retries=int(os.getenv(f"{prefix}_RETRIES", retries)),
+            required=required,
+        )
+
+    @property
+    def budget(self) -> float:
+        """Longest the channel can take over every attempt and backoff"""
+        backoffs = sum(self.backoff * 2**attempt for attempt in range(self.retries))
+        return self.timeout * (self.retries + 1) + backoffs
+
+    def deliver(self, notification: Notification) -> "ChannelResult":
+        """Send, retrying with exponential backoff; never raises"""
+        started_at = time.monotonic()
+        message = ""
+        for attempt in range(1, self.retries + 2):
+            try:
+                message = self.send(notification, self.timeout)
+                return ChannelResult(self, True, attempt, started_at, message)
+            except Exception as e:
+                message = str(e)
+                logger.warning(
+                    f"Channel {self.name} failed on attempt "
+                    f"{attempt}/{self.retries + 1}: {message}"
+                )
+            if attempt <= self.retries:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        return ChannelResult(self, False, self.retries + 1, started_at, message)
+
+
+class ChannelResult:
+    def __init__(
+        self,
+        channel: Channel,
+        success: bool,
+        attempts: int,
+        started_at: float,
+        message: str,
+    ):
+        self.name = channel.name
+        self.required = channel.required
+        self.success = success
+        self.attempts = attempts
+        self.seconds = time.monotonic() - started_at
+        self.message = message
+
+    def to_dict(self) -> dict:
+        return {
+            "success": self.success,
+            "required": self.required,
+            "attempts": self.attempts,
+            "seconds": round(self.seconds, 3),
+            "message": self.message,
+        }
+
+
+class DispatchResult:
+    def __init__(self, channels: list[Channel], results: dict[str, ChannelResult]):
+        self.channels = channels
+        self.results = results
+
+    @property
+    def success(self) -> bool:
+        """Every required channel succeeded"""
+        return all(
+            channel.name in self.results and self.results[channel.name].success
+            for channel in self.channels
+            if channel.required
+        )
+
+    @property
+    def message(self) -> str:
+        parts = []
+        for channel in self.channels:
+            result = self.results.get(channel.name)
+            if result is None:
+                parts.append(f"{channel.name}: still sending")
+            elif result.success:
+                parts.append(f"{channel.name}: {result.message}")
+            else:
+                parts.append(f"{channel.name} failed: {result.message}")
+        return " ".join(parts)
+
+    def stats(self) -> dict:
+        return {
+            channel.name: (
+                self.results[channel.name].to_dict()
+                if channel.name in self.results
+                else {"required": channel.required, "pending": True}
+            )
+            for channel in self.channels
+        }
+
+
+class NotificationDispatcher:
+    def __init__(self, channels: list[Channel]):
+        self.channels = channels
+
+    def dispatch(self, notification: Notification) -> DispatchResult:
+        """Start every channel at once and wait for the required ones only"""
+        results: dict[str, ChannelResult] = {}
+        done = {channel.name: threading.Event() for channel in self.channels}
+        with _optional_lock:
+            # A long-lived process never waits for them; drop the finished ones
+            _optional_threads[:] = [
+                (thread, deadline)
+                for thread, deadline in _optional_threads
+                if thread.is_alive()
+            ]
+
+        def deliver(channel: Channel):
+            result = channel.deliver(notification)
+            results[channel.name] = result
+            done[channel.name].set()
+            if not channel.required:
+                outcome = "succeeded" if result.success else "failed"
+                logger.info(
+                    f"Channel {channel.name} {outcome} after {result.seconds:.1f}s"
+                )
+
+        for channel in self.channels:
+            # Daemon threads: an optional channel must not keep the process up
+            thread = threading.Thread(
+                target=contextvars.copy_context().run,
+                args=(deliver, channel),
+                name=f"notify-{channel.name}",
+                daemon=True,
+            )
+            thread.start()
+            if not channel.required:
+                deadline = time.monotonic() + channel.budget + 5
+                with _optional_lock:
+                    _optional_threads.append((thread, deadline))
+
+        for channel in self.channels:
+            # Its actual result: one that is only late still counts as sent
+            if channel.required:
+                done[channel.name].wait()
+        return DispatchResult(self.channels, dict(results))
+
+
+def wait_for_optional_channels():
+    """Join the optional channels still sending, each up to the end of its
+    budget. For processes that exit after dispatching."""
+    with _optional_lock:
+        pending = list(_optional_threads)
+        _optional_threads.clear()
+    for thread, deadline in pending:
+        thread.join(max(0.0, deadline - time.monotonic()))
+        if thread.is_alive():
+            logger.warning(f"{thread.name} did not finish before exiting")
+
+
+def channel_names(spec: str) -> list[str]:
+    return [name.strip().lower() for name in spec.split(",") if name.strip()]
+
+
+def create_dispatcher() -> NotificationDispatcher:
+    names = channel_names(NOTIFY_CHANNELS)
+    unknown = [name for name in names if name not in CHANNEL_SENDERS]
+    if unknown:
+        raise ValueError(f"Unknown notification channels: {unknown}")
+    required = set(channel_names(NOTIFY_REQUIRED_CHANNELS))
+    missing = sorted(required - set(names))
+    if missing:
+        # Otherwise a required channel that is never sent counts as succeeded
+        raise ValueError(
+            f"Required notification channels not in NOTIFY_CHANNELS: {missing}"
+        )
+    return NotificationDispatcher(
+        [Channel.from_env(name, required=name in required) for name in names]
+    )
@@ -0,0 +1,155 @@
+import contextvars
+import queue
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from error_notifier import install_exception_hook
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+# Marks the end of the stream on a queue
+_DONE = object()
+
+
+class LecturePipeline:
+    """Overlap page fetching, cleaning and LLM extraction.
+
+    The producer (the caller's thread, since WebDriver is not thread-safe)
+    iterates `items` and pushes raw pages into a bounded queue. A cleaning
+    worker turns them into pages for the extractor, and an extraction worker
+    sends a batch as soon as it holds `batch_size` pages or its oldest page has
+    waited `batch_max_wait` seconds. Later pages keep loading meanwhile, so the
+    total time approaches max(fetch, extract) and at most `queue_depth` pages
+    per queue are held in memory.
+    """
+
+    def __init__(
+        self,
+        clean: Callable[[str, str], str],
+        extract: Callable[[list[tuple[str, str]]], Any],
+        batch_size: int,
+        batch_max_wait: float = 20.0,
+        queue_depth: int = 4,
+    ):
+        self.clean = clean
+        self.extract = extract
+        self.batch_size = batch_size
+        self.batch_max_wait = batch_max_wait
+        self.raw_queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+        self.page_queue: queue.Queue = queue.Queue(maxsize=queue_depth)
+        self.failed = threading.Event()
+        self.errors: list[BaseException] = []
+        self.fetched_all = False
+        self.batches_extracted = 0
+
+    def _fail(self, e: BaseException):
+        self.errors.append(e)
+        self.failed.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Put without blocking forever if a downstream worker died"""
+        while not self.failed.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _close(self, q: queue.Queue):
+        """Signal the end of the stream, giving up if the reader already failed"""
+        while True:
+            try:
+                q.put(_DONE, timeout=0.5)
+                return
+            except queue.Full:
+                if self.failed.is_set():
+                    return
+
+    def _clean_worker(self):
+        try:
+            while True:
+                item = self.raw_queue.get()
+                if item is _DONE or self.failed.is_set():
+                    break
+                href, raw_html = item
+                page = self.clean(href, raw_html)
+                if not self._put(self.page_queue, (href, page)):
+                    break
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # Always wake the extractor so it can flush or exit
+            self._close(self.page_queue)
+
+    def _flush(self, batch: list[tuple[str, str]]):
+        if not batch:
+            return
+        self.extract(batch)
+        self.batches_extracted += 1
+
+    def _extract_worker(self):
+        batch: list[tuple[str, str]] = []
+        batch_started = 0.0
+        try:
+            while not self.failed.is_set():
+                timeout = None
+                if batch:
+                    deadline = batch_started + self.batch_max_wait
+                    timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    item = self.page_queue.get(timeout=timeout)
+                except queue.Empty:
+                    # Oldest page waited long enough, send a partial batch
+                    self._flush(batch)
+                    batch = []
+                    continue
+
+                if item is _DONE:
+                    if not self.failed.is_set():
+                        self._flush(batch)
+                    break
+                if not batch:
+                    batch_started = time.monotonic()
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch)
+                    batch = []
+        except BaseException as e:
+            self._fail(e)
+
+    def run(self, items: Iterable[tuple[str, str]]):
+        """Feed (href, raw_html) items through the pipeline.
+        Re-raises the first error of any stage once all workers have stopped."""
+        # Workers inherit the caller's context, so their logs keep the run id
+        cleaner = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._clean_worker,),
+            name="page-cleaner",
+        )
+        extractor = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._extract_worker,),
+            name="extractor",
+        )
+        cleaner.start()
+        extractor.start()
+        try:
+            for item in items:
+                if not self._put(self.raw_queue, item):
+                    logger.warning("Stopping page fetches: a pipeline stage failed.")
+                    break
+            else:
+                self.fetched_all = True
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            self._close(self.raw_queue)
+            cleaner.join()
+            extractor.join()
+
+        if self.errors:
+            raise self.errors[0]
+
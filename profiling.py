@@ -0,0 +1,189 @@
+"""Per-stage cProfile output for a full run.
+
+With PROFILE=1 (or `python main.py --profile`), every `logger_setup.stage`
+block is profiled. For each stage this writes a `.pstats` file and a
+collapsed-stack `.folded` file (input for flamegraph.pl or speedscope) to
+debugging/profiles/<run id>/, or to the same path in the GCS bucket on Cloud
+Run, and logs the stage's top hotspots.
+
+Only one cProfile profiler can be active per process. A stage nested in
+another stage of the same thread pauses the outer profile, so each file holds
+the time of its own stage only. A stage that starts on another thread while a
+profile is running is not profiled separately; its time shows up in the
+running profile.
+"""
+
+import io
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import TYPE_CHECKING
+
+import logger_setup
+from error_notifier import install_exception_hook
+from logger_setup import logger
+
+install_exception_hook(__name__)
+
+if TYPE_CHECKING:
+    import cProfile
+    import pstats
+
+PROFILE_DIR = os.path.join("debugging", "profiles")
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "10"))
+
+_session = datetime.now().strftime("%Y%m%d-%H%M%S")
+_lock = threading.Lock()
+# (thread id, stage name, profiler) of the stages being profiled, innermost last
+_active: list[tuple[int, str, "cProfile.Profile"]] = []
+_written: dict[str, int] = {}
+
+
+def profiling_requested() -> bool:
+    return os.getenv("PROFILE", "").lower() in ("1", "true")
+
+
+def collapsed_stacks(stats: "pstats.Stats", max_depth: int = 64) -> list[str]:
+    """Approximate "frame;frame;frame microseconds" lines from a profile.
+
+    cProfile only keeps caller -> callee edges, not whole stacks, so time is
+    split along each edge in proportion to its share of the callee's
+    cumulative time, the way flameprof and snakeviz do it.
+    """
+    entries = stats.stats  # type: ignore[attr-defined]
+    children: dict[tuple, list[tuple[tuple, float]]] = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, (_, _, _, edge_cumulative) in callers.items():
+            children.setdefault(caller, []).append((func, edge_cumulative))
+
+    def label(func: tuple) -> str:
+        filename, line, name = func
+        return f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",")
+
+    lines: list[str] = []
+
+    def walk(func: tuple, stack: list[str], share: float, seen: set):
+        _, _, self_time, cumulative, _ = entries[func]
+        stack = stack + [label(func)]
+        if self_time * share >= 1e-6:
+            lines.append(f"{';'.join(stack)} {round(self_time * share * 1e6)}")
+        if len(stack) >= max_depth:
+            return
+        for child, edge_cumulative in children.get(func, []):
+            if child in seen or not entries[child][3]:
+                continue
+            child_share = share * edge_cumulative / entries[child][3]
+            if child_share * entries[child][3] >= 1e-6:
+                walk(child, stack, child_share, seen | {child})
+
+    roots = [func for func, entry in entries.items() if not entry[4]]
+    for root in roots:
+        walk(root, [], 1.0, {root})
+    return lines
+
+
+def _hotspots(stats: "pstats.Stats") -> str:
+    stream = io.StringIO()
+    stats.stream = stream  # type: ignore[attr-defined]
+    stats.sort_stats("tottime").print_stats(PROFILE_TOP_FUNCTIONS)
+    # Drop pstats' header, keep the table
+    table = stream.getvalue()
+    return table[table.find("   ncalls") :].rstrip()
+
+
+def _write(name: str, profiler: "cProfile.Profile"):
+    import marshal
+    import pstats
+
+    stats = pstats.Stats(profiler)
+    if not stats.stats:  # type: ignore[attr-defined]
+        return
+
+    with _lock:
+        _written[name] = _written.get(name, 0) + 1
+        count = _written[name]
+    run_dir = logger_setup.get_run_id() or _session
+    base = f"{name}.{os.getpid()}" + (f".{count}" if count > 1 else "")
+    pstats_data = marshal.dumps(stats.stats)  # type: ignore[attr-defined]
+    folded = "\n".join(collapsed_stacks(stats)) + "\n"
+
+    env = os.getenv("ENVIRONMENT", "windows").lower()
+    try:
+        if env == "gcp":
+            from helpers import get_gcs_bucket
+
+            bucket = get_gcs_bucket()
+            if not bucket:
+                return
+            prefix = f"profiles/{run_dir}/{base}"
+            bucket.blob(f"{prefix}.pstats").upload_from_string(pstats_data)
+            bucket.blob(f"{prefix}.folded").upload_from_string(folded)
+            location = f"gs://{bucket.name}/{prefix}"
+        else:
+            directory = os.path.join(PROFILE_DIR, run_dir)
+            os.makedirs(directory, exist_ok=True)
+            location = os.path.join(directory, base)
+            with open(f"{location}.pstats", "wb") as f:
+                f.write(pstats_data)
+            with open(f"{location}.folded", "w", encoding="utf-8") as f:
+                f.write(folded)
+    except Exception as e:
+        logger.warning(f"Could not save the profile of stage {name}: {e}")
+        return
+
+    logger.info(
+        f"Profile of stage {name} saved to {location}.pstats; top functions:\n"
+        f"{_hotspots(stats)}"
+    )
+
+
+@contextmanager
+def profile_stage(name: str):
+    """Profile the block as stage `name` (see the module docstring)"""
+    import cProfile
+
+    thread_id = threading.get_ident()
+    with _lock:
+        outer = _active[-1] if _active else None
+        if outer and outer[0] != thread_id:
+            outer = None
+            profiler = None
+        else:
+            if outer:
+                outer[2].disable()
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Someone else (a debugger, an outside profiler) is profiling
+                profiler = None
+            else:
+                _active.append((thread_id, name, profiler))
+
+    if profiler is None:
+        if outer:
+            outer[2].enable()
+        yield
+        return
+
+    try:
+        yield
+    finally:
+        with _lock:
+            profiler.disable()
+            _active.pop()
+        _write(name, profiler)
+        if outer:
+            outer[2].enable()
+
+
+def enable_profiling():
+    """Profile every stage from now on; spawned scraper workers inherit it"""
+    os.environ["PROFILE"] = "1"
+    if profile_stage not in logger_setup.stage_hooks:
+        logger_setup.stage_hooks.append(profile_stage)
+
+
+if profiling_requested():
+    enable_profiling()
@@ -0,0 +1,170 @@
+import multiprocessing
+import os
+import signal
+import time
+import traceback
+
+from error_notifier import install_exception_hook
+from logger_setup import get_stage_timings, logger
+
+install_exception_hook(__name__)
+
+# Wall-clock cap for one scrape, kept below gunicorn's 300s timeout so a hung
+# browser is killed before the request thread is.
+SCRAPER_MAX_SECONDS = float(os.getenv("SCRAPER_MAX_SECONDS", "240"))
+# Resident memory cap for the worker, Chrome and Xvfb together
+SCRAPER_MAX_RSS_MB = float(os.getenv("SCRAPER_MAX_RSS_MB", "2048"))
+# How long a worker that sent its result gets to quit Chrome and exit by itself
+SCRAPER_EXIT_GRACE_SECONDS = float(os.getenv("SCRAPER_EXIT_GRACE_SECONDS", "15"))
+POLL_INTERVAL_SECONDS = 1.0
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _worker_main(conn):
+    """Entry point of the child process: run the scraper and send back the result"""
+    # Own session, so the worker and everything it starts (chromedriver, Xvfb)
+    # can be found and killed together. Chrome detaches into its own session,
+    # which is reported separately through the "pids" message.
+    os.setsid()
+    try:
+        from main import run_scraper
+
+        run_stats: dict = {}
+        data = run_scraper(
+            run_stats, on_processes_started=lambda pids: conn.send(("pids", pids))
+        )
+        # Stage timings of this process, merged with the parent's
+        run_stats["stage_seconds"] = get_stage_timings()
+        conn.send(("result", data, run_stats))
+    except BaseException as e:
+        conn.send(("error", f"{e}\n{traceback.format_exc()}"))
+    finally:
+        conn.close()
+
+
+def _read_proc_stat(pid: int) -> tuple[int, int] | None:
+    """(session id, rss in bytes) of a process, None if it is gone"""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            stat = f.read()
+    except OSError:
+        return None
+    # The command name may contain spaces, so split after its closing paren
+    fields = stat[stat.rindex(")") + 2 :].split()
+    return int(fields[3]), int(fields[21]) * PAGE_SIZE
+
+
+def _session_processes(sessions: set[int]) -> dict[int, int]:
+    """pid -> rss in bytes for every process in the given sessions"""
+    processes = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        stat = _read_proc_stat(int(entry))
+        if stat and stat[0] in sessions:
+            processes[int(entry)] = stat[1]
+    return processes
+
+
+def _terminate(process: multiprocessing.Process, sessions: set[int]):
+    """Stop the worker and everything it started, politely first"""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        pids = _session_processes(sessions)
+        if process.is_alive():
+            pids.setdefault(process.pid, 0)
+        if not pids:
+            break
+        for pid in pids:
+            try:
+                os.kill(pid, sig)
+            except OSError:
+                pass
+        process.join(timeout=5)
+        if sig == signal.SIGTERM:
+            # Give Chrome a moment to shut down its own children
+            time.sleep(1)
+    process.join(timeout=1)
+
+
+def run_scraper_in_worker(run_stats: dict) -> list[dict] | None:
+    """Run `main.run_scraper` in a supervised child process.
+
+    The web process only waits on a pipe. The worker (with Chrome and Xvfb) is
+    killed when it exceeds SCRAPER_MAX_SECONDS or SCRAPER_MAX_RSS_MB. Once it
+    has answered it gets SCRAPER_EXIT_GRACE_SECONDS to shut down by itself;
+    only what is left after that is killed. Outside Linux there is no /proc to
+    supervise with, so the scraper runs in-process.
+    """
+    env = os.getenv("ENVIRONMENT", "windows").lower()
+    if env not in ["gcp", "linux"] or os.getenv("SCRAPER_IN_PROCESS") == "true":
+        from main import run_scraper
+
+        return run_scraper(run_stats)
+
+    # spawn, not fork: forking a threaded gunicorn worker can deadlock
+    ctx = multiprocessing.get_context("spawn")
+    parent_conn, child_conn = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_worker_main, args=(child_conn,), name="scraper")
+    started_at = time.monotonic()
+    process.start()
+    child_conn.close()
+    sessions = {process.pid}
+    max_rss = SCRAPER_MAX_RSS_MB * 1024 * 1024
+    peak_rss = 0
+    # Cleared once the worker has answered, so it may finish its own cleanup
+    kill = True
+
+    try:
+        while True:
+            if parent_conn.poll(POLL_INTERVAL_SECONDS):
+                try:
+                    message = parent_conn.recv()
+                except EOFError:
+                    kill = False
+                    logger.error(
+                        f"Scraper worker exited with code {process.exitcode} "
+                        "without sending a result."
+                    )
+                    return None
+
+                if message[0] == "pids":
+                    sessions.update(message[1])
+                    continue
+                kill = False
+                if message[0] == "error":
+                    logger.error(f"Scraper worker failed: {message[1]}")
+                    return None
+                _, data, worker_stats = message
+                run_stats.update(worker_stats)
+                return data
+
+            elapsed = time.monotonic() - started_at
+            if elapsed > SCRAPER_MAX_SECONDS:
+                logger.error(
+                    f"Scraper worker exceeded {SCRAPER_MAX_SECONDS:.0f}s; killing it."
+                )
+                return None
+
+            rss = sum(_session_processes(sessions).values())
+            peak_rss = max(peak_rss, rss)
+            if rss > max_rss:
+                logger.error(
+                    f"Scraper worker uses {rss / 1024 / 1024:.0f} MB, over the "
+                    f"{SCRAPER_MAX_RSS_MB:.0f} MB cap; killing it."
+                )
+                return None
+    finally:
+        run_stats["worker"] = {
+            "seconds": round(time.monotonic() - started_at, 1),
+            "peak_rss_mb": round(peak_rss / 1024 / 1024, 1),
+        }
+        if not kill:
+            process.join(SCRAPER_EXIT_GRACE_SECONDS)
+            if process.is_alive():
+                logger.warning(
+                    f"Scraper worker did not exit within "
+                    f"{SCRAPER_EXIT_GRACE_SECONDS:.0f}s of answering; killing it."
+                )
+        # After a clean exit this only finds strays, e.g. an orphaned Chrome
+        _terminate(process, sessions)
+        parent_conn.close()
@@ -0,0 +1,278 @@
+"""Seat watch: poll full lectures and email as soon as a seat frees up.
+
+A full scrape only ever reports new lectures. This keeps one logged-in Chrome
+open and, every SEAT_WATCH_INTERVAL_SECONDS, re-opens only the detail pages of
+the lectures being watched, reading the registration counts straight from the
+page (no Gemini). When a full lecture has a free seat again, subscribers are
+notified right away on every channel, see notifications, and the new counts
+are saved so the next full scrape does not announce the same seat again. The
+watch holds the scraper lock, so no scrape starts a second Chrome meanwhile.
+
+    python seat_watch.py       # every full lecture in the stored state
+    python seat_watch.py --href <url> --href <url> --interval 10 --minutes 30
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from typing import TYPE_CHECKING, Callable
+
+from error_notifier import install_exception_hook
+from lectures import Lecture
+from logger_setup import logger, stage
+
+install_exception_hook(__name__)
+
+if TYPE_CHECKING:
+    import undetected_chromedriver as uc
+
+SEAT_WATCH_INTERVAL_SECONDS = float(os.getenv("SEAT_WATCH_INTERVAL_SECONDS", "15"))
+SEAT_WATCH_MAX_MINUTES = float(os.getenv("SEAT_WATCH_MAX_MINUTES", "60"))
+# Logins after the first one, over the whole watch
+SEAT_WATCH_MAX_RELOGINS = int(os.getenv("SEAT_WATCH_MAX_RELOGINS", "3"))
+
+# Labels of the lecture details page, see LectureData
+REGISTERED_PATTERN = re.compile(r"Registered Count\s*:?\s*(\d+)", re.IGNORECASE)
+MAXIMUM_PATTERN = re.compile(r"Maximum Registration\s*:?\s*(\d+)", re.IGNORECASE)
+# The password field of the login form, see main.login_to_portal
+LOGIN_FORM_PATTERN = re.compile(r"""id=["']loginPass["']""")
+
+
+def parse_registration_counts(html: str) -> tuple[int | None, int | None]:
+    """(current, maximum) registrations from a lecture details page"""
+    from bs4 import BeautifulSoup
+
+    text = " ".join(BeautifulSoup(html, "lxml").get_text(" ").split())
+    current = REGISTERED_PATTERN.search(text)
+    maximum = MAXIMUM_PATTERN.search(text)
+    return (
+        int(current.group(1)) if current else None,
+        int(maximum.group(1)) if maximum else None,
+    )
+
+
+def is_login_page(html: str) -> bool:
+    """Whether the portal sent us to its login form, i.e. the session expired"""
+    return LOGIN_FORM_PATTERN.search(html) is not None
+
+
+def lectures_to_watch(
+    stored: list[dict], hrefs: list[str] | None = None
+) -> list[Lecture]:
+    """The given hrefs, or else every stored lecture that is full and still
+    open for registration"""
+    lectures = [Lecture.from_dict(lecture) for lecture in stored]
+    if hrefs:
+        by_href = {lecture.href: lecture for lecture in lectures}
+        return [
+            by_href.get(href) or Lecture.from_dict({"href": href}) for href in hrefs
+        ]
+    return [
+        lecture
+        for lecture in lectures
+        if lecture.is_full and not lecture.registration_ended
+    ]
+
+
+class SeatWatcher:
+    """Polls `lectures` through `fetch_page` and calls `notify` with the
+    lectures whose seats just opened; once that succeeded, `save` gets every
+    watched lecture. Page fetching, notifying, saving and time are injected, so
+    the loop can be driven without a browser."""
+
+    def __init__(
+        self,
+        lectures: list[Lecture],
+        fetch_page: Callable[[str], str],
+        notify: Callable[[list[Lecture]], bool],
+        save: Callable[[list[Lecture]], None] | None = None,
+        relogin: Callable[[], None] | None = None,
+        max_relogins: int = SEAT_WATCH_MAX_RELOGINS,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.lectures = [lecture for lecture in lectures if lecture.href]
+        self.fetch_page = fetch_page
+        self.notify = notify
+        self.save = save
+        self.relogin = relogin
+        self.max_relogins = max_relogins
+        self.clock = clock
+        self.sleep = sleep
+        self.stats = {
+            "polls": 0,
+            "pages": 0,
+            "unreadable": 0,
+            "opened": 0,
+            "relogins": 0,
+        }
+
+    def _relogin(self) -> bool:
+        """Log in again if the budget allows; False once it is spent"""
+        if not self.relogin or self.stats["relogins"] >= self.max_relogins:
+            return False
+        self.stats["relogins"] += 1
+        logger.info(
+            f"Session expired; logging in again "
+            f"({self.stats['relogins']}/{self.max_relogins})"
+        )
+        self.relogin()
+        return True
+
+    def _read_counts(self, href: str) -> tuple[int | None, int | None]:
+        html = self.fetch_page(href)
+        if is_login_page(html) and self._relogin():
+            html = self.fetch_page(href)
+        return parse_registration_counts(html)
+
+    def poll_once(self) -> list[Lecture]:
+        """Refresh every watched lecture, return those that went from full to
+        having a free seat. A lecture with unknown counts is only a baseline."""
+        self.stats["polls"] += 1
+        opened = []
+        for lecture in self.lectures:
+            current, maximum = self._read_counts(lecture.href or "")
+            self.stats["pages"] += 1
+            if current is None:
+                self.stats["unreadable"] += 1
+                logger.warning(f"No registration count on {lecture.href}")
+                continue
+
+            was_full = lecture.is_full
+            lecture.current_registrations = current
+            if maximum is not None:
+                lecture.max_registrations = maximum
+            lecture.update_status()
+            if was_full and not lecture.is_full:
+                opened.append(lecture)
+        return opened
+
+    def run(
+        self,
+        interval: float = SEAT_WATCH_INTERVAL_SECONDS,
+        max_minutes: float = SEAT_WATCH_MAX_MINUTES,
+    ):
+        """Poll every `interval` seconds until `max_minutes` have passed or
+        registration for every watched lecture has ended"""
+        deadline = self.clock() + max_minutes * 60
+        logger.info(
+            f"Watching {len(self.lectures)} lectures every {interval:.0f}s "
+            f"for up to {max_minutes:.0f} minutes"
+        )
+        while self.lectures and self.clock() < deadline:
+            started_at = self.clock()
+            with stage("seat_watch"):
+                opened = self.poll_once()
+            if opened:
+                self.stats["opened"] += len(opened)
+                titles = ", ".join(
+                    f"{lecture.title} ({lecture.spots_left} left)" for lecture in opened
+                )
+                logger.info(f"Seats opened in: {titles}")
+                # A failed notification is left for the next full scrape
+                if self.notify(opened) and self.save:
+                    self.save(self.lectures)
+
+            self.lectures = [
+                lecture for lecture in self.lectures if not lecture.registration_ended
+            ]
+            self.sleep(max(0.0, interval - (self.clock() - started_at)))
+        logger.info(f"Seat watch finished: {self.stats}")
+
+
+def browser_page_fetcher(browser: "uc.Chrome") -> Callable[[str], str]:
+    from helpers import capture_lecture_html
+
+    from main import wait_for_lecture_page
+
+    def fetch_page(href: str) -> str:
+        browser.get(href)
+        wait_for_lecture_page(browser)
+        return capture_lecture_html(browser)
+
+    return fetch_page
+
+
+def notify_opened_seats(lectures: list[Lecture]) -> bool:
+    from notifications import Notification, create_dispatcher
+
+    subject = f"PSUT Lectures: seats opened in {len(lectures)} full lecture(s)"
+    result = create_dispatcher().dispatch(Notification(lectures, subject=subject))
+    if not result.success:
+        logger.error(f"Failed to send seat watch notifications: {result.message}")
+    return result.success
+
+
+def save_seat_counts(lectures: list[Lecture]):
+    """Write the watched counts into the stored state, the way a full scrape
+    would, so its diff does not find the freed seats again"""
+    from helpers import load_previous_lectures, save_lectures
+    from lecture_diff import apply_diff, build_index, diff_lectures
+
+    previous = load_previous_lectures()
+    index = build_index(previous)
+    # A lecture only known by its --href has nothing else worth storing
+    known = [lecture for lecture in lectures if lecture.href in index]
+    diff = diff_lectures(known, previous)
+    if diff.changed:
+        save_lectures(apply_diff(previous, diff))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--href", action="append", help="lecture to watch")
+    parser.add_argument(
+        "--interval", type=float, default=SEAT_WATCH_INTERVAL_SECONDS
+    )
+    parser.add_argument("--minutes", type=float, default=SEAT_WATCH_MAX_MINUTES)
+    args = parser.parse_args()
+
+    from helpers import disable_lean_mode, enable_lean_mode, load_previous_lectures
+    from main import login_to_portal, single_scraper_run, start_browser
+    from notifications import wait_for_optional_channels
+
+    lectures = lectures_to_watch(load_previous_lectures(), args.href)
+    if not lectures:
+        logger.info("No full lectures to watch.")
+        return 0
+
+    def relogin():
+        # Never block resources during the reCAPTCHA login, see enable_lean_mode
+        disable_lean_mode(browser)
+        try:
+            with stage("login"):
+                login_to_portal(browser)
+        finally:
+            enable_lean_mode(browser)
+
+    with single_scraper_run() as can_run:
+        if not can_run:
+            logger.info("A scraper run is active; not starting the seat watch.")
+            return 0
+
+        # One browser and one login for the whole watch, unless the session expires
+        browser, display = start_browser()
+        try:
+            with stage("login"):
+                login_to_portal(browser)
+                enable_lean_mode(browser)
+            watcher = SeatWatcher(
+                lectures,
+                fetch_page=browser_page_fetcher(browser),
+                notify=notify_opened_seats,
+                save=save_seat_counts,
+                relogin=relogin,
+            )
+            watcher.run(args.interval, args.minutes)
+        finally:
+            browser.quit()
+            if display:
+                display.stop()
+            wait_for_optional_channels()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
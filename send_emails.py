@@ -1,49 +1,93 @@
 import json
 import os
-from datetime import datetime
+from typing import TYPE_CHECKING
 
-import requests
 from dotenv import load_dotenv
 
+import http_transport
 from error_notifier import install_exception_hook, notify_error
-from google_sheets import fetch_recipients_from_sheet
+from lectures import Lecture, day_name, format_date
+from subscribers import Subscriber, group_by_selection
+
+if TYPE_CHECKING:
+    from lecture_diff import LectureChange
 
 load_dotenv()
 install_exception_hook(__name__)
 
+# Brevo accepts at most this many recipients per message version
+BREVO_MAX_VERSION_RECIPIENTS = int(os.getenv("BREVO_MAX_VERSION_RECIPIENTS", "99"))
+# and at most this many message versions per request
+BREVO_MAX_MESSAGE_VERSIONS = int(os.getenv("BREVO_MAX_MESSAGE_VERSIONS", "1000"))
 
-def generate_lecture_card(lec: dict) -> str:
-    """Generate HTML card for a single lecture"""
-    title = lec.get("title") or "Untitled Event"
-    date = lec.get("date") or "Date not specified"
+FIELD_LABELS = {
+    "title": "Title",
+    "date": "Date",
+    "time": "Time",
+    "location": "Location",
+    "activity_hours": "Service hours",
+    "restrictions": "Restrictions",
+    "max_registrations": "Capacity",
+    "current_registrations": "Registered",
+    "start_date": "Registration opens",
+    "end_date": "Registration closes",
+    "officer_name": "Officer",
+    "officer_email": "Officer email",
+    "officer_phone": "Officer phone",
+}
 
-    if date != "Date not specified":
-        try:
-            date_obj = datetime.strptime(date, "%d/%m/%Y")
-            day_name = date_obj.strftime("%A")
-            date = f"{day_name}, {date}"
-        except ValueError:
-            pass
-
-    time_val = lec.get("time") or "Time not specified"
-    location = lec.get("location") or "Location not specified"
-    activity_hours = lec.get("activity_hours")
-    restrictions = lec.get("restrictions")
-    max_reg = lec.get("max_registrations")
-    current_reg = lec.get("current_registrations")
-    start_date = lec.get("start_date")
-    end_date = lec.get("end_date")
-    officer_name = lec.get("officer_name")
-    officer_email = lec.get("officer_email")
-    officer_phone = lec.get("officer_phone")
-
-    # Calculate registration status
-    is_full = current_reg is not None and max_reg is not None and current_reg >= max_reg
-    spots_left = max_reg - current_reg if max_reg and current_reg is not None else None
+
+def changes_section(fields: dict[str, tuple]) -> str:
+    """What changed on an updated lecture, old value -> new value"""
+    lines = []
+    for field, (old, new) in fields.items():
+        if field not in FIELD_LABELS:
+            continue
+        old = "not set" if old is None else old
+        new = "not set" if new is None else new
+        lines.append(
+            f"<div><strong>{FIELD_LABELS[field]}:</strong> "
+            f'<span style="text-decoration: line-through;">{old}</span> → {new}</div>'
+        )
+    if not lines:
+        return ""
+    return f"""
+        <div style="background: #e8f5e9; padding: 8px 12px; border-radius: 6px; margin-bottom: 12px; font-size: 12px; color: #2e7d32;">
+            <div style="font-weight: 600; margin-bottom: 4px;">✏️ Updated</div>
+            {"".join(lines)}
+        </div>
+        """
+
+
+def generate_lecture_card(
+    lec: Lecture, changed_fields: dict[str, tuple] | None = None
+) -> str:
+    """Generate HTML card for a single lecture, with what changed if it was
+    updated"""
+    title = lec.title or "Untitled Event"
+    if lec.date:
+        date = f"{day_name(lec.date)}, {format_date(lec.date)}"
+    else:
+        date = lec.date_text or "Date not specified"
+
+    time_val = lec.time_display or "Time not specified"
+    location = lec.location or "Location not specified"
+    activity_hours = lec.activity_hours
+    restrictions = lec.restrictions
+    max_reg = lec.max_registrations
+    current_reg = lec.current_registrations
+    start_date = format_date(lec.start_date)
+    end_date = format_date(lec.end_date)
+    officer_name = lec.officer_name
+    officer_email = lec.officer_email
+    officer_phone = lec.officer_phone
+
+    # Registration status
+    spots_left = lec.spots_left
     status_color = "#2596be"
     status_text = (
         "FULL"
-        if is_full
+        if lec.is_full
         else f"{spots_left} spots left" if spots_left is not None else "Available"
     )
 
@@ -86,7 +130,7 @@ def generate_lecture_card(lec: dict) -> str:
 
     # Activity hours badge - highlight if 0 hours
     hours_badge = ""
-    is_zero_hours = activity_hours is not None and str(activity_hours) == "0"
+    is_zero_hours = activity_hours == 0
     if activity_hours is not None:
         if is_zero_hours:
             hours_badge = """
@@ -97,7 +141,7 @@ def generate_lecture_card(lec: dict) -> str:
         else:
             hours_badge = f"""
             <span style="background: #e3f2fd; color: #1565c0; padding: 4px 10px; border-radius: 12px; font-size: 11px; font-weight: 600;">
-                {activity_hours} Service Hour{"s" if activity_hours != "1" else ""}
+                {activity_hours:g} Service Hour{"s" if activity_hours != 1 else ""}
             </span>
             """
 
@@ -132,6 +176,7 @@ def generate_lecture_card(lec: dict) -> str:
         
         <!-- Card Content -->
         <div style="padding: 20px;">
+            {changes_section(changed_fields) if changed_fields else ""}
             <!-- Title and Hours -->
             <div style="display: flex; justify-content: space-between; align-items: flex-start; margin-bottom: 16px;">
                 <h3 style="margin: 0; color: #1a1a1a; font-size: 18px; font-weight: 600; line-height: 1.4;">{title}</h3>
@@ -158,56 +203,25 @@ def generate_lecture_card(lec: dict) -> str:
     """
 
 
-def send_brevo_email(lectures: list[dict]) -> tuple[str, bool]:
-    """Formats lecture data and sends via Brevo
-    returns: Message indicating success or failure, and a bool success flag
-    """
-    api_key = os.getenv("BREVO_API_KEY")
-    sender_email = os.getenv("SENDER_EMAIL")
-
-    # Fetch recipients from Google Sheet
-    try:
-        if os.getenv("TESTING_MODE", "false").lower() == "true":
-            # In testing mode, use a fixed test email
-            recipients = ["sam20220837@std.psut.edu.jo", "kayyal.sami0140@gmail.com"]
-        else:
-            recipients = fetch_recipients_from_sheet()
-    except Exception as e:
-        notify_error(
-            e, source=__name__, details="Failed to fetch recipients from Google Sheet"
-        )
-        return f"Failed to fetch recipients from Google Sheet: {e}", False
-
-    if not api_key or not sender_email:
-        notify_error("Brevo configuration missing in .env", source=__name__)
-        return "Brevo configuration missing in .env", False
-    if not recipients:
-        notify_error("No recipients found in Google Sheet", source=__name__)
-        return "No recipients found in Google Sheet", False
-
-    # 1. Generate lecture cards
+def build_email_html(
+    lectures: list[Lecture], updated: list["LectureChange"] | None = None
+) -> str:
+    """Full email body for the new and updated lectures that are still open,
+    "" if none are"""
     lecture_cards = ""
     for lec in lectures:
-        max_reg = lec.get("max_registrations")
-        current_reg = lec.get("current_registrations")
-        if max_reg is not None and current_reg is not None and current_reg >= max_reg:
-            continue  # Skip full events
-
-        end_date = lec.get("end_date")
-        if end_date:
-            # If end_date is in the past, skip this lecture
-            try:
-                end_date_obj = datetime.strptime(end_date, "%Y-%m-%d")
-                if end_date_obj < datetime.now().date():
-                    continue  # Skip expired lectures
-            except ValueError:
-                # If parsing fails, assume the lecture is still valid
-                pass
-
+        # Skip full events, and those whose registration period is over
+        if lec.is_full or lec.registration_ended:
+            continue
         lecture_cards += generate_lecture_card(lec)
+    for change in updated or []:
+        lec = change.lecture
+        if lec.is_full or lec.registration_ended:
+            continue
+        lecture_cards += generate_lecture_card(lec, change.fields)
 
     if not lecture_cards.strip():
-        return "No available lectures to email (all were full or expired).", True
+        return ""
 
     email_body = f"""
     <!DOCTYPE html>
@@ -236,50 +250,159 @@ def send_brevo_email(lectures: list[dict]) -> tuple[str, bool]:
     </body>
     </html>
     """
+    return email_body
+
+
+def default_subject(
+    lectures: list[Lecture], updated: list["LectureChange"] | None
+) -> str:
+    if not updated:
+        return f"PSUT Lectures Update: {len(lectures)} Found"
+    return f"PSUT Lectures Update: {len(lectures)} New, {len(updated)} Updated"
+
+
+def send_brevo_email(
+    lectures: list[Lecture],
+    subject: str | None = None,
+    updated: list["LectureChange"] | None = None,
+    timeout: float | None = None,
+) -> tuple[str, bool]:
+    """Formats lecture data and sends via Brevo, one request per
+    BREVO_MAX_MESSAGE_VERSIONS: subscribers whose preferences select the same
+    lectures share one message version
+    returns: Message indicating success or failure, and a bool success flag
+    """
+    api_key = os.getenv("BREVO_API_KEY")
+    sender_email = os.getenv("SENDER_EMAIL")
+
+    # Fetch subscribers and their preferences from Google Sheet
+    try:
+        # gspread is only needed when an email actually goes out
+        from google_sheets import fetch_subscribers_from_sheet
+
+        if os.getenv("TESTING_MODE", "false").lower() == "true":
+            # In testing mode, use fixed test emails without preferences
+            subscribers = [
+                Subscriber("sam20220837@std.psut.edu.jo"),
+                Subscriber("kayyal.sami0140@gmail.com"),
+            ]
+        else:
+            subscribers = fetch_subscribers_from_sheet()
+    except Exception as e:
+        notify_error(
+            e, source=__name__, details="Failed to fetch recipients from Google Sheet"
+        )
+        return f"Failed to fetch recipients from Google Sheet: {e}", False
 
-    # 2. Prepare Brevo Payload
-    # Use BCC to hide recipients from each other
-    bcc_recipients = [{"email": email.strip()} for email in recipients if email.strip()]
+    if not api_key or not sender_email:
+        notify_error("Brevo configuration missing in .env", source=__name__)
+        return "Brevo configuration missing in .env", False
+    if not subscribers:
+        notify_error("No recipients found in Google Sheet", source=__name__)
+        return "No recipients found in Google Sheet", False
 
-    url = "https://api.brevo.com/v3/smtp/email"
+    # 1. Group subscribers by the lectures their preferences select
+    # Skip full events, and those whose registration period is over
+    open_lectures = [
+        lec for lec in lectures if not (lec.is_full or lec.registration_ended)
+    ]
+    open_updated = [
+        change
+        for change in updated or []
+        if not (change.lecture.is_full or change.lecture.registration_ended)
+    ]
+    if not open_lectures and not open_updated:
+        return "No available lectures to email (all were full or expired).", True
+    groups = group_by_selection(subscribers, open_lectures, open_updated)
+    if not groups:
+        return "No subscriber's preferences match these lectures.", True
+
+    # 2. Render the cards of each distinct selection once, one message
+    # version per group. Use BCC to hide recipients from each other.
+    versions = []
+    for (lecture_indexes, update_indexes), emails in groups.items():
+        group_lectures = [open_lectures[i] for i in lecture_indexes]
+        group_updated = [open_updated[i] for i in update_indexes]
+        email_body = build_email_html(group_lectures, group_updated)
+        group_subject = subject or default_subject(group_lectures, group_updated)
+        for i in range(0, len(emails), BREVO_MAX_VERSION_RECIPIENTS):
+            versions.append(
+                {
+                    "to": [{"email": sender_email}],  # Send to yourself
+                    "bcc": [
+                        {"email": email}
+                        for email in emails[i : i + BREVO_MAX_VERSION_RECIPIENTS]
+                    ],
+                    "subject": group_subject,
+                    "htmlContent": email_body,
+                }
+            )
+
+    url = os.getenv("BREVO_API_URL", "https://api.brevo.com/v3/smtp/email")
     headers = {
         "accept": "application/json",
         "api-key": api_key,
         "content-type": "application/json",
     }
-    payload = {
-        "sender": {"name": "Community Service", "email": sender_email},
-        "to": [{"email": sender_email}],  # Send to yourself
-        "bcc": bcc_recipients,  # All actual recipients in BCC (hidden from each other)
-        "subject": f"PSUT Lectures Update: {len(lectures)} Found",
-        "htmlContent": email_body,
-    }
+    payloads = brevo_payloads(versions, sender_email)
+    recipient_count = sum(len(emails) for emails in groups.values())
 
-    # 3. Send
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        if response.status_code in [200, 201]:
-            return "Emails sent successfully via Brevo.", True
-        else:
+    # 3. Send, one request per BREVO_MAX_MESSAGE_VERSIONS versions
+    for number, payload in enumerate(payloads, 1):
+        batch = f" (request {number}/{len(payloads)})" if len(payloads) > 1 else ""
+        try:
+            # Not retried: a call that timed out may still have been delivered
+            response = http_transport.post(
+                url, json=payload, headers=headers, timeout=timeout
+            )
+        except Exception as e:
+            notify_error(
+                e, source=__name__, details="Exception occurred while sending email"
+            )
+            return f"Exception occurred while sending email{batch}: {e}", False
+        if response.status_code not in [200, 201]:
             notify_error(
                 f"Brevo email failed with status {response.status_code}",
                 source=__name__,
                 details=response.text,
             )
             return (
-                f"Failed to send email via Brevo. Status: {response.status_code}, Response: {response.text}",
+                f"Failed to send email via Brevo{batch}. Status: {response.status_code}, Response: {response.text}",
                 False,
             )
-    except Exception as e:
-        notify_error(
-            e, source=__name__, details="Exception occurred while sending email"
-        )
-        return f"Exception occurred while sending email: {e}", False
+    return (
+        f"Emails sent successfully via Brevo ({len(groups)} variants "
+        f"for {recipient_count} recipients).",
+        True,
+    )
+
+
+def brevo_payloads(versions: list[dict], sender_email: str) -> list[dict]:
+    """Request bodies for the message versions, at most BREVO_MAX_MESSAGE_VERSIONS
+    each; a request with a single version is sent as a plain email"""
+    payloads = []
+    for i in range(0, len(versions), BREVO_MAX_MESSAGE_VERSIONS):
+        batch = versions[i : i + BREVO_MAX_MESSAGE_VERSIONS]
+        payload = {
+            "sender": {"name": "Community Service", "email": sender_email},
+            # Defaults for the versions
+            "subject": batch[0]["subject"],
+            "htmlContent": batch[0]["htmlContent"],
+        }
+        if len(batch) == 1:
+            payload["to"] = batch[0]["to"]
+            payload["bcc"] = batch[0]["bcc"]
+        else:
+            payload["messageVersions"] = batch
+        payloads.append(payload)
+    return payloads
 
 
 if __name__ == "__main__":
     with open("lectures.json", "r") as f:
         lectures_data = json.load(f)
 
-    message, success = send_brevo_email(lectures_data)
+    message, success = send_brevo_email(
+        [Lecture.from_dict(lecture) for lecture in lectures_data]
+    )
     print(message, success)
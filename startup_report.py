@@ -0,0 +1,120 @@
+"""Report what importing the web entry point costs, like `python -X importtime`.
+
+    python startup_report.py            # top imports by cumulative time
+    python startup_report.py --check    # exit 1 if over the cold-start budget
+
+The budget is IMPORT_MODULE_BUDGET, and none of HEAVY_MODULES may be imported
+by the entry point itself. Both are deterministic, so a build can fail on
+them. Wall-clock time depends on the machine and its load: going over
+IMPORT_TIME_BUDGET_MS only prints a warning, and only the far more generous
+IMPORT_TIME_LIMIT_MS, which an eager heavy import would blow through, fails.
+tests/test_startup.py runs the same check.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+# Only needed once a scrape actually runs, never when gunicorn imports main:app
+HEAVY_MODULES = [
+    "undetected_chromedriver",
+    "selenium",
+    "bs4",
+    "lxml",
+    "google.genai",
+    "google.cloud.storage",
+    "gspread",
+    "pydantic",
+]
+IMPORT_TIME_BUDGET_MS = float(os.getenv("IMPORT_TIME_BUDGET_MS", "600"))
+IMPORT_TIME_LIMIT_MS = float(os.getenv("IMPORT_TIME_LIMIT_MS", "3000"))
+IMPORT_MODULE_BUDGET = int(os.getenv("IMPORT_MODULE_BUDGET", "700"))
+
+
+def measure_imports(module: str) -> list[tuple[str, int, int]]:
+    """Import `module` in a fresh interpreter and return
+    (name, self_us, cumulative_us) for every module it loaded"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def import_time_ms(imports: list[tuple[str, int, int]], module: str) -> float:
+    return max(
+        (cumulative_us for name, _, cumulative_us in imports if name == module),
+        default=0,
+    ) / 1000
+
+
+def check_budget(
+    imports: list[tuple[str, int, int]], module: str
+) -> tuple[list[str], list[str]]:
+    """(problems, warnings) of importing `module` against the budget"""
+    total_ms = import_time_ms(imports, module)
+    names = {name for name, _, _ in imports}
+    problems, warnings = [], []
+    if total_ms > IMPORT_TIME_LIMIT_MS:
+        problems.append(
+            f"took {total_ms:.1f} ms, limit is {IMPORT_TIME_LIMIT_MS:.0f} ms"
+        )
+    elif total_ms > IMPORT_TIME_BUDGET_MS:
+        warnings.append(
+            f"took {total_ms:.1f} ms, budget is {IMPORT_TIME_BUDGET_MS:.0f} ms"
+        )
+    if len(imports) > IMPORT_MODULE_BUDGET:
+        problems.append(
+            f"loaded {len(imports)} modules, budget is {IMPORT_MODULE_BUDGET}"
+        )
+    eager = [heavy for heavy in HEAVY_MODULES if heavy in names]
+    if eager:
+        problems.append(f"eagerly imports {', '.join(eager)}")
+    return problems, warnings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--check", action="store_true", help="enforce the budget")
+    args = parser.parse_args()
+
+    imports = measure_imports(args.module)
+    total_ms = import_time_ms(imports, args.module)
+
+    print(f"import {args.module}: {total_ms:.1f} ms, {len(imports)} modules")
+    print(f"{'cumulative ms':>14} {'self ms':>8}  module")
+    top_level = [entry for entry in imports if "." not in entry[0]]
+    for name, self_us, cumulative_us in sorted(
+        top_level, key=lambda entry: entry[2], reverse=True
+    )[: args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>8.1f}  {name}")
+
+    if not args.check:
+        return 0
+
+    problems, warnings = check_budget(imports, args.module)
+    for warning in warnings:
+        print(f"WARN: import {args.module} {warning}", file=sys.stderr)
+    for problem in problems:
+        print(f"FAIL: import {args.module} {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
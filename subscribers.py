@@ -0,0 +1,138 @@
+"""Subscribers and their lecture preferences.
+
+Preferences come from optional columns of the recipients sheet, matched by
+header (case and spacing are ignored); an empty cell means "no filter":
+    Only With Hours     yes/true/1: no lectures known to have zero activity hours
+    Locations           comma-separated, any of them in the lecture location
+    Days                comma-separated day names (Sun, Monday, ...)
+    Earliest Time       HH:MM, no lectures starting before it
+    Latest Time         HH:MM, no lectures starting after it
+
+Subscribers with the same preferences are matched once, and subscribers whose
+preferences select the same lectures share one rendered email, see
+`group_by_selection`.
+"""
+
+from datetime import time
+from typing import TYPE_CHECKING, Callable, Iterable
+
+from error_notifier import install_exception_hook
+from lectures import DAY_NAMES, Lecture, parse_times
+
+install_exception_hook(__name__)
+
+if TYPE_CHECKING:
+    from lecture_diff import LectureChange
+
+# Preference -> sheet header
+PREFERENCE_COLUMNS = {
+    "hours_only": "only with hours",
+    "locations": "locations",
+    "days": "days",
+    "earliest": "earliest time",
+    "latest": "latest time",
+}
+TRUE_VALUES = {"yes", "y", "true", "1", "نعم"}
+
+
+def _split(value: str | None) -> tuple[str, ...]:
+    parts = (part.strip().lower() for part in (value or "").split(","))
+    return tuple(sorted(part for part in parts if part))
+
+
+def _time(value: str | None) -> time | None:
+    return parse_times(value)[0]
+
+
+def _day_indexes(value: str | None) -> tuple[int, ...]:
+    """Weekday numbers of names like "sun" or "Sunday"; unknown names are dropped"""
+    prefixes = {name[:3].lower(): index for index, name in enumerate(DAY_NAMES)}
+    return tuple(
+        sorted({prefixes[day[:3]] for day in _split(value) if day[:3] in prefixes})
+    )
+
+
+class Subscriber:
+    __slots__ = ("email", "hours_only", "locations", "days", "earliest", "latest")
+
+    def __init__(
+        self,
+        email: str,
+        hours_only: bool = False,
+        locations: tuple[str, ...] = (),
+        days: tuple[int, ...] = (),
+        earliest: time | None = None,
+        latest: time | None = None,
+    ):
+        self.email = email
+        self.hours_only = hours_only
+        self.locations = locations
+        self.days = days
+        self.earliest = earliest
+        self.latest = latest
+
+    @classmethod
+    def from_row(cls, email: str, preferences: dict[str, str]) -> "Subscriber":
+        """From the raw cells of the PREFERENCE_COLUMNS, keyed by preference"""
+        return cls(
+            email,
+            hours_only=(preferences.get("hours_only") or "").strip().lower()
+            in TRUE_VALUES,
+            locations=_split(preferences.get("locations")),
+            days=_day_indexes(preferences.get("days")),
+            earliest=_time(preferences.get("earliest")),
+            latest=_time(preferences.get("latest")),
+        )
+
+    @property
+    def preferences(self) -> tuple:
+        """Hashable form; subscribers with equal preferences see the same lectures"""
+        return (self.hours_only, self.locations, self.days, self.earliest, self.latest)
+
+    def wants(self, lecture: Lecture) -> bool:
+        """Whether the lecture passes every filter; a filter on a field the
+        lecture does not have (e.g. unknown hours) lets it through"""
+        if self.hours_only and lecture.activity_hours == 0:
+            return False
+        if self.locations and lecture.location:
+            location = lecture.location.lower()
+            if not any(wanted in location for wanted in self.locations):
+                return False
+        if self.days and lecture.date and lecture.date.weekday() not in self.days:
+            return False
+        start = lecture.start_time
+        if start and self.earliest and start < self.earliest:
+            return False
+        if start and self.latest and start > self.latest:
+            return False
+        return True
+
+
+def _selection(
+    wants: Callable[[Lecture], bool], lectures: list[Lecture]
+) -> tuple[int, ...]:
+    return tuple(index for index, lecture in enumerate(lectures) if wants(lecture))
+
+
+def group_by_selection(
+    subscribers: Iterable[Subscriber],
+    lectures: list[Lecture],
+    updated: list["LectureChange"] | None = None,
+) -> dict[tuple[tuple[int, ...], tuple[int, ...]], list[str]]:
+    """(indexes into `lectures`, indexes into `updated`) -> emails of the
+    subscribers who get exactly those. Each distinct set of preferences is
+    evaluated once; subscribers who want none of the lectures are left out."""
+    updated_lectures = [change.lecture for change in updated or []]
+    selections: dict[tuple, tuple[tuple[int, ...], tuple[int, ...]]] = {}
+    groups: dict[tuple[tuple[int, ...], tuple[int, ...]], list[str]] = {}
+    for subscriber in subscribers:
+        key = subscriber.preferences
+        if key not in selections:
+            selections[key] = (
+                _selection(subscriber.wants, lectures),
+                _selection(subscriber.wants, updated_lectures),
+            )
+        selection = selections[key]
+        if selection[0] or selection[1]:
+            groups.setdefault(selection, []).append(subscriber.email)
+    return groups
@@ -0,0 +1,176 @@
+import unittest
+from unittest import mock
+
+from google.genai import errors
+
+from gemini_scheduler import GeminiScheduler, TokenBucket
+
+
+def server_error(code: int = 503) -> errors.ServerError:
+    return errors.ServerError(code, {"error": {"code": code, "message": "overloaded"}})
+
+
+def quota_error(retry_delay: str | None = None) -> errors.ClientError:
+    details = [{"retryDelay": retry_delay}] if retry_delay else []
+    error = {"code": 429, "message": "quota exceeded", "details": details}
+    return errors.ClientError(429, {"error": error})
+
+
+class Clock:
+    """Time that only moves when something sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeClient:
+    """Stands in for genai.Client. `outcomes` maps a model to what its requests
+    raise or return, in order; once they run out every request succeeds."""
+
+    def __init__(self, outcomes: dict[str, list] | None = None):
+        self.outcomes = outcomes or {}
+        self.models_called: list[str] = []
+        self.models = self
+
+    def generate_content(self, model: str, **kwargs):
+        self.models_called.append(model)
+        outcomes = self.outcomes.get(model) or []
+        outcome = outcomes.pop(0) if outcomes else f"answer from {model}"
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def scheduler_for(client: FakeClient, clock: Clock, **kwargs) -> GeminiScheduler:
+    options = dict(requests_per_minute=60_000, base_delay=2.0, max_delay=60.0)
+    return GeminiScheduler(
+        client, "primary", clock=clock, sleep=clock.sleep, **{**options, **kwargs}
+    )
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_waits_for_the_next_token(self):
+        clock = Clock()
+        bucket = TokenBucket(60, capacity=2, clock=clock, sleep=clock.sleep)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertEqual(bucket.acquire(), 0.0)
+        self.assertAlmostEqual(bucket.acquire(), 1.0)
+        self.assertEqual(clock.now, 1.0)
+
+    def test_refills_up_to_capacity(self):
+        clock = Clock()
+        bucket = TokenBucket(60, capacity=2, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+        clock.now += 30
+        self.assertEqual([bucket.acquire(), bucket.acquire()], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.acquire(), 1.0)
+
+    def test_scheduler_records_the_wait(self):
+        clock = Clock()
+        scheduler = scheduler_for(FakeClient(), clock, requests_per_minute=60)
+        scheduler.bucket = TokenBucket(60, capacity=1, clock=clock, sleep=clock.sleep)
+        scheduler.generate_content(contents=["x"])
+        scheduler.generate_content(contents=["x"])
+        self.assertAlmostEqual(scheduler.stats["rate_limit_wait_seconds"], 1.0)
+
+
+# Full jitter off: every backoff is its upper bound
+@mock.patch("gemini_scheduler.random.uniform", lambda low, high: high)
+class RetryTest(unittest.TestCase):
+    def test_server_errors_back_off_exponentially(self):
+        clock = Clock()
+        client = FakeClient({"primary": [server_error(), server_error(500)]})
+        scheduler = scheduler_for(client, clock)
+        answer = scheduler.generate_content(contents=["x"])
+        self.assertEqual(answer, "answer from primary")
+        self.assertEqual(clock.sleeps, [4.0, 8.0])
+        self.assertEqual(scheduler.stats["retries"], 2)
+        self.assertEqual(scheduler.stats["backoff_seconds"], 12.0)
+
+    def test_quota_error_waits_as_long_as_asked(self):
+        clock = Clock()
+        client = FakeClient({"primary": [quota_error("31s")]})
+        scheduler_for(client, clock).generate_content(contents=["x"])
+        self.assertEqual(clock.sleeps, [31.0])
+
+    def test_bad_request_is_not_retried(self):
+        clock = Clock()
+        bad = errors.ClientError(400, {"error": {"code": 400, "message": "bad"}})
+        scheduler = scheduler_for(FakeClient({"primary": [bad]}), clock)
+        with self.assertRaises(errors.ClientError):
+            scheduler.generate_content(contents=["x"])
+        self.assertEqual(scheduler.stats["retries"], 0)
+
+    def test_retry_budget_is_shared_by_the_run(self):
+        clock = Clock()
+        client = FakeClient({"primary": [server_error()] * 4})
+        scheduler = scheduler_for(
+            client, clock, retry_budget=2, max_attempts_per_model=10
+        )
+        with self.assertRaises(errors.ServerError):
+            scheduler.generate_content(contents=["x"])
+        self.assertEqual(scheduler.stats["retries"], 2)
+        self.assertEqual(len(client.models_called), 3)
+        # The budget is spent, so the next failure is final straight away
+        with self.assertRaises(errors.ServerError):
+            scheduler.generate_content(contents=["x"])
+        self.assertEqual(scheduler.stats["retries"], 2)
+
+
+@mock.patch("gemini_scheduler.random.uniform", lambda low, high: high)
+class FallbackTest(unittest.TestCase):
+    def test_exhausted_primary_falls_back_and_is_restored(self):
+        clock = Clock()
+        client = FakeClient({"primary": [quota_error()] * 2})
+        scheduler = scheduler_for(
+            client,
+            clock,
+            fallback_model_name="fallback",
+            max_attempts_per_model=2,
+            fallback_cooldown=300,
+        )
+        self.assertEqual(
+            scheduler.generate_content(contents=["x"]), "answer from fallback"
+        )
+        self.assertEqual(client.models_called, ["primary", "primary", "fallback"])
+        self.assertEqual(
+            scheduler.stats["fallbacks"],
+            [{"from": "primary", "to": "fallback", "code": 429}],
+        )
+
+        # Still cooling down
+        scheduler.generate_content(contents=["x"])
+        self.assertEqual(client.models_called[-1], "fallback")
+
+        clock.now += 300
+        self.assertEqual(
+            scheduler.generate_content(contents=["x"]), "answer from primary"
+        )
+        self.assertEqual(scheduler.stats["primary_restored"], 1)
+
+    def test_failing_fallback_gives_up(self):
+        clock = Clock()
+        client = FakeClient(
+            {"primary": [server_error()] * 2, "fallback": [server_error()] * 2}
+        )
+        scheduler = scheduler_for(
+            client, clock, fallback_model_name="fallback", max_attempts_per_model=2
+        )
+        with self.assertRaises(errors.ServerError):
+            scheduler.generate_content(contents=["x"])
+        self.assertEqual(
+            client.models_called, ["primary", "primary", "fallback", "fallback"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
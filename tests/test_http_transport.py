@@ -0,0 +1,25 @@
+import unittest
+
+import requests
+
+from http_transport import HTTP_MAX_RETRY_AFTER_SECONDS, _retry_delay
+
+
+def response_with(retry_after: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 429
+    response.headers["Retry-After"] = retry_after
+    return response
+
+
+class RetryDelayTest(unittest.TestCase):
+    def test_retry_after_is_honoured(self):
+        self.assertEqual(_retry_delay(0, response_with("2")), 2.0)
+
+    def test_retry_after_is_capped(self):
+        delay = _retry_delay(0, response_with("86400"))
+        self.assertEqual(delay, HTTP_MAX_RETRY_AFTER_SECONDS)
+
+
+if __name__ == "__main__":
+    unittest.main()
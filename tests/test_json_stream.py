@@ -0,0 +1,74 @@
+import json
+import random
+import re
+import unittest
+
+from json_stream import TruncatedJSONError, iter_json_array_objects
+
+LECTURES = [
+    {"title": "Intro {to} [brackets]", "href": "https://portal/lecture/1"},
+    {"title": 'Quotes \\" and \\\\ escapes', "nested": {"a": [1, {"b": None}]}},
+    {"title": "محاضرة خدمة المجتمع", "location": "Main Auditorium"},
+]
+TEXT = json.dumps(LECTURES, ensure_ascii=False, indent=2)
+# indent=2 puts the closing brace of every top-level object here
+OBJECT_ENDS = [match.end() for match in re.finditer(r"\n  \}", TEXT)]
+
+
+def split_at(text: str, cuts: list[int]) -> list[str]:
+    bounds = [0, *sorted(cuts), len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+class IterJsonArrayObjectsTest(unittest.TestCase):
+    def test_whole_text_in_one_chunk(self):
+        self.assertEqual(list(iter_json_array_objects([TEXT])), LECTURES)
+
+    def test_every_chunk_size(self):
+        for size in range(1, len(TEXT) + 1):
+            chunks = [TEXT[i : i + size] for i in range(0, len(TEXT), size)]
+            self.assertEqual(list(iter_json_array_objects(chunks)), LECTURES, size)
+
+    def test_random_chunk_boundaries(self):
+        rng = random.Random(29)
+        for _ in range(200):
+            cuts = rng.sample(range(1, len(TEXT)), rng.randint(1, 40))
+            chunks = split_at(TEXT, cuts)
+            self.assertEqual(list(iter_json_array_objects(chunks)), LECTURES, cuts)
+
+    def test_empty_chunks_are_skipped(self):
+        chunks = ["", TEXT[:10], "", TEXT[10:], ""]
+        self.assertEqual(list(iter_json_array_objects(chunks)), LECTURES)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array_objects(["[", " ]"])), [])
+
+    def test_objects_are_yielded_before_the_stream_ends(self):
+        def chunks():
+            yield TEXT[: OBJECT_ENDS[0]]
+            # Reached only once the first object has been handed out
+            self.assertEqual(seen, [LECTURES[0]])
+            yield TEXT[OBJECT_ENDS[0] :]
+
+        seen = []
+        for obj in iter_json_array_objects(chunks()):
+            seen.append(obj)
+        self.assertEqual(seen, LECTURES)
+
+    def test_truncated_stream_keeps_completed_objects(self):
+        self.assertEqual(len(OBJECT_ENDS), len(LECTURES))
+        for cut in range(len(TEXT) - 1):
+            completed = sum(1 for end in OBJECT_ENDS if end <= cut)
+            seen = []
+            with self.assertRaises(TruncatedJSONError, msg=cut):
+                for obj in iter_json_array_objects(split_at(TEXT[:cut], [cut // 2])):
+                    seen.append(obj)
+            self.assertEqual(seen, LECTURES[:completed], cut)
+
+    def test_truncation_inside_an_object_is_reported(self):
+        with self.assertRaisesRegex(TruncatedJSONError, "inside an object"):
+            list(iter_json_array_objects([TEXT[: TEXT.index("Main")]]))
+
+
+if __name__ == "__main__":
+    unittest.main()
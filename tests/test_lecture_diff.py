@@ -0,0 +1,43 @@
+import unittest
+
+from lecture_diff import diff_lectures
+from lectures import Lecture
+
+HREF = "https://portal.psut.edu.jo/lecture/1"
+
+
+def stored(current: int, maximum: int = 5) -> dict:
+    return {
+        "href": HREF,
+        "title": "Seminar",
+        "max_registrations": maximum,
+        "current_registrations": current,
+    }
+
+
+def changes(old: dict, new: dict):
+    return diff_lectures([Lecture.from_dict(new)], [old])
+
+
+class CountChangeTest(unittest.TestCase):
+    def test_freed_seat_in_full_lecture_is_notable(self):
+        diff = changes(stored(5), stored(4))
+        self.assertEqual(len(diff.changed), 1)
+        self.assertTrue(diff.changed[0].seat_opened)
+        self.assertEqual(diff.updated, diff.changed)
+
+    def test_count_change_in_open_lecture_is_quiet(self):
+        diff = changes(stored(2), stored(3))
+        self.assertEqual(len(diff.changed), 1)
+        self.assertEqual(diff.updated, [])
+
+    def test_lecture_filling_up_is_quiet(self):
+        self.assertEqual(changes(stored(4), stored(5)).updated, [])
+
+    def test_raised_maximum_is_notable(self):
+        diff = changes(stored(5), stored(5, maximum=6))
+        self.assertEqual(diff.updated, diff.changed)
+
+
+if __name__ == "__main__":
+    unittest.main()
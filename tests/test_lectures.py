@@ -0,0 +1,47 @@
+import unittest
+from datetime import date, datetime, time, timezone
+from unittest import mock
+
+import lectures
+from lectures import Lecture, parse_times
+
+
+class LectureTest(unittest.TestCase):
+    def test_unparseable_registration_dates_keep_their_text(self):
+        lecture = Lecture.from_dict(
+            {"start_date": "Sunday 5 Oct", "end_date": "15/10/2026"}
+        )
+        self.assertIsNone(lecture.start_date)
+        stored = lecture.to_dict()
+        self.assertEqual(stored["start_date"], "Sunday 5 Oct")
+        self.assertEqual(stored["end_date"], "15/10/2026")
+        self.assertEqual(Lecture.from_dict(stored).to_dict(), stored)
+
+    def test_range_takes_its_trailing_meridiem(self):
+        lecture = Lecture.from_dict({"time": "2:00 - 3:00 PM"})
+        self.assertEqual(lecture.start_time, time(14, 0))
+        self.assertEqual(lecture.end_time, time(15, 0))
+        self.assertEqual(lecture.to_dict()["time"], "14:00 - 15:00")
+
+    def test_range_across_noon_starts_in_the_morning(self):
+        self.assertEqual(parse_times("11:00 - 1:00 PM"), (time(11, 0), time(13, 0)))
+        self.assertEqual(parse_times("11:00 AM - 1:00"), (time(11, 0), time(13, 0)))
+
+    def test_ambiguous_time_is_stored_as_written(self):
+        for text in ["2:00 - 3:00", "3:00 PM - 2:00 PM"]:
+            lecture = Lecture.from_dict({"time": text})
+            self.assertIsNone(lecture.start_time)
+            self.assertEqual(lecture.to_dict()["time"], text)
+
+    def test_status_uses_the_portal_date(self):
+        # 22:30 UTC on the 14th is already the 15th in Amman (UTC+3)
+        now = datetime(2026, 10, 14, 22, 30, tzinfo=timezone.utc)
+        with mock.patch.object(lectures, "datetime", wraps=datetime) as clock:
+            clock.now.side_effect = lambda tz=None: now.astimezone(tz)
+            self.assertEqual(lectures.portal_today(), date(2026, 10, 15))
+            lecture = Lecture.from_dict({"end_date": "14/10/2026"})
+        self.assertTrue(lecture.registration_ended)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import notifications
+from benchmarks.fake_services import FakeServices
+from lectures import Lecture
+from notifications import (
+    Channel,
+    Notification,
+    NotificationDispatcher,
+    create_dispatcher,
+    wait_for_optional_channels,
+)
+
+LECTURE = Lecture.from_dict(
+    {
+        "href": "https://portal.psut.edu.jo/lecture/1",
+        "title": "Seminar",
+        "time": "10:00 - 11:00",
+        "max_registrations": 50,
+        "current_registrations": 10,
+    }
+)
+
+
+class RecorderDispatchTest(unittest.TestCase):
+    def setUp(self):
+        self.services = FakeServices(brevo_latency=0.05).__enter__()
+        self.environ = mock.patch.dict(os.environ, self.services.environ())
+        self.environ.start()
+
+    def tearDown(self):
+        wait_for_optional_channels()
+        self.environ.stop()
+        self.services.__exit__(None, None, None)
+
+    def dispatcher(self, channels: str, required: str = "email"):
+        with (
+            mock.patch.object(notifications, "NOTIFY_CHANNELS", channels),
+            mock.patch.object(notifications, "NOTIFY_REQUIRED_CHANNELS", required),
+        ):
+            return create_dispatcher()
+
+    def paths(self) -> list[str]:
+        return sorted(record["path"].split("/")[1] for record in self.services.recorded)
+
+    def test_every_channel_is_sent(self):
+        result = self.dispatcher("email,ntfy,telegram").dispatch(
+            Notification([LECTURE])
+        )
+        self.assertTrue(result.success)
+        self.assertTrue(result.results["email"].success)
+        wait_for_optional_channels()
+        self.assertEqual(self.paths(), ["brevo", "push", "telegram"])
+        push = next(r for r in self.services.recorded if r["path"] == "/push")
+        self.assertIn("Seminar", push["payload"])
+
+    def test_optional_channel_does_not_hold_up_the_result(self):
+        self.services.brevo_latency = 0.5
+        started_at = time.monotonic()
+        result = self.dispatcher("email,ntfy", required="").dispatch(
+            Notification([LECTURE])
+        )
+        self.assertLess(time.monotonic() - started_at, 0.4)
+        self.assertEqual(result.stats()["ntfy"], {"required": False, "pending": True})
+        wait_for_optional_channels()
+        self.assertEqual(self.paths(), ["brevo", "push"])
+
+    def test_required_channel_missing_from_channels_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.dispatcher("ntfy", required="email")
+
+
+class DispatcherTest(unittest.TestCase):
+    def test_late_required_channel_still_counts(self):
+        def slow(notification, timeout):
+            # e.g. the subscriber fetch, which is not in the channel's budget
+            time.sleep(0.3)
+            return "sent"
+
+        channel = Channel("email", slow, timeout=0.01, required=True)
+        result = NotificationDispatcher([channel]).dispatch(Notification([]))
+        self.assertTrue(result.success)
+        self.assertEqual(result.results["email"].message, "sent")
+
+    def test_finished_optional_threads_are_dropped(self):
+        sent = threading.Event()
+
+        def send(notification, timeout):
+            sent.set()
+            return "sent"
+
+        dispatcher = NotificationDispatcher([Channel("ntfy", send, timeout=1)])
+        dispatcher.dispatch(Notification([]))
+        sent.wait(1)
+        for thread, _ in list(notifications._optional_threads):
+            thread.join(1)
+        dispatcher.dispatch(Notification([]))
+        self.assertEqual(len(notifications._optional_threads), 1)
+        wait_for_optional_channels()
+        self.assertEqual(notifications._optional_threads, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,166 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from lecture_diff import diff_lectures
+from lectures import Lecture
+from seat_watch import SeatWatcher, save_seat_counts
+
+PORTAL = "https://portal.psut.edu.jo"
+HREF = f"{PORTAL}/lecture/1"
+LOGIN_PAGE = '<form><input id="loginPass" type="password"></form>'
+
+
+def details_page(current: int, maximum: int = 5) -> str:
+    return (
+        f"<div><b>Registered Count:</b> {current}</div>"
+        f"<div><b>Maximum Registration:</b> {maximum}</div>"
+    )
+
+
+def stored_lecture(current: int, maximum: int = 5) -> dict:
+    return Lecture.from_dict(
+        {
+            "href": HREF,
+            "title": "Seminar",
+            "max_registrations": maximum,
+            "current_registrations": current,
+        }
+    ).to_dict()
+
+
+class Clock:
+    """Time that only moves when the watcher sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+class FakePortal:
+    """Serves `pages` in order, then keeps serving the last one"""
+
+    def __init__(self, *pages: str):
+        self.pages = list(pages)
+        self.fetches = 0
+        self.logins = 0
+
+    def fetch(self, href: str) -> str:
+        self.fetches += 1
+        return self.pages.pop(0) if len(self.pages) > 1 else self.pages[0]
+
+    def relogin(self):
+        self.logins += 1
+
+
+class Notifier:
+    """Records (href, spots left) of every announcement"""
+
+    def __init__(self, success: bool = True):
+        self.success = success
+        self.calls: list[list[tuple]] = []
+
+    def __call__(self, lectures: list[Lecture]) -> bool:
+        self.calls.append([(lecture.href, lecture.spots_left) for lecture in lectures])
+        return self.success
+
+
+def watcher_for(portal: FakePortal, notify=None, save=None, **kwargs) -> SeatWatcher:
+    clock = Clock()
+    return SeatWatcher(
+        [Lecture.from_dict(stored_lecture(5))],
+        fetch_page=portal.fetch,
+        notify=notify or Notifier(),
+        save=save,
+        relogin=portal.relogin,
+        clock=clock,
+        sleep=clock.sleep,
+        **kwargs,
+    )
+
+
+class PollLoopTest(unittest.TestCase):
+    def test_freed_seat_is_announced_once(self):
+        notify = Notifier()
+        portal = FakePortal(details_page(5), details_page(4))
+        watcher = watcher_for(portal, notify=notify)
+        watcher.run(interval=10, max_minutes=1)
+
+        self.assertEqual(watcher.stats["polls"], 6)
+        self.assertEqual(notify.calls, [[(HREF, 1)]])
+        self.assertEqual(watcher.stats["opened"], 1)
+
+    def test_unreadable_page_is_skipped(self):
+        portal = FakePortal("<html>maintenance</html>")
+        watcher = watcher_for(portal)
+        watcher.run(interval=10, max_minutes=0.5)
+        self.assertEqual(watcher.stats["unreadable"], 3)
+        self.assertEqual(portal.logins, 0)
+
+
+class ReloginTest(unittest.TestCase):
+    def test_expired_session_logs_in_again(self):
+        portal = FakePortal(LOGIN_PAGE, details_page(4))
+        watcher = watcher_for(portal)
+        self.assertEqual(len(watcher.poll_once()), 1)
+        self.assertEqual(portal.logins, 1)
+        self.assertEqual(portal.fetches, 2)
+
+    def test_relogins_are_capped(self):
+        portal = FakePortal(LOGIN_PAGE)
+        watcher = watcher_for(portal, max_relogins=2)
+        watcher.run(interval=10, max_minutes=1)
+        self.assertEqual(portal.logins, 2)
+        self.assertEqual(watcher.stats["relogins"], 2)
+        self.assertEqual(watcher.stats["unreadable"], watcher.stats["polls"])
+
+
+class SavedCountsTest(unittest.TestCase):
+    def setUp(self):
+        # The stored state is lectures.json in the working directory
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+        self.environ = mock.patch.dict(os.environ, {"ENVIRONMENT": "linux"})
+        self.environ.start()
+        with open("lectures.json", "w", encoding="utf-8") as f:
+            json.dump([stored_lecture(5)], f)
+
+    def tearDown(self):
+        self.environ.stop()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def next_scrape(self):
+        """What the next full scrape makes of the stored state at 4/5"""
+        with open("lectures.json", encoding="utf-8") as f:
+            stored = json.load(f)
+        return diff_lectures([Lecture.from_dict(stored_lecture(4))], stored)
+
+    def test_announced_seat_is_not_announced_again(self):
+        watcher = watcher_for(FakePortal(details_page(4)), save=save_seat_counts)
+        watcher.run(interval=10, max_minutes=0.1)
+        self.assertEqual(watcher.stats["opened"], 1)
+        self.assertFalse(self.next_scrape().state_changed)
+
+    def test_failed_notification_is_left_for_the_scrape(self):
+        watcher = watcher_for(
+            FakePortal(details_page(4)),
+            notify=Notifier(success=False),
+            save=save_seat_counts,
+        )
+        watcher.run(interval=10, max_minutes=0.1)
+        diff = self.next_scrape()
+        self.assertEqual(len(diff.updated), 1)
+        self.assertTrue(diff.updated[0].seat_opened)
+
+
+if __name__ == "__main__":
+    unittest.main()
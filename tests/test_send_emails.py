@@ -0,0 +1,96 @@
+import os
+import unittest
+from unittest import mock
+
+import send_emails
+from benchmarks.fake_services import FakeServices
+from lecture_diff import diff_lectures
+from lectures import Lecture
+from send_emails import build_email_html, send_brevo_email
+from subscribers import Subscriber
+
+PORTAL = "https://portal.psut.edu.jo"
+
+
+def lecture(number: int, **fields) -> Lecture:
+    data = {"href": f"{PORTAL}/lecture/{number}", "title": f"Lecture {number}"}
+    return Lecture.from_dict({**data, **fields})
+
+
+class UpdateEmailTest(unittest.TestCase):
+    def test_opened_seat_shows_the_registered_count(self):
+        stored = lecture(1, max_registrations=5, current_registrations=5)
+        current = lecture(1, max_registrations=5, current_registrations=4)
+        [change] = diff_lectures([current], [stored.to_dict()]).updated
+        self.assertTrue(change.seat_opened)
+        html = build_email_html([], [change])
+        self.assertIn("<strong>Registered:</strong>", html)
+        self.assertIn(">5</span> → 4", html)
+
+
+class BrevoPayloadTest(unittest.TestCase):
+    def setUp(self):
+        self.services = FakeServices(brevo_latency=0).__enter__()
+        environ = {**self.services.environ(), "TESTING_MODE": "false"}
+        self.environ = mock.patch.dict(os.environ, environ)
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        self.services.__exit__(None, None, None)
+
+    def send(self, subscribers: list[Subscriber], lectures: list[Lecture]):
+        with mock.patch(
+            "google_sheets.fetch_subscribers_from_sheet", return_value=subscribers
+        ):
+            return send_brevo_email(lectures)
+
+    def test_one_selection_is_a_plain_email(self):
+        message, success = self.send(
+            [Subscriber("a@example.com"), Subscriber("b@example.com")], [lecture(1)]
+        )
+        self.assertTrue(success, message)
+        [payload] = self.services.emails()
+        self.assertNotIn("messageVersions", payload)
+        self.assertEqual(
+            payload["bcc"], [{"email": "a@example.com"}, {"email": "b@example.com"}]
+        )
+        self.assertIn("Lecture 1", payload["htmlContent"])
+
+    def test_each_selection_gets_a_message_version(self):
+        lectures = [
+            lecture(1, activity_hours="2"),
+            lecture(2, activity_hours="0"),
+        ]
+        subscribers = [
+            Subscriber("all@example.com"),
+            Subscriber("hours@example.com", hours_only=True),
+        ]
+        message, success = self.send(subscribers, lectures)
+        self.assertTrue(success, message)
+        [payload] = self.services.emails()
+        versions = payload["messageVersions"]
+        self.assertEqual(
+            [version["bcc"] for version in versions],
+            [[{"email": "all@example.com"}], [{"email": "hours@example.com"}]],
+        )
+        self.assertIn("Lecture 2", versions[0]["htmlContent"])
+        self.assertNotIn("Lecture 2", versions[1]["htmlContent"])
+        self.assertEqual(versions[1]["subject"], "PSUT Lectures Update: 1 Found")
+
+    @mock.patch.object(send_emails, "BREVO_MAX_VERSION_RECIPIENTS", 1)
+    def test_versions_are_split_across_requests(self):
+        subscribers = [Subscriber(f"s{i}@example.com") for i in range(1001)]
+        message, success = self.send(subscribers, [lecture(1)])
+        self.assertTrue(success, message)
+        first, second = self.services.emails()
+        self.assertEqual(len(first["messageVersions"]), 1000)
+        last = first["messageVersions"][-1]
+        self.assertEqual(last["bcc"], [{"email": "s999@example.com"}])
+        # The one version left over goes out as a plain email
+        self.assertNotIn("messageVersions", second)
+        self.assertEqual(second["bcc"], [{"email": "s1000@example.com"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
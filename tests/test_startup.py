@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+
+import startup_report
+from startup_report import HEAVY_MODULES, check_budget, measure_imports
+
+
+class StartupBudgetTest(unittest.TestCase):
+    """What gunicorn pays to import main:app, see startup_report"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.imports = measure_imports("main")
+
+    def test_main_stays_within_its_budget(self):
+        problems, _ = check_budget(self.imports, "main")
+        self.assertEqual(problems, [])
+
+    def test_no_heavy_module_is_imported(self):
+        names = {name for name, _, _ in self.imports}
+        self.assertEqual([heavy for heavy in HEAVY_MODULES if heavy in names], [])
+
+    def test_going_over_the_module_budget_fails(self):
+        with mock.patch.object(startup_report, "IMPORT_MODULE_BUDGET", 1):
+            problems, _ = check_budget(self.imports, "main")
+        self.assertEqual(len(problems), 1)
+        self.assertIn("modules", problems[0])
+
+    def test_time_over_the_budget_only_warns_until_the_limit(self):
+        slow = [("main", 0, 1_000_000)]
+        with (
+            mock.patch.object(startup_report, "IMPORT_TIME_BUDGET_MS", 600),
+            mock.patch.object(startup_report, "IMPORT_TIME_LIMIT_MS", 3000),
+        ):
+            self.assertEqual(len(check_budget(slow, "main")[1]), 1)
+            self.assertEqual(check_budget(slow, "main")[0], [])
+            slower = [("main", 0, 4_000_000)]
+            self.assertEqual(len(check_budget(slower, "main")[0]), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
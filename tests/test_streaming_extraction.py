@@ -0,0 +1,130 @@
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from google.genai import errors
+
+from benchmarks.fake_services import canned_lecture
+from checkpoints import RunCheckpoint
+from gemini_scheduler import GeminiScheduler
+from json_stream import TruncatedJSONError
+
+PORTAL = "https://portal.psut.edu.jo"
+BATCH = [
+    (f"{PORTAL}/lecture/{index}", f"Source URL: {PORTAL}/lecture/{index}\n<html>")
+    for index in range(4)
+]
+ANSWER = [canned_lecture(index, href, dates=3) for index, (href, _) in enumerate(BATCH)]
+TEXT = json.dumps(ANSWER, ensure_ascii=False)
+
+
+class Chunk:
+    def __init__(self, text: str):
+        self.text = text
+        self.usage_metadata = None
+
+
+class FakeStreamingClient:
+    """Stands in for genai.Client: streams `text` cut at `cuts`. Each entry of
+    `failures` is raised instead of the first chunk of one request."""
+
+    def __init__(self, text: str, cuts: list[int], failures: list[Exception] = ()):
+        self.text = text
+        self.cuts = sorted(cuts)
+        self.failures = list(failures)
+        self.requests: list[dict] = []
+        self.models = self
+
+    def generate_content_stream(self, model: str, **kwargs):
+        self.requests.append({"model": model, **kwargs})
+        if self.failures:
+            raise self.failures.pop(0)
+        bounds = [0, *self.cuts, len(self.text)]
+        for start, end in zip(bounds, bounds[1:]):
+            yield Chunk(self.text[start:end])
+
+
+def scheduler_for(client: FakeStreamingClient) -> GeminiScheduler:
+    return GeminiScheduler(
+        client, "fake-model", requests_per_minute=60_000, sleep=lambda _: None
+    )
+
+
+def random_cuts(rng: random.Random, text: str) -> list[int]:
+    return rng.sample(range(1, len(text)), rng.randint(1, 30))
+
+
+class GenerateContentStreamTest(unittest.TestCase):
+    def test_chunks_are_passed_through_in_order(self):
+        rng = random.Random(29)
+        for _ in range(20):
+            client = FakeStreamingClient(TEXT, random_cuts(rng, TEXT))
+            chunks = scheduler_for(client).generate_content_stream(contents=["x"])
+            self.assertEqual("".join(chunk.text for chunk in chunks), TEXT)
+
+    def test_opening_the_stream_is_retried(self):
+        unavailable = errors.ServerError(503, {"error": {"message": "overloaded"}})
+        client = FakeStreamingClient(TEXT, [10, 20], failures=[unavailable])
+        scheduler = scheduler_for(client)
+        chunks = list(scheduler.generate_content_stream(contents=["x"]))
+        self.assertEqual("".join(chunk.text for chunk in chunks), TEXT)
+        self.assertEqual(len(client.requests), 2)
+        self.assertEqual(scheduler.stats["retries"], 1)
+
+
+class StreamingExtractBatchTest(unittest.TestCase):
+    def setUp(self):
+        # Checkpoints are written relative to the working directory
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+        environ = {"ENVIRONMENT": "linux", "GEMINI_STREAMING": "true"}
+        self.environ = mock.patch.dict(os.environ, environ)
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def extract(self, client: FakeStreamingClient, checkpoint: RunCheckpoint):
+        from main import extract_batch
+
+        return extract_batch(scheduler_for(client), "system", BATCH, checkpoint)
+
+    def test_any_chunk_boundaries_give_the_same_lectures(self):
+        rng = random.Random(48)
+        expected = [lecture["href"] for lecture in ANSWER]
+        for _ in range(20):
+            checkpoint = RunCheckpoint.new()
+            client = FakeStreamingClient(TEXT, random_cuts(rng, TEXT))
+            lectures = self.extract(client, checkpoint)
+            self.assertEqual([lecture["href"] for lecture in lectures], expected)
+            self.assertEqual(checkpoint.extracted_hrefs(), set(expected))
+
+    def test_truncated_stream_keeps_the_completed_lectures(self):
+        # Cut in the middle of the third lecture
+        cut = TEXT.index(ANSWER[2]["officer_email"])
+        client = FakeStreamingClient(TEXT[:cut], [cut // 3, cut // 2])
+        checkpoint = RunCheckpoint.new()
+        with self.assertRaisesRegex(Exception, "truncated after 2 of 4"):
+            self.extract(client, checkpoint)
+        # The first two are checkpointed; the rest stay pending for a retry
+        self.assertEqual(checkpoint.extracted_hrefs(), {BATCH[0][0], BATCH[1][0]})
+
+    def test_stream_lectures_raises_on_truncation(self):
+        from main import stream_lectures
+
+        cut = TEXT.index(ANSWER[1]["title"])
+        seen = []
+        with self.assertRaises(TruncatedJSONError):
+            for lecture in stream_lectures([Chunk(TEXT[:5]), Chunk(TEXT[5:cut])]):
+                seen.append(lecture.href)
+        self.assertEqual(seen, [BATCH[0][0]])
+
+
+if __name__ == "__main__":
+    unittest.main()
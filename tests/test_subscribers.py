@@ -0,0 +1,78 @@
+import unittest
+
+from lecture_diff import diff_lectures
+from lectures import Lecture
+from subscribers import Subscriber, group_by_selection
+
+PORTAL = "https://portal.psut.edu.jo"
+
+
+def lecture(number: int, **fields) -> Lecture:
+    data = {"href": f"{PORTAL}/lecture/{number}", "title": f"Lecture {number}"}
+    return Lecture.from_dict({**data, **fields})
+
+
+class WantsTest(unittest.TestCase):
+    def test_hours_only_drops_zero_hours_but_keeps_unknown(self):
+        subscriber = Subscriber.from_row("a@example.com", {"hours_only": "Yes"})
+        self.assertTrue(subscriber.wants(lecture(1, activity_hours="2")))
+        self.assertFalse(subscriber.wants(lecture(2, activity_hours="0")))
+        self.assertTrue(subscriber.wants(lecture(3)))
+
+    def test_locations_match_part_of_the_location(self):
+        subscriber = Subscriber.from_row("a@example.com", {"locations": "IT, Library"})
+        self.assertTrue(subscriber.wants(lecture(1, location="IT Building 2")))
+        self.assertFalse(subscriber.wants(lecture(2, location="Main Hall")))
+        self.assertTrue(subscriber.wants(lecture(3)))
+
+    def test_days_and_times(self):
+        subscriber = Subscriber.from_row(
+            "a@example.com",
+            {"days": "Tue, thursday", "earliest": "10:00", "latest": "14:00"},
+        )
+        tuesday = "2026-10-20"
+        self.assertTrue(subscriber.wants(lecture(1, date=tuesday, time="11:00")))
+        self.assertFalse(subscriber.wants(lecture(2, date="2026-10-21")))
+        self.assertFalse(subscriber.wants(lecture(3, date=tuesday, time="9:00 AM")))
+        self.assertFalse(subscriber.wants(lecture(4, date=tuesday, time="3:00 PM")))
+        # Neither the date nor the time is known
+        self.assertTrue(subscriber.wants(lecture(5)))
+
+
+class GroupBySelectionTest(unittest.TestCase):
+    def test_subscribers_are_grouped_by_what_they_get(self):
+        lectures = [
+            lecture(1, activity_hours="2", location="IT Building"),
+            lecture(2, activity_hours="0", location="IT Building"),
+        ]
+        subscribers = [
+            Subscriber("all@example.com"),
+            Subscriber.from_row("hours@example.com", {"hours_only": "true"}),
+            Subscriber("also-all@example.com"),
+            Subscriber.from_row("hall@example.com", {"locations": "Hall"}),
+        ]
+        self.assertEqual(
+            group_by_selection(subscribers, lectures),
+            {
+                ((0, 1), ()): ["all@example.com", "also-all@example.com"],
+                ((0,), ()): ["hours@example.com"],
+            },
+        )
+
+    def test_updated_lectures_are_selected_separately(self):
+        stored = lecture(1, activity_hours="0", location="Main Hall")
+        current = lecture(1, activity_hours="0", location="IT Building")
+        updated = diff_lectures([current], [stored.to_dict()]).updated
+        subscribers = [
+            Subscriber("all@example.com"),
+            Subscriber("hours@example.com", hours_only=True),
+        ]
+        groups = group_by_selection(subscribers, [lecture(2)], updated)
+        self.assertEqual(
+            groups,
+            {((0,), (0,)): ["all@example.com"], ((0,), ()): ["hours@example.com"]},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()